@@ -0,0 +1,227 @@
+"""Closed-loop controller for frame skip, inference size and capture resolution.
+
+The controller is a pipeline sink. For every processed frame it records the
+inference time and the end-to-end latency (frame read -> sinks). Once per
+interval it compares them with the target:
+
+    load = inference_time * target_fps / frame_skip   (share of the frame budget used)
+    load = max(load, latency / latency_budget)        (when a latency budget is set)
+
+When the load is above 1 + hysteresis it steps quality down, cheapest loss
+first: smaller imgsz, then a lower capture resolution, then a higher frame
+skip. When there is headroom it steps back up in reverse order, but only if
+the predicted load after the step stays below 1 - hysteresis. Changes are at
+least `cooldown` seconds apart and measurements restart after each one, so
+the controller settles instead of oscillating.
+
+    controller = AdaptiveController(pipeline, target_fps=15)
+    pipeline.sinks.append(controller)
+"""
+import logging
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+IMGSZ_STEPS = (320, 416, 512, 640)
+RESOLUTION_STEPS = ((320, 240), (640, 480), (960, 540), (1280, 720))
+
+
+class Decision:
+    __slots__ = ('timestamp', 'knob', 'old', 'new', 'reason')
+
+    def __init__(self, knob, old, new, reason):
+        self.timestamp = time.time()
+        self.knob = knob
+        self.old = old
+        self.new = new
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.knob} {self.old} -> {self.new} ({self.reason})"
+
+
+class AdaptiveController:
+    """Adjust frame_skip, engine.imgsz and source resolution to hit a target rate"""
+
+    def __init__(self, pipeline, target_fps=15.0, latency_budget=None, imgsz_steps=IMGSZ_STEPS,
+                 resolution_steps=RESOLUTION_STEPS, max_frame_skip=4, hysteresis=0.15,
+                 interval=1.0, cooldown=2.0, min_samples=10, adjust_imgsz=True,
+                 adjust_resolution=True, on_change=None):
+        self.pipeline = pipeline
+        self.engine = pipeline.engine
+        self.target_fps = target_fps
+        self.latency_budget = latency_budget  # seconds, optional
+        self.max_frame_skip = max_frame_skip
+        self.hysteresis = hysteresis
+        self.interval = interval
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.on_change = on_change  # called with each Decision (pipeline thread)
+
+        self.imgsz_steps = sorted(imgsz_steps) if adjust_imgsz and self.engine.dynamic_imgsz else []
+        self.resolution_steps = list(resolution_steps) if adjust_resolution else []
+        self.resolution = self.current_resolution()
+        if self.resolution is None:
+            self.resolution_steps = []
+
+        self.inference_times = deque(maxlen=120)
+        self.latencies = deque(maxlen=120)
+        self.last_check = time.perf_counter()
+        self.last_change = 0.0
+        self.load = 0.0
+        self.decisions = deque(maxlen=20)
+
+    def current_resolution(self):
+        get = getattr(self.pipeline.source, 'get', None)
+        if get is None:
+            return None
+        width, height = int(get(cv2.CAP_PROP_FRAME_WIDTH) or 0), int(get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        return (width, height) if width and height else None
+
+    def write(self, detection):
+        """Sink interface: record one processed frame, maybe adjust (pipeline thread)"""
+        if detection.inference_time is not None:
+            self.inference_times.append(detection.inference_time)
+        if detection.latency is not None:
+            self.latencies.append(detection.latency)
+
+        now = time.perf_counter()
+        if now - self.last_check < self.interval or len(self.inference_times) < self.min_samples:
+            return
+        self.last_check = now
+        self.load = self.measure_load()
+        if now - self.last_change < self.cooldown:
+            return
+
+        if self.load > 1 + self.hysteresis:
+            decision = self.step_down()
+        elif self.load < 1 - self.hysteresis:
+            decision = self.step_up()
+        else:
+            decision = None
+        if decision is not None:
+            self.last_change = now
+            self.inference_times.clear()
+            self.latencies.clear()
+            self.decisions.append(decision)
+            logger.info(f"Adaptive: {decision}")
+            if self.on_change:
+                self.on_change(decision)
+
+    def measure_load(self):
+        # Only every frame_skip-th frame pays for inference
+        load = float(np.median(self.inference_times)) * self.target_fps / self.pipeline.frame_skip
+        if self.latency_budget and self.latencies:
+            load = max(load, float(np.median(self.latencies)) / self.latency_budget)
+        return load
+
+    def step_down(self):
+        reason = f"load {self.load:.2f}"
+        imgsz = self.next_imgsz(-1)
+        if imgsz is not None:
+            return self.set_imgsz(imgsz, reason)
+        resolution = self.next_resolution(-1)
+        if resolution is not None:
+            return self.set_resolution(resolution, reason)
+        if self.pipeline.frame_skip < self.max_frame_skip:
+            return self.set_frame_skip(self.pipeline.frame_skip + 1, reason)
+        return None
+
+    def step_up(self):
+        """Undo the last kind of step down, if the predicted load leaves headroom"""
+        ceiling = 1 - self.hysteresis
+        reason = f"load {self.load:.2f}"
+        frame_skip = self.pipeline.frame_skip
+        if frame_skip > 1:
+            # Skipping doesn't change per-frame cost, only how often it is paid
+            predicted = self.load * frame_skip / (frame_skip - 1)
+            if predicted < ceiling:
+                return self.set_frame_skip(frame_skip - 1, f"{reason}, predicted {predicted:.2f}")
+            return None
+
+        resolution = self.next_resolution(+1)
+        if resolution is not None:
+            # Resize and copy costs scale with pixels; inference size stays the same
+            predicted = self.load * (1 + 0.25 * (resolution[0] * resolution[1]
+                                                 / (self.resolution[0] * self.resolution[1]) - 1))
+            if predicted < ceiling:
+                return self.set_resolution(resolution, f"{reason}, predicted {predicted:.2f}")
+
+        imgsz = self.next_imgsz(+1)
+        if imgsz is not None:
+            # Network cost grows with the input area
+            predicted = self.load * (imgsz / self.engine.imgsz) ** 2
+            if predicted < ceiling:
+                return self.set_imgsz(imgsz, f"{reason}, predicted {predicted:.2f}")
+        return None
+
+    def next_imgsz(self, direction):
+        steps = self.imgsz_steps
+        if not steps:
+            return None
+        if direction < 0:
+            smaller = [size for size in steps if size < self.engine.imgsz]
+            return smaller[-1] if smaller else None
+        larger = [size for size in steps if size > self.engine.imgsz]
+        return larger[0] if larger else None
+
+    def next_resolution(self, direction):
+        if not self.resolution_steps:
+            return None
+        pixels = self.resolution[0] * self.resolution[1]
+        if direction < 0:
+            smaller = [r for r in self.resolution_steps if r[0] * r[1] < pixels]
+            return smaller[-1] if smaller else None
+        larger = [r for r in self.resolution_steps if r[0] * r[1] > pixels]
+        return larger[0] if larger else None
+
+    def set_imgsz(self, imgsz, reason):
+        decision = Decision('imgsz', self.engine.imgsz, imgsz, reason)
+        self.engine.imgsz = imgsz
+        return decision
+
+    def set_resolution(self, resolution, reason):
+        source = self.pipeline.source
+        width, height = resolution
+        if not (source.set(cv2.CAP_PROP_FRAME_WIDTH, width) and source.set(cv2.CAP_PROP_FRAME_HEIGHT, height)):
+            # Files and image folders can't change resolution; stop trying
+            self.resolution_steps = []
+            return None
+        # Some drivers accept any size and keep streaming the old one, or snap to the nearest mode
+        actual = self.current_resolution()
+        if actual is None or actual == self.resolution:
+            self.resolution_steps = []
+            return None
+        if actual != resolution:
+            self.resolution_steps.remove(resolution)
+        decision = Decision('resolution', "x".join(map(str, self.resolution)), "x".join(map(str, actual)), reason)
+        self.resolution = actual
+        return decision
+
+    def set_frame_skip(self, frame_skip, reason):
+        decision = Decision('frame_skip', self.pipeline.frame_skip, frame_skip, reason)
+        self.pipeline.frame_skip = frame_skip
+        return decision
+
+    def state(self):
+        return {
+            'load': self.load,
+            'frame_skip': self.pipeline.frame_skip,
+            'imgsz': self.engine.imgsz,
+            'resolution': self.resolution,
+            'last': str(self.decisions[-1]) if self.decisions else None,
+        }
+
+    def describe(self):
+        """Short one-line summary for status bars"""
+        resolution = "x".join(map(str, self.resolution)) if self.resolution else "-"
+        return (f"Adaptive: skip {self.pipeline.frame_skip} · imgsz {self.engine.imgsz} · "
+                f"{resolution} · load {self.load:.2f}")
+
+    def close(self):
+        pass
@@ -1,20 +1,39 @@
-import cv2
-import numpy as np
+# First, so the startup breakdown includes the imports below
+from startup import FirstFrameSink, StartupProfile, load_in_background
+STARTUP = StartupProfile()
+
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 import customtkinter as ctk
-from PIL import Image, ImageTk
-from ultralytics import YOLO
 import threading
 import time
-import torch
-from collections import deque
-from queue import Queue, Empty
 import logging
 
+from detection_engine import (CallbackSink, DetectionEngine, DetectionPipeline, RateMeter, detect_device,
+                              open_source)
+from frame_capture import CaptureThread
+from display import TkDisplaySink
+from events import open_sink
+from history import DetectionHistory
+from recorder import MediaWriter, VideoRecorder, parse_classes
+from adaptive import AdaptiveController
+from motion import MotionGate
+from process_workers import ProcessInferencePool
+from model_server import ModelClient
+from regions import RegionPlan, parse_roi
+from class_filter import ClassFilter, ConfigWatcher, parse_class_filter
+from tracker import KeyframeTracker
+from renderer import fit_size
+from metrics import Metrics, MetricsServer, watch
+
 
 class AdvancedObjectDetectionApp:
-    def __init__(self, master):
+    def __init__(self, master, workers=0, backend="auto", precision="fp32", calibration_dir=None,
+                 target_fps=None, latency_budget=None, keyframe_interval=1, motion_gate=None,
+                 regions=None, resolution=(640, 480), events=None, thumbnail_budget_mb=32,
+                 recording=None, metrics_port=None, warmup=True, server=None, class_filter=None,
+                 class_config=None):
         self.master = master
         self.master.title("Advanced Real-Time Object Detection")
         self.master.geometry("1400x900")
@@ -26,35 +45,87 @@ class AdvancedObjectDetectionApp:
         # Initialize variables
         self.cap = None
         self.model = None
+        self.pipeline = None
+        self.inference_pool = None
+        self.workers = workers  # >0 runs inference in worker processes
+        self.server = server    # address of a shared model_server.py; no model is loaded here
+        self.max_in_flight = max(workers, 1)
         self.running = False
-        self.detection_thread = None
-        self.ui_update_thread = None
         
         # Performance monitoring
-        self.fps_counter = deque(maxlen=30)
-        self.last_frame_time = time.time()
-        self.processed_frames = 0
-        self.total_frames = 0
-        
-        # Threading queues for better performance
-        self.frame_queue = Queue(maxsize=3)
-        self.result_queue = Queue(maxsize=3)
-        
-        # Settings
-        self.confidence_threshold = 0.5
-        self.iou_threshold = 0.45
-        self.max_detections = 100
-        self.frame_skip = 1
-        self.flip_camera = True  # Start with flipped camera (most common need)
+        self.fps_meter = RateMeter(window=30)
         
-        # Device detection
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # Newest detection is presented in one reused PhotoImage
+        self.display = None
         
-        # Detection history
-        self.detection_history = []
+        # Settings (frame skip, imgsz and camera resolution are tuned at runtime
+        # by the adaptive controller when a target fps is set)
+        self.frame_skip = 1
+        self.target_fps = target_fps
+        self.latency_budget = latency_budget
+        self.adaptive = None
+        self.keyframe_interval = keyframe_interval  # >1 detects every K frames and tracks between
+        self.tracker = None
+        self.motion_gate = motion_gate  # MotionGate settings dict, or None to run every frame
+        self.gate = None
+        self.resolution = resolution  # camera capture size; raise it for ROIs/tiling
+        self.roi_start = None
+        self.events = events  # optional event output (path or URL, see events.open_sink)
+        self.event_sink = None
+        
+        # Device detection imports torch, so it happens on the model loader thread
+        self.device = None
+        self.warmup = warmup  # dummy inference before the first real frame
+        
+        # Detection engine holds the model and the live detection settings
+        self.engine = DetectionEngine(
+            device=self.device,
+            confidence_threshold=0.5,
+            iou_threshold=0.45,
+            max_detections=100,
+            flip=True,  # Start with flipped camera (most common need)
+            backend=backend,
+            precision=precision,
+            calibration_dir=calibration_dir
+        )
+        # ROI crops / tiles (drag on the video to add an ROI, right-click to clear)
+        self.engine.regions = regions
+        
+        # Class allowlist and per-class thresholds, edited in the Classes panel;
+        # a config file is saved to from the panel and re-read when it changes
+        self.engine.class_filter = class_filter
+        self.class_config = class_config
+        self.class_watcher = ConfigWatcher(self.engine, class_config) if class_config else None
+        self.classes_window = None
+        self.classes_var = tk.StringVar()
+        self.class_conf_var = tk.StringVar()
+        
+        # Compact detection history (arrays + budgeted thumbnails); only the
+        # latest detection keeps its frame alive, for screenshots
+        self.history = DetectionHistory(thumbnail_budget_mb=thumbnail_budget_mb)
+        self.latest_detection = None
+        self.latest_lock = threading.Lock()
+        self.last_history_update = 0.0
+        
+        # Screenshots and recordings are written on one background thread
+        self.media_writer = MediaWriter()
+        self.recording = recording or {}  # VideoRecorder settings (directory, trigger, ...)
+        self.recorder = None
+        
+        # Stage timers stay off (no per-frame cost) until the stats panel is
+        # opened or a metrics port is given
+        self.metrics = Metrics()
+        self.metrics_enabled = metrics_port is not None
+        self.metrics_server = MetricsServer(self.metrics, port=metrics_port).start() if metrics_port else None
+        self.stats_window = None
+        self.stats_text = None
+        self.stats_refresh = None
+        self.first_frame = FirstFrameSink(STARTUP)  # logs the startup breakdown once
         
         self.setup_ui()
         self.load_model()
+        if self.class_watcher:
+            self.master.after(1000, self.poll_class_config)
         
         # Setup logging
         logging.basicConfig(level=logging.INFO)
@@ -69,14 +140,10 @@ class AdvancedObjectDetectionApp:
         self.top_control_frame = ctk.CTkFrame(self.main_frame)
         self.top_control_frame.pack(fill=tk.X, padx=5, pady=5)
         
-        # Device info
-        device_info = f"Device: {self.device.upper()}"
-        if self.device == 'cuda':
-            device_info += f" ({torch.cuda.get_device_name(0)})"
-        
+        # Device info (filled in once the model loader has detected the device)
         self.device_label = ctk.CTkLabel(
             self.top_control_frame,
-            text=device_info,
+            text="Device: detecting...",
             font=("Arial", 12, "bold")
         )
         self.device_label.pack(side=tk.LEFT, padx=5, pady=5)
@@ -86,6 +153,7 @@ class AdvancedObjectDetectionApp:
             self.top_control_frame,
             text="🚀 Start Detection",
             command=self.start_detection,
+            state="disabled",  # enabled once the model is loaded
             width=150,
             height=40,
             font=("Arial", 12, "bold")
@@ -194,7 +262,7 @@ class AdvancedObjectDetectionApp:
         self.max_det_entry.bind('<Return>', self.update_max_detections)
         
         # Camera flip toggle button
-        flip_status = "ON" if self.flip_camera else "OFF"
+        flip_status = "ON" if self.engine.flip else "OFF"
         self.flip_button = ctk.CTkButton(
             self.settings_frame,
             text=f"🔄 Flip: {flip_status}",
@@ -214,6 +282,36 @@ class AdvancedObjectDetectionApp:
         )
         self.screenshot_button.pack(side=tk.RIGHT, padx=5, pady=5)
         
+        # Record button (manual recording; triggered recording runs on its own)
+        self.record_button = ctk.CTkButton(
+            self.settings_frame,
+            text="⏺️ Record",
+            command=self.toggle_recording,
+            width=100,
+            height=30
+        )
+        self.record_button.pack(side=tk.RIGHT, padx=5, pady=5)
+        
+        # Per-stage timings, queue depths and drops
+        self.stats_button = ctk.CTkButton(
+            self.settings_frame,
+            text="📊 Stats",
+            command=self.toggle_stats_panel,
+            width=80,
+            height=30
+        )
+        self.stats_button.pack(side=tk.RIGHT, padx=5, pady=5)
+        
+        # Class allowlist and per-class thresholds (applied before NMS, live)
+        self.classes_button = ctk.CTkButton(
+            self.settings_frame,
+            text="🏷️ Classes",
+            command=self.toggle_classes_panel,
+            width=90,
+            height=30
+        )
+        self.classes_button.pack(side=tk.RIGHT, padx=5, pady=5)
+        
         # Video display frame
         self.video_frame = ctk.CTkFrame(self.main_frame)
         self.video_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -224,6 +322,9 @@ class AdvancedObjectDetectionApp:
             font=("Arial", 16)
         )
         self.video_label.pack(expand=True)
+        self.video_label.bind("<ButtonPress-1>", self.on_roi_press)
+        self.video_label.bind("<ButtonRelease-1>", self.on_roi_release)
+        self.video_label.bind("<Button-3>", self.on_roi_clear)
         
         # Status bar
         self.status_frame = ctk.CTkFrame(self.main_frame)
@@ -244,75 +345,159 @@ class AdvancedObjectDetectionApp:
         )
         self.model_info_label.pack(side=tk.RIGHT, padx=5, pady=5)
         
+        # Adaptive controller state
+        self.adaptive_label = ctk.CTkLabel(
+            self.status_frame,
+            text="Adaptive: off" if not self.target_fps else "Adaptive: waiting",
+            font=("Arial", 10)
+        )
+        self.adaptive_label.pack(side=tk.RIGHT, padx=5, pady=5)
+        
+        # Detection history summary
+        self.history_label = ctk.CTkLabel(
+            self.status_frame,
+            text="Last 5 min: none",
+            font=("Arial", 10)
+        )
+        self.history_label.pack(side=tk.RIGHT, padx=5, pady=5)
+        
     def load_model(self):
-        try:
-            self.status_label.configure(text="🔄 Loading YOLO model...")
-            self.master.update()
-            
-            # Load model and move to appropriate device
-            self.model = YOLO("yolov8n.pt")
-            if self.device == 'cuda':
-                self.model.to('cuda')
-            
+        """Load the model on a background thread; the window stays responsive"""
+        self.status_label.configure(text="🔄 Loading YOLO model...")
+        load_in_background(self.master, self.load_model_background, self.on_model_ready,
+                           self.on_model_error, profile=STARTUP)
+    
+    def load_model_background(self):
+        """Runs on the model loader thread (imports torch and ultralytics)"""
+        if self.server:
+            # The server holds the warm model; frames go to it through shared memory
+            self.inference_pool = ModelClient(self.server, self.engine, **self.slot_size()).start()
+            self.engine.device = self.inference_pool.device
+            self.max_in_flight = 2 * self.inference_pool.size
+            return None
+        if self.engine.device is None:
+            self.engine.device = detect_device()
+        if self.workers:
+            # Each worker process loads its own model; the UI process never does
+            self.inference_pool = ProcessInferencePool(self.engine, workers=self.workers,
+                                                       **self.slot_size()).start()
+            return None
+        
+        # Load model and move to appropriate device
+        model = self.engine.load()
+        if self.warmup:
+            with STARTUP.phase("warmup"):
+                self.engine.warmup((self.resolution[1], self.resolution[0], 3))
+        return model
+    
+    def slot_size(self):
+        """Shared-memory frame slots that fit the capture resolution (at least 1080p)"""
+        return {'max_width': max(self.resolution[0], 1920), 'max_height': max(self.resolution[1], 1080)}
+    
+    def on_model_ready(self, model):
+        self.model = model
+        self.device = self.engine.device
+        device_info = f"Device: {self.device.upper()}"
+        if self.device == 'cuda' and not self.server:
+            import torch  # already imported by the loader
+            device_info += f" ({torch.cuda.get_device_name(0)})"
+        self.device_label.configure(text=device_info)
+        
+        if self.server:
+            self.status_label.configure(text=f"✅ Connected to model server {self.server}")
+            self.model_info_label.configure(text=f"Model: YOLOv8n (shared server, {self.device.upper()})")
+        elif self.workers:
+            self.status_label.configure(text=f"✅ Started {self.workers} inference worker processes")
+            self.model_info_label.configure(
+                text=f"Model: YOLOv8n ({self.device.upper()} x {self.workers} processes)"
+            )
+        else:
             self.status_label.configure(text=f"✅ Model loaded successfully on {self.device.upper()}")
-            self.model_info_label.configure(text=f"Model: YOLOv8n ({self.device.upper()})")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load model: {str(e)}")
-            self.status_label.configure(text="❌ Error loading model")
-            self.logger.error(f"Model loading error: {e}")
+            self.model_info_label.configure(
+                text=f"Model: YOLOv8n ({self.device.upper()}, {self.engine.backend_name}, "
+                     f"{self.engine.precision})"
+            )
+        self.start_button.configure(state="normal")
+        self.logger.info(STARTUP.report())
+    
+    def on_model_error(self, error):
+        messagebox.showerror("Error", f"Failed to load model: {str(error)}")
+        self.status_label.configure(text="❌ Error loading model")
+        self.logger.error(f"Model loading error: {error}")
     
     def update_confidence(self, value):
-        self.confidence_threshold = float(value)
+        self.engine.confidence_threshold = float(value)
         self.confidence_value_label.configure(text=f"{value:.2f}")
     
     def update_iou(self, value):
-        self.iou_threshold = float(value)
+        self.engine.iou_threshold = float(value)
         self.iou_value_label.configure(text=f"{value:.2f}")
     
     def update_max_detections(self, event=None):
         try:
-            self.max_detections = int(self.max_det_var.get())
+            self.engine.max_detections = int(self.max_det_var.get())
         except ValueError:
             self.max_det_var.set("100")
-            self.max_detections = 100
+            self.engine.max_detections = 100
     
     def toggle_camera_flip(self):
         """Toggle camera flip horizontally"""
-        self.flip_camera = not self.flip_camera
-        flip_status = "ON" if self.flip_camera else "OFF"
+        self.engine.flip = not self.engine.flip
+        flip_status = "ON" if self.engine.flip else "OFF"
         self.flip_button.configure(text=f"🔄 Flip: {flip_status}")
         self.status_label.configure(text=f"🔄 Camera flip: {flip_status}")
     
     def start_detection(self):
         try:
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
+            # Camera settings are optimized for performance in open_source
+            camera = open_source(0, width=self.resolution[0], height=self.resolution[1], fps=30)
+            if not camera.isOpened():
                 messagebox.showerror("Error", "Cannot open camera")
                 return
             
-            # Optimize camera settings for better performance
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.cap.set(cv2.CAP_PROP_FPS, 30)
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # Capture runs on its own thread, inference always gets the newest frame.
+            # With worker processes the camera writes straight into shared memory.
+            frame_pool = self.inference_pool.frame_pool if self.inference_pool else None
+            self.cap = CaptureThread(camera, pool=frame_pool).start()
             
-            # Clear queues
-            while not self.frame_queue.empty():
-                self.frame_queue.get()
-            while not self.result_queue.empty():
-                self.result_queue.get()
+            self.display = TkDisplaySink(
+                self.master, self.video_label,
+                render=self.render_display, on_present=self.update_ui
+            )
             
-            self.running = True
-            self.processed_frames = 0
-            self.total_frames = 0
+            # Tracking gives stable ids; with K > 1 only keyframes run the model
+            self.tracker = KeyframeTracker(keyframe_interval=self.keyframe_interval)
             
-            # Start threads
-            self.detection_thread = threading.Thread(target=self.detection_loop, daemon=True)
-            self.ui_update_thread = threading.Thread(target=self.ui_update_loop, daemon=True)
+            self.gate = MotionGate(**self.motion_gate) if self.motion_gate else None
+            
+            self.running = True
+            self.pipeline = DetectionPipeline(
+                self.cap,
+                self.engine,
+                sinks=[CallbackSink(self.on_detection), self.display, self.history, self.first_frame],
+                frame_skip=self.frame_skip,
+                executor=self.inference_pool,
+                max_in_flight=self.max_in_flight,
+                tracker=self.tracker,
+                gate=self.gate
+            )
+            self.recorder = VideoRecorder(self.media_writer, **self.recording)
+            self.pipeline.sinks.append(self.recorder)
+            if self.events:
+                self.event_sink = open_sink(self.events)
+                self.pipeline.sinks.append(self.event_sink)
+            if self.target_fps:
+                self.adaptive = AdaptiveController(
+                    self.pipeline,
+                    target_fps=self.target_fps,
+                    latency_budget=self.latency_budget,
+                    on_change=self.on_adaptive_change
+                )
+                self.pipeline.sinks.append(self.adaptive)
+            if self.metrics_enabled:
+                self.attach_metrics()
             
-            self.detection_thread.start()
-            self.ui_update_thread.start()
+            self.pipeline.start()
             
             # Clear the initial text when detection starts
             self.video_label.configure(text="")
@@ -327,20 +512,37 @@ class AdvancedObjectDetectionApp:
     
     def stop_detection(self):
         self.running = False
+        if self.pipeline:
+            self.pipeline.stop()
         if self.cap:
             self.cap.release()
-        
-        # Clear queues
-        while not self.frame_queue.empty():
-            try:
-                self.frame_queue.get_nowait()
-            except Empty:
-                break
-        while not self.result_queue.empty():
-            try:
-                self.result_queue.get_nowait()
-            except Empty:
-                break
+        if self.recorder:
+            self.recorder.close()
+            self.logger.info(f"Recorder: {self.recorder.stats()}")
+            self.recorder = None
+            self.record_button.configure(text="⏺️ Record")
+        if self.event_sink:
+            self.event_sink.close()
+            self.logger.info(f"Events: {self.event_sink.stats()}")
+            self.event_sink = None
+        
+        # Drop the pending display frame and hand pooled frames back
+        if self.display:
+            self.logger.info(f"Display: {self.display.stats()}")
+            self.display.close()
+        with self.latest_lock:
+            if self.latest_detection:
+                self.latest_detection.release()
+            self.latest_detection = None
+        self.logger.info(f"History: {self.history.stats()}")
+        if self.cap:
+            self.logger.info(f"Capture frame pool: {self.cap.stats()['pool']}")
+        if self.tracker:
+            self.logger.info(f"Tracker: {self.tracker.stats()}")
+        if self.gate:
+            self.logger.info(f"Motion gate: {self.gate.stats()}")
+        if self.engine.regions is not None:
+            self.logger.info(f"Regions: {self.engine.regions.stats()}")
         
         # Remove image completely - just black background
         self.video_label.configure(
@@ -356,169 +558,343 @@ class AdvancedObjectDetectionApp:
         self.detection_label.configure(text="Objects: 0")
         self.efficiency_label.configure(text="Efficiency: 0%")
     
-    def detection_loop(self):
-        """Main detection loop running in separate thread"""
-        while self.running:
-            try:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                
-                self.total_frames += 1
-                
-                # Add frame to queue (non-blocking)
-                try:
-                    self.frame_queue.put_nowait(frame)
-                except:
-                    # Queue is full, skip this frame
-                    continue
-                
-                # Process frame if queue not empty
-                try:
-                    frame_to_process = self.frame_queue.get_nowait()
-                    
-                    # Apply camera flip if enabled
-                    if self.flip_camera:
-                        frame_to_process = cv2.flip(frame_to_process, 1)  # Horizontal flip
-                    
-                    # Perform detection with optimized settings
-                    results = self.model(
-                        frame_to_process,
-                        conf=self.confidence_threshold,
-                        iou=self.iou_threshold,
-                        max_det=self.max_detections,
-                        verbose=False,
-                        device=self.device
-                    )
-                    
-                    self.processed_frames += 1
-                    
-                    # Count detections
-                    detection_count = len(results[0].boxes) if results[0].boxes is not None else 0
-                    
-                    # Store detection data
-                    detection_data = {
-                        'timestamp': time.time(),
-                        'count': detection_count,
-                        'frame': frame_to_process,
-                        'results': results
-                    }
-                    
-                    # Add to history (keep last 10)
-                    self.detection_history.append(detection_data)
-                    if len(self.detection_history) > 10:
-                        self.detection_history.pop(0)
-                    
-                    # Add result to queue
-                    try:
-                        self.result_queue.put_nowait(detection_data)
-                    except:
-                        # Queue is full, skip this result
-                        pass
-                        
-                except Empty:
-                    # No frame to process
-                    time.sleep(0.01)
-                    continue
-                
-            except Exception as e:
-                self.logger.error(f"Detection error: {e}")
-                break
-        
-        if self.cap:
-            self.cap.release()
+    def on_detection(self, detection):
+        """Called on the detection thread for every processed frame"""
+        # The history sink keeps the arrays; only the newest frame stays alive
+        with self.latest_lock:
+            previous, self.latest_detection = self.latest_detection, detection.retain()
+        if previous:
+            previous.release()
+        
+        # FPS of processed frames
+        self.fps_meter.tick()
     
-    def ui_update_loop(self):
-        """UI update loop running in separate thread"""
-        while self.running:
-            try:
-                # Get result from queue
-                detection_data = self.result_queue.get(timeout=0.1)
-                
-                # Calculate FPS
-                current_time = time.time()
-                fps = 1 / (current_time - self.last_frame_time)
-                self.fps_counter.append(fps)
-                avg_fps = sum(self.fps_counter) / len(self.fps_counter)
-                self.last_frame_time = current_time
-                
-                # Calculate efficiency
-                efficiency = (self.processed_frames / max(self.total_frames, 1)) * 100
-                
-                # Update UI in main thread
-                self.master.after(0, self.update_ui, detection_data, avg_fps, efficiency)
-                
-            except Empty:
-                continue
-            except Exception as e:
-                self.logger.error(f"UI update error: {e}")
-                break
-    
-    def update_ui(self, detection_data, fps, efficiency):
+    def on_adaptive_change(self, decision):
+        """Called on the detection thread when the adaptive controller changes a setting"""
+        self.master.after(0, lambda: self.status_label.configure(text=f"⚙️ Adaptive: {decision}"))
+    
+    def render_display(self, detection, pool):
+        """Draw boxes and labels straight onto the display-size buffer"""
+        display_size = fit_size(detection.frame.shape, 900, 600)
+        annotated = self.engine.annotate(detection, display_size, pool)
+        regions = self.engine.regions
+        if regions is not None and regions.rois:
+            regions.draw(annotated, detection.frame.shape)
+        return annotated
+    
+    def on_roi_press(self, event):
+        self.roi_start = (event.x, event.y)
+    
+    def on_roi_release(self, event):
+        """Add the dragged rectangle as a normalized ROI"""
+        if self.roi_start is None or self.display is None or self.display.rgb is None:
+            return
+        height, width = self.display.rgb.shape[:2]
+        (x1, y1), (x2, y2) = self.roi_start, (event.x, event.y)
+        self.roi_start = None
+        if abs(x2 - x1) < 10 or abs(y2 - y1) < 10:
+            return  # a click, not a drag
+        roi = tuple(min(max(v, 0.0), 1.0) for v in (x1 / width, y1 / height, x2 / width, y2 / height))
+        if self.engine.regions is None:
+            self.engine.regions = RegionPlan()
+        self.engine.regions.add_roi(roi)
+        self.status_label.configure(text=f"🔲 ROI added ({len(self.engine.regions.rois)} active)")
+    
+    def on_roi_clear(self, event):
+        if self.engine.regions is not None:
+            self.engine.regions.clear_rois()
+            self.status_label.configure(text="🔲 ROIs cleared")
+    
+    def update_ui(self, detection):
+        """Called by the display sink on the Tk thread after each presented frame"""
         try:
-            frame = detection_data['frame']
-            results = detection_data['results']
-            detection_count = detection_data['count']
-            
-            # Draw bounding boxes and labels
-            annotated_frame = results[0].plot()
-            
-            # Resize frame for display
-            height, width = annotated_frame.shape[:2]
-            max_width, max_height = 900, 600
-            
-            if width > max_width or height > max_height:
-                scale = min(max_width/width, max_height/height)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                annotated_frame = cv2.resize(annotated_frame, (new_width, new_height))
-            
-            # Convert to RGB and then to ImageTk
-            rgb_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(rgb_frame)
-            tk_image = ImageTk.PhotoImage(pil_image)
-            
-            # Update video display
-            self.video_label.configure(image=tk_image)
-            self.video_label.image = tk_image  # Keep a reference
+            fps = self.fps_meter.rate()
+            stats = self.pipeline.stats()
+            display_stats = self.display.stats()
             
             # Update labels
             self.fps_label.configure(text=f"FPS: {fps:.1f}")
-            self.detection_label.configure(text=f"Objects: {detection_count}")
-            self.efficiency_label.configure(text=f"Efficiency: {efficiency:.1f}%")
+            self.detection_label.configure(text=f"Objects: {detection.count}")
+            self.efficiency_label.configure(
+                text=f"Efficiency: {stats['efficiency']:.1f}% (dropped {stats['dropped']}/{stats['captured']}, "
+                     f"display {display_stats['presented']} shown/{display_stats['dropped']} skipped)"
+            )
+            if self.adaptive:
+                self.adaptive_label.configure(text=self.adaptive.describe())
+            
+            # Per-class totals over the last 5 minutes, refreshed once a second
+            now = time.time()
+            if now - self.last_history_update >= 1.0:
+                self.last_history_update = now
+                counts = sorted(self.history.label_counts(seconds=300).items(), key=lambda item: -item[1])
+                summary = ", ".join(f"{label} {count}" for label, count in counts[:4]) or "none"
+                self.history_label.configure(text=f"Last 5 min: {summary}")
             
         except Exception as e:
             self.logger.error(f"UI update error: {e}")
     
     def take_screenshot(self):
         """Take a screenshot of current detection"""
-        if self.detection_history:
-            try:
-                latest_detection = self.detection_history[-1]
-                results = latest_detection['results']
-                annotated_frame = results[0].plot()
-                
-                # Save screenshot
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                filename = f"detection_screenshot_{timestamp}.png"
-                cv2.imwrite(filename, annotated_frame)
-                
-                self.status_label.configure(text=f"📸 Screenshot saved: {filename}")
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save screenshot: {str(e)}")
+        with self.latest_lock:
+            latest_detection = self.latest_detection.retain() if self.latest_detection else None
+        if latest_detection:
+            # Annotate and encode on the media writer thread, not the UI thread
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filename = f"detection_screenshot_{timestamp}.png"
+            if self.media_writer.submit(self.write_screenshot, latest_detection, filename):
+                self.status_label.configure(text=f"📸 Saving screenshot: {filename}")
+            else:
+                latest_detection.release()
+                self.status_label.configure(text="📸 Writer busy, screenshot skipped")
+    
+    def write_screenshot(self, detection, filename):
+        """Runs on the media writer thread"""
+        import cv2  # only needed here; keeps it out of the window's startup path
+
+        try:
+            ok = cv2.imwrite(filename, self.engine.annotate(detection))
+        finally:
+            detection.release()
+        status = f"📸 Screenshot saved: {filename}" if ok else f"❌ Failed to save screenshot: {filename}"
+        self.master.after(0, lambda: self.status_label.configure(text=status))
+    
+    def toggle_recording(self):
+        if not self.recorder:
+            self.status_label.configure(text="⏺️ Start detection before recording")
+            return
+        if self.recorder.armed:
+            self.recorder.stop_recording()
+            self.record_button.configure(text="⏺️ Record")
+            self.status_label.configure(text="⏹️ Recording stopped")
+        else:
+            self.recorder.start_recording()
+            self.record_button.configure(text="⏹️ Stop Rec")
+            self.status_label.configure(text=f"⏺️ Recording to {self.recorder.directory}/")
+    
+    def attach_metrics(self):
+        """Start timing the running pipeline and display, and watch their queues"""
+        self.metrics_enabled = True
+        if not self.pipeline:
+            return
+        self.metrics.clear_gauges()
+        watch(self.metrics, pipeline=self.pipeline, display=self.display,
+              sinks=[sink for sink in (self.recorder, self.event_sink) if sink])
+        self.pipeline.metrics = self.metrics
+        self.display.metrics = self.metrics
+    
+    def toggle_stats_panel(self):
+        if self.stats_window is not None:
+            self.master.after_cancel(self.stats_refresh)
+            self.stats_window.destroy()
+            self.stats_window = None
+            return
+        self.attach_metrics()
+        self.stats_window = ctk.CTkToplevel(self.master)
+        self.stats_window.title("Pipeline Stats")
+        self.stats_window.geometry("520x420")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.toggle_stats_panel)
+        self.stats_text = ctk.CTkTextbox(self.stats_window, font=("Courier", 12))
+        self.stats_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        if self.metrics_server:
+            self.stats_window.title(f"Pipeline Stats ({self.metrics_server.url})")
+        self.refresh_stats_panel()
+    
+    def refresh_stats_panel(self):
+        """Redraw the stats panel once a second while it is open"""
+        if self.stats_window is None:
+            return
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert("1.0", self.metrics.format_summary())
+        self.stats_refresh = self.master.after(1000, self.refresh_stats_panel)
+    
+    def model_names(self):
+        return self.engine.names or getattr(self.inference_pool, 'names', None) or {}
+    
+    def toggle_classes_panel(self):
+        if self.classes_window is not None:
+            self.classes_window.destroy()
+            self.classes_window = None
+            return
+        self.classes_window = ctk.CTkToplevel(self.master)
+        self.classes_window.title("Classes")
+        self.classes_window.geometry("480x220")
+        self.classes_window.protocol("WM_DELETE_WINDOW", self.toggle_classes_panel)
+        
+        ctk.CTkLabel(self.classes_window, text="Classes (comma-separated, empty: all):").pack(
+            anchor=tk.W, padx=10, pady=(10, 0))
+        ctk.CTkEntry(self.classes_window, textvariable=self.classes_var, width=440).pack(padx=10, pady=5)
+        ctk.CTkLabel(self.classes_window, text="Thresholds (name=confidence, ...):").pack(
+            anchor=tk.W, padx=10)
+        ctk.CTkEntry(self.classes_window, textvariable=self.class_conf_var, width=440).pack(padx=10, pady=5)
+        
+        buttons = ctk.CTkFrame(self.classes_window)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ctk.CTkButton(buttons, text="Apply", command=self.apply_class_filter, width=80).pack(
+            side=tk.LEFT, padx=5)
+        ctk.CTkButton(buttons, text="💾 Save", command=self.save_class_filter, width=80).pack(
+            side=tk.LEFT, padx=5)
+        self.fill_classes_panel()
+    
+    def fill_classes_panel(self):
+        class_filter = self.engine.class_filter
+        self.classes_var.set(", ".join(map(str, class_filter.classes or ())) if class_filter else "")
+        self.class_conf_var.set(
+            ", ".join(f"{name}={value:g}" for name, value in class_filter.thresholds.items())
+            if class_filter else ""
+        )
+    
+    def apply_class_filter(self):
+        """Swap in the panel's class filter; the next frame uses it"""
+        try:
+            class_filter = parse_class_filter(self.classes_var.get(), self.class_conf_var.get())
+        except ValueError as e:
+            messagebox.showerror("Classes", f"Invalid threshold: {e}")
+            return False
+        names = self.model_names()
+        unknown = class_filter.unknown(names) if class_filter is not None and names else []
+        if unknown:
+            messagebox.showerror("Classes", f"Unknown classes: {', '.join(unknown)}")
+            return False
+        self.engine.class_filter = class_filter
+        text = class_filter.describe() if class_filter is not None else "all classes"
+        self.status_label.configure(text=f"🏷️ Detecting {text}")
+        return True
+    
+    def save_class_filter(self):
+        if not self.apply_class_filter():
+            return
+        path = self.class_config or "classes.json"
+        (self.engine.class_filter or ClassFilter()).save(path)
+        if self.class_watcher:
+            self.class_watcher.mtime = self.class_watcher.modified()  # our own write, not an edit
+        self.status_label.configure(text=f"💾 Classes saved to {path}")
+    
+    def poll_class_config(self):
+        """Pick up edits to the class config file once a second"""
+        if self.class_watcher.poll() is not None:
+            self.status_label.configure(text=f"🏷️ Reloaded {self.class_config}")
+            if self.classes_window is not None:
+                self.fill_classes_panel()
+        self.master.after(1000, self.poll_class_config)
     
     def on_closing(self):
         self.stop_detection()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.media_writer.close()
+        if self.inference_pool:
+            self.inference_pool.stop()
         self.master.destroy()
 
 
+def recording_settings(args):
+    return {
+        'directory': args.record_dir,
+        'trigger_classes': parse_classes(args.record_trigger),
+        'pre_event_seconds': args.pre_event,
+        'segment_seconds': args.segment_minutes * 60,
+        'annotate': not args.raw_recording,
+        'sidecar': args.raw_recording,
+    }
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Advanced Real-Time Object Detection")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run inference in N worker processes to keep the UI responsive")
+    parser.add_argument("--backend", default="auto",
+                        choices=["auto", "torch-raw", "torch", "onnxruntime", "openvino", "torchscript"],
+                        help="inference runtime (auto: fastest installed CPU runtime)")
+    parser.add_argument("--precision", default="fp32",
+                        choices=["fp32", "fp16", "int8-dynamic", "int8-static"],
+                        help="reduced precision runs on onnxruntime (see quantize.py)")
+    parser.add_argument("--calibration", default=None, metavar="IMAGE_DIR",
+                        help="calibration images for --precision int8-static")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="adapt frame skip, imgsz and camera resolution to this rate")
+    parser.add_argument("--latency-budget", type=float, default=None, metavar="MS",
+                        help="also keep end-to-end latency under this many milliseconds")
+    parser.add_argument("--keyframe-interval", type=int, default=1, metavar="K",
+                        help="run full detection every K frames and track objects in between")
+    parser.add_argument("--motion-gate", choices=("off", "diff", "mog2"), default="off",
+                        help="reuse the previous detections while the scene is static")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="fraction of changed pixels that counts as motion")
+    parser.add_argument("--motion-crop", action="store_true",
+                        help="run the model only on the changed region when it is small")
+    parser.add_argument("--resolution", default="640x480", metavar="WxH",
+                        help="camera capture resolution (use a high one with --tile or --roi)")
+    parser.add_argument("--roi", action="append", default=[], metavar="X1,Y1,X2,Y2",
+                        help="only detect inside this region (normalized 0-1 or pixels); repeatable")
+    parser.add_argument("--tile", type=int, default=None, metavar="SIZE",
+                        help="tiled inference with SIZE x SIZE tiles")
+    parser.add_argument("--regions", default=None, metavar="CONFIG",
+                        help="JSON file with rois/tile_size/overlap")
+    parser.add_argument("--thumbnail-mb", type=float, default=32,
+                        help="memory budget for history thumbnails (0: arrays only)")
+    parser.add_argument("--record-dir", default="recordings")
+    parser.add_argument("--record-trigger", default=None, metavar="CLASSES",
+                        help="comma-separated classes that start a recording automatically")
+    parser.add_argument("--pre-event", type=float, default=5.0, metavar="SECONDS",
+                        help="footage kept from before a triggered recording")
+    parser.add_argument("--segment-minutes", type=float, default=5.0)
+    parser.add_argument("--raw-recording", action="store_true",
+                        help="record unannotated video plus a JSON lines detection sidecar")
+    parser.add_argument("--events", default=None, metavar="TARGET",
+                        help="also record detections to .jsonl/.parquet/.db or push them to http:// or tcp://")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="time every stage and serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--server", default=None, metavar="ADDRESS",
+                        help="run as a client of model_server.py (unix:/path.sock or tcp://host:port)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="skip the dummy inference run after the model loads")
+    parser.add_argument("--stats-panel", action="store_true",
+                        help="open the per-stage stats panel on startup")
+    parser.add_argument("--classes", default=None, metavar="NAMES",
+                        help="only detect these comma-separated classes (filtered before NMS)")
+    parser.add_argument("--class-conf", default=None, metavar="NAME=CONF,...",
+                        help="per-class confidence thresholds, e.g. person=0.35,car=0.6")
+    parser.add_argument("--class-config", default=None, metavar="CONFIG",
+                        help="JSON file with classes/thresholds; saved from the Classes panel, "
+                             "re-read when it changes")
+    args = parser.parse_args()
+    if args.motion_crop and (args.regions or args.roi or args.tile):
+        parser.error("--motion-crop can't be combined with --roi/--tile/--regions")
+    STARTUP.mark("imports")
+    regions = None
+    if args.regions:
+        regions = RegionPlan.from_config(args.regions)
+    elif args.roi or args.tile:
+        regions = RegionPlan(rois=[parse_roi(roi) for roi in args.roi], tile_size=args.tile)
+    motion_gate = None
+    if args.motion_gate != "off":
+        motion_gate = {'method': args.motion_gate, 'min_changed': args.motion_threshold,
+                       'crop': args.motion_crop}
+    
     root = ctk.CTk()
-    app = AdvancedObjectDetectionApp(root)
+    app = AdvancedObjectDetectionApp(root, workers=args.workers, backend=args.backend,
+                                     precision=args.precision, calibration_dir=args.calibration,
+                                     target_fps=args.target_fps,
+                                     keyframe_interval=args.keyframe_interval,
+                                     motion_gate=motion_gate,
+                                     regions=regions,
+                                     events=args.events,
+                                     thumbnail_budget_mb=args.thumbnail_mb,
+                                     recording=recording_settings(args),
+                                     metrics_port=args.metrics_port,
+                                     warmup=not args.no_warmup,
+                                     server=args.server,
+                                     class_filter=parse_class_filter(args.classes, args.class_conf,
+                                                                     args.class_config),
+                                     class_config=args.class_config,
+                                     resolution=tuple(int(v) for v in args.resolution.lower().split("x")),
+                                     latency_budget=args.latency_budget / 1000 if args.latency_budget else None)
     
     # Handle window closing
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    if args.stats_panel:
+        app.toggle_stats_panel()
+    root.after(0, lambda: STARTUP.mark("window"))
     
     root.mainloop()
 
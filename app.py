@@ -1,10 +1,10 @@
 import cv2
-import numpy as np
 import tkinter as tk
 from customtkinter import CTk, CTkButton, CTkLabel, CTkFrame
 from PIL import Image, ImageTk
-from ultralytics import YOLO
-import threading
+
+from detection_engine import CallbackSink, DetectionEngine, DetectionPipeline, open_source
+from startup import load_in_background
 
 
 class ObjectDetectionApp:
@@ -13,8 +13,11 @@ class ObjectDetectionApp:
         self.master.title("Real-Time Object Detection")
         self.master.geometry("800x600")
 
-        self.cap = cv2.VideoCapture(0)
-        self.model = YOLO("yolov8n.pt")  # Load the YOLOv8 model
+        self.cap = None
+        self.pipeline = None
+        # Ultralytics defaults, as the original self.model(frame) call used
+        self.engine = DetectionEngine(confidence_threshold=0.25, iou_threshold=0.7, max_detections=300)
+        self.model = None
 
         self.frame = CTkFrame(master)
         self.frame.pack(fill=tk.BOTH, expand=True)
@@ -22,44 +25,49 @@ class ObjectDetectionApp:
         self.video_label = CTkLabel(self.frame)
         self.video_label.pack()
 
-        self.start_button = CTkButton(self.frame, text="Start", command=self.start_detection)
+        self.start_button = CTkButton(self.frame, text="Loading model...", state="disabled",
+                                      command=self.start_detection)
         self.start_button.pack(side=tk.LEFT, padx=10, pady=10)
 
         self.stop_button = CTkButton(self.frame, text="Stop", command=self.stop_detection)
         self.stop_button.pack(side=tk.RIGHT, padx=10, pady=10)
 
-        self.running = False
+        # Load the YOLOv8 model without blocking the window
+        load_in_background(master, self.engine.load, self.on_model_ready, self.on_model_error)
+
+    def on_model_ready(self, model):
+        self.model = model
+        self.start_button.configure(text="Start", state="normal")
+
+    def on_model_error(self, error):
+        self.start_button.configure(text=f"Model failed: {error}")
 
     def start_detection(self):
-        self.running = True
-        self.detect_thread = threading.Thread(target=self.detect_objects)
-        self.detect_thread.start()
+        if self.pipeline and self.pipeline.running:
+            return
+        self.cap = open_source(0, width=None, height=None, fps=None)
+        self.pipeline = DetectionPipeline(self.cap, self.engine, sinks=[CallbackSink(self.detect_objects)])
+        self.pipeline.start()
 
     def stop_detection(self):
-        self.running = False
-
-    def detect_objects(self):
-        while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-
-            # Perform object detection
-            results = self.model(frame)
-            annotated_frame = results[0].plot()
-
-            # Convert frame to ImageTk
-            image = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-            image = Image.fromarray(image)
-            image = ImageTk.PhotoImage(image)
-
-            # Display the image
-            self.video_label.imgtk = image
-            self.video_label.configure(image=image)
-            self.video_label.update()
-
-        self.cap.release()
-        cv2.destroyAllWindows()
+        if self.pipeline:
+            self.pipeline.stop()
+
+    def detect_objects(self, detection):
+        annotated_frame = self.engine.annotate(detection)
+
+        # Display the image in the main thread
+        self.master.after(0, self.show_frame, annotated_frame)
+
+    def show_frame(self, annotated_frame):
+        # Convert frame to ImageTk
+        image = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
+        image = Image.fromarray(image)
+        image = ImageTk.PhotoImage(image)
+
+        # Display the image
+        self.video_label.imgtk = image
+        self.video_label.configure(image=image)
 
 
 def main():
@@ -0,0 +1,373 @@
+"""asyncio front-end for the detection pipeline: async stages joined by bounded channels.
+
+    capture --[frames: latest]--> infer --[results: block]--> sinks
+
+Each edge is a Channel with an explicit policy for when it is full:
+
+    block   the producer awaits until there is room (no loss, full backpressure)
+    drop    the new item is discarded and counted
+    latest  the oldest queued item is discarded and counted, so the consumer
+            always sees the newest frame (what a live camera wants)
+
+Dropped items have their frame leases released, so pooled buffers never leak.
+Blocking work runs off the event loop: capture reads and local inference go
+to a concurrent.futures executor (the loop's default one unless given), and
+an executor with submit() -> Future (BatchScheduler, ProcessInferencePool,
+model_server.ModelClient) is awaited directly without holding a thread per
+stream. Sinks may be ordinary pipeline sinks or have an async write().
+
+stop() (or cancelling the task running run()) cancels every stage, drains
+the channels and releases the source; a failing stage cancels the others and
+its exception propagates out of run().
+
+    pipeline = AsyncDetectionPipeline(open_source(0), engine, sinks=[sink], executor=scheduler)
+    task = asyncio.create_task(pipeline.run())
+    ...
+    await pipeline.stop()
+
+Several streams on one loop sharing one batched model:
+
+    python async_pipeline.py --source 0 --source clip.mp4 --output detections.jsonl
+"""
+import argparse
+import asyncio
+import inspect
+import logging
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_scheduler import BatchScheduler
+from detection_engine import DEFAULT_MODEL, DetectionEngine, DetectionPipeline, open_source
+
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop", "latest")
+CLOSED = object()
+
+
+def release_item(item):
+    """Hand back the frame leases held by a channel item"""
+    if isinstance(item, tuple):
+        for value in item:
+            if hasattr(value, 'release'):
+                value.release()
+
+
+def release_when_done(awaitable, lease):
+    if lease is not None:
+        awaitable.add_done_callback(lambda _: lease.release())
+
+
+class Channel:
+    """Bounded asyncio queue between two stages with a full-queue policy"""
+
+    def __init__(self, name, maxsize=2, policy="block", on_drop=release_item):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown channel policy: {policy}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_drop = on_drop
+        self.queue = None  # created inside the running loop
+
+        # Counters
+        self.put_items = 0
+        self.dropped_items = 0
+
+    def open(self):
+        self.queue = asyncio.Queue(self.maxsize)
+        return self
+
+    async def put(self, item):
+        """Returns False when the item itself was dropped"""
+        queue = self.queue
+        if queue.full():
+            if self.policy == "drop":
+                self.dropped_items += 1
+                self.on_drop(item)
+                return False
+            if self.policy == "latest":
+                self.dropped_items += 1
+                self.on_drop(queue.get_nowait())
+                queue.put_nowait(item)
+                self.put_items += 1
+                return True
+        await queue.put(item)
+        self.put_items += 1
+        return True
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        """Tell the consumer no more items are coming (waits for room, whatever the policy)"""
+        await self.queue.put(CLOSED)
+
+    def drain(self):
+        while self.queue is not None and not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not CLOSED:
+                self.on_drop(item)
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'depth': self.queue.qsize() if self.queue is not None else 0,
+            'put': self.put_items,
+            'dropped': self.dropped_items,
+        }
+
+
+class AsyncCallbackSink:
+    """Sink that awaits callback(detection)"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    async def write(self, detection):
+        await self.callback(detection)
+
+    def close(self):
+        pass
+
+
+class AsyncDetectionPipeline:
+    """Capture, inference and sink stages as asyncio tasks with bounded channels.
+
+    Reading, preprocessing, tracking and the counters reuse DetectionPipeline,
+    so stats() and the frame-lease rules are the same as for the threaded
+    pipeline.
+    """
+
+    def __init__(self, source, engine, sinks=(), executor=None, io_executor=None, frame_skip=1,
+                 source_id=0, max_frames=None, max_in_flight=1, tracker=None, frame_policy="latest",
+                 result_policy="block", channel_size=2):
+        self.pipeline = DetectionPipeline(source, engine, sinks=sinks, frame_skip=frame_skip,
+                                          source_id=source_id, max_frames=max_frames, executor=executor,
+                                          max_in_flight=max_in_flight, tracker=tracker)
+        self.io_executor = io_executor  # capture reads and local inference; None: the loop's default
+        self.frames = Channel("frames", channel_size, frame_policy)
+        self.results = Channel("results", channel_size, result_policy)
+        self.tasks = []
+        self.runner = None
+
+    @property
+    def sinks(self):
+        return self.pipeline.sinks
+
+    async def run(self):
+        """Run until the source ends, stop() is called or a stage fails"""
+        self.runner = asyncio.current_task()
+        self.frames.open()
+        self.results.open()
+        self.tasks = [
+            asyncio.create_task(self.capture_stage(), name="capture"),
+            asyncio.create_task(self.infer_stage(), name="infer"),
+            asyncio.create_task(self.sink_stage(), name="sinks"),
+        ]
+        self.pipeline.running = True
+        try:
+            done, _ = await asyncio.wait(self.tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()  # re-raises a stage failure; the others are cancelled below
+        finally:
+            self.pipeline.running = False
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.frames.drain()
+            self.results.drain()
+            await asyncio.get_running_loop().run_in_executor(self.io_executor, self.pipeline.source.release)
+
+    async def stop(self):
+        """Cancel every stage and wait for the cleanup in run()"""
+        if self.runner is not None and not self.runner.done():
+            self.runner.cancel()
+            try:
+                await self.runner
+            except asyncio.CancelledError:
+                pass
+
+    async def offload(self, function, *args):
+        """Run a blocking call on the I/O executor; its result is still handled if we're cancelled"""
+        future = asyncio.get_running_loop().run_in_executor(self.io_executor, function, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The call can't be interrupted; release whatever it hands back later
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or release_item(f.result()))
+            raise
+
+    async def capture_stage(self):
+        pipeline = self.pipeline
+        while True:
+            frame, lease = await self.offload(pipeline.read)
+            if frame is None:
+                break
+            read_time = time.perf_counter()
+            pipeline.total_frames += 1
+            if pipeline.total_frames % pipeline.frame_skip != 0:
+                if lease is not None:
+                    lease.release()
+                continue
+            frame, lease = pipeline.prepare(frame, lease)
+            await self.frames.put((frame, pipeline.total_frames - 1, lease, read_time))
+            if pipeline.max_frames and pipeline.total_frames >= pipeline.max_frames:
+                break  # frames read, not processed: the stages run concurrently
+        await self.frames.close()
+
+    async def infer_stage(self):
+        pipeline = self.pipeline
+        in_flight = deque()
+        try:
+            while True:
+                # Await the oldest result when the window is full or nothing new is waiting
+                if in_flight and (len(in_flight) >= pipeline.max_in_flight or self.frames.queue.empty()):
+                    await self.finish(*in_flight.popleft())
+                    continue
+                item = await self.frames.get()
+                if item is CLOSED:
+                    break
+                frame, frame_index, lease, read_time = item
+                in_flight.append((self.infer(frame, frame_index), lease, read_time))
+            while in_flight:
+                await self.finish(*in_flight.popleft())
+        finally:
+            # Inference can't be interrupted; hand the frames back once it's done with them
+            for awaitable, lease, _ in in_flight:
+                release_when_done(awaitable, lease)
+        await self.results.close()
+
+    def infer(self, frame, frame_index):
+        """Future for one frame: the pipeline's executor if it has one, else the engine off-loop"""
+        pipeline = self.pipeline
+        if pipeline.executor is not None:
+            return asyncio.wrap_future(pipeline.executor.submit(frame, pipeline.source_id, frame_index))
+        return asyncio.ensure_future(self.offload(
+            pipeline.engine.process, frame, frame_index, pipeline.source_id, False))
+
+    async def finish(self, awaitable, lease, read_time):
+        try:
+            # Shielded: cancelling a wrapped executor future would cancel it under the executor
+            detection = await asyncio.shield(awaitable)
+        except asyncio.CancelledError:
+            release_when_done(awaitable, lease)
+            raise
+        except TimeoutError:
+            # Dropped by the executor after its deadline
+            self.pipeline.expired_frames += 1
+            if lease is not None:
+                lease.release()
+            return
+        detection = self.pipeline.track(detection)
+        if lease is not None:
+            detection.lease = lease
+        detection.latency = time.perf_counter() - read_time
+        try:
+            await self.results.put((detection,))
+        except asyncio.CancelledError:
+            detection.release()
+            raise
+
+    async def sink_stage(self):
+        pipeline = self.pipeline
+        while True:
+            item = await self.results.get()
+            if item is CLOSED:
+                break
+            detection = item[0]
+            try:
+                pipeline.processed_frames += 1
+                for sink in pipeline.sinks:
+                    result = sink.write(detection)
+                    if inspect.isawaitable(result):
+                        await result
+            finally:
+                detection.release()
+
+    def stats(self):
+        stats = self.pipeline.stats()
+        stats['channels'] = {'frames': self.frames.stats(), 'results': self.results.stats()}
+        return stats
+
+
+async def run_streams(pipelines, duration=None, report_interval=5.0):
+    """Run several pipelines on the current loop, logging their stats"""
+    tasks = [asyncio.create_task(pipeline.run()) for pipeline in pipelines]
+    started = time.perf_counter()
+    try:
+        while not all(task.done() for task in tasks):
+            await asyncio.wait(tasks, timeout=report_interval)
+            for index, pipeline in enumerate(pipelines):
+                logger.info(f"[{index}] {pipeline.stats()}")
+            if duration and time.perf_counter() - started > duration:
+                break
+    finally:
+        for pipeline in pipelines:
+            await pipeline.stop()
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            logger.error(f"Stream failed: {task.exception()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="asyncio multi-stream detection")
+    parser.add_argument("--source", action="append", required=True,
+                        help="camera index, video file/URL or image directory (repeat for more streams)")
+    parser.add_argument("--output", default="detections.jsonl",
+                        help=".jsonl, .parquet, .db/.sqlite, http://... or tcp://host:port")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-det", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=8, help="frames batched across streams")
+    parser.add_argument("--max-wait", type=float, default=0.010)
+    parser.add_argument("--frame-policy", choices=POLICIES, default="latest",
+                        help="capture -> inference edge when inference falls behind")
+    parser.add_argument("--result-policy", choices=POLICIES, default="block",
+                        help="inference -> sinks edge when the sinks fall behind")
+    parser.add_argument("--channel-size", type=int, default=2)
+    parser.add_argument("--io-threads", type=int, default=None,
+                        help="threads for blocking capture reads, shared by all streams")
+    parser.add_argument("--duration", type=float, default=None, help="stop after N seconds")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    engine = DetectionEngine(
+        model_path=args.model, device=args.device,
+        confidence_threshold=args.conf, iou_threshold=args.iou, max_detections=args.max_det
+    )
+    engine.load()
+
+    from events import open_sink
+    sink = open_sink(args.output)
+    scheduler = BatchScheduler(engine, max_batch_size=args.batch_size, max_wait=args.max_wait).start()
+    io_executor = ThreadPoolExecutor(max_workers=args.io_threads or len(args.source) + 1,
+                                     thread_name_prefix="capture")
+    pipelines = [
+        AsyncDetectionPipeline(
+            open_source(source), engine, sinks=[sink], executor=scheduler, io_executor=io_executor,
+            source_id=source_id, frame_policy=args.frame_policy, result_policy=args.result_policy,
+            channel_size=args.channel_size
+        )
+        for source_id, source in enumerate(args.source)
+    ]
+    try:
+        asyncio.run(run_streams(pipelines, duration=args.duration))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+        io_executor.shutdown(wait=False)
+        sink.close()
+    for index, pipeline in enumerate(pipelines):
+        logger.info(f"[{index}] {args.source[index]}: {pipeline.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""Inference backends: eager PyTorch plus exported ONNX Runtime / OpenVINO / TorchScript.
+
+Eager PyTorch is the slowest CPU option and the slowest to start. The first
+time a backend is used the model is exported with Ultralytics and the
+artifact is cached under models/; later starts load it directly. Every
+backend returns the same per-frame (boxes, scores, class_ids) arrays, so the
+rest of the pipeline doesn't care which one is running.
+
+    python backends.py --list
+    python backends.py --export onnx
+    python backends.py --parity images/ --backend onnxruntime
+"""
+import argparse
+import ast
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from postprocess import class_thresholds, decode_batch, make_batch
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "models"
+
+# Fastest first on a typical CPU
+BACKEND_PREFERENCE = ("openvino", "onnxruntime", "torchscript", "torch-raw", "torch")
+
+# Eager PyTorch backends: nothing to export, loaded straight from the .pt file
+EAGER_BACKENDS = ("torch-raw", "torch")
+
+# Ultralytics export format and runtime module per backend
+EXPORT_FORMATS = {
+    'onnxruntime': ('onnx', 'onnxruntime'),
+    'openvino': ('openvino', 'openvino'),
+    'torchscript': ('torchscript', 'torch'),
+}
+
+
+def module_available(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def available_backends():
+    """Backends whose runtime is installed, fastest first"""
+    backends = [name for name in BACKEND_PREFERENCE if name in EXPORT_FORMATS
+                and module_available(EXPORT_FORMATS[name][1])]
+    return backends + list(EAGER_BACKENDS)
+
+
+def artifact_path(model_path, backend, imgsz, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = {'onnxruntime': '.onnx', 'openvino': '_openvino_model', 'torchscript': '.torchscript'}[backend]
+    return os.path.join(cache_dir, f"{stem}-{imgsz}{suffix}")
+
+
+def export_model(model_path, backend, imgsz=640, cache_dir=CACHE_DIR, force=False):
+    """Export model_path for a backend once and return the cached artifact path"""
+    target = artifact_path(model_path, backend, imgsz, cache_dir)
+    fresh = os.path.exists(target) and (
+        not os.path.exists(model_path) or os.path.getmtime(target) >= os.path.getmtime(model_path)
+    )
+    if fresh and not force:
+        return target
+
+    from ultralytics import YOLO
+    export_format = EXPORT_FORMATS[backend][0]
+    logger.info(f"Exporting {model_path} to {export_format} (imgsz={imgsz})...")
+    started = time.time()
+    # Dynamic batch so one exported model serves batched inference too
+    exported = YOLO(model_path).export(format=export_format, imgsz=imgsz, dynamic=backend != "torchscript")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(target):
+        shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+    shutil.move(str(exported), target)
+    logger.info(f"Exported {target} in {time.time() - started:.1f}s")
+    return target
+
+
+def parse_names(value):
+    """Class names stored as a dict repr (ONNX/OpenVINO metadata) -> {id: name}"""
+    if isinstance(value, str):
+        value = ast.literal_eval(value)
+    return {int(k): v for k, v in value.items()}
+
+
+class InferenceBackend:
+    """Base class: predict() takes BGR frames and returns per-frame arrays"""
+
+    name = "base"
+    dynamic_shapes = True  # accepts any imgsz (multiple of 32) at predict time
+    stride = None          # pad inputs to a multiple of this instead of a square
+
+    def __init__(self, model_path, imgsz=640, device="cpu", precision="fp32", calibration_dir=None):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.device = device
+        self.precision = precision
+        self.calibration_dir = calibration_dir
+        self.names = {}
+
+    def load(self):
+        raise NotImplementedError
+
+    def forward(self, batch):
+        """Run the network on an NCHW float32 batch, return (N, 4 + C, A)"""
+        raise NotImplementedError
+
+    def predict(self, frames, conf=0.25, iou=0.45, max_det=300, imgsz=None, classes=None, class_conf=None):
+        """classes (allowed ids) and class_conf ({id: threshold}) are applied before NMS"""
+        imgsz = imgsz if imgsz and self.dynamic_shapes else self.imgsz
+        batch, transforms = make_batch(frames, imgsz, self.stride)
+        outputs = self.forward(batch)
+        return decode_batch(outputs, transforms, conf, iou, max_det, classes, class_conf)
+
+
+class TorchBackend(InferenceBackend):
+    """Eager PyTorch through Ultralytics (the original path)"""
+
+    name = "torch"
+
+    def load(self):
+        from ultralytics import YOLO
+        self.model = YOLO(self.model_path)
+        if self.device == 'cuda':
+            self.model.to('cuda')
+        self.names = self.model.names
+        return self
+
+    def predict(self, frames, conf=0.25, iou=0.45, max_det=300, imgsz=None, classes=None, class_conf=None):
+        # Ultralytics takes one conf: run at the lowest threshold, check per-class ones after
+        thresholds = class_thresholds(len(self.names), conf, class_conf, classes) if class_conf else None
+        lowest = min([conf] + list(class_conf.values())) if class_conf else conf
+        results = self.model(list(frames), conf=lowest, iou=iou, max_det=max_det, imgsz=imgsz or self.imgsz,
+                             classes=classes, verbose=False, device=self.device)
+        outputs = []
+        for result in results:
+            boxes = result.boxes
+            xyxy = boxes.xyxy.cpu().numpy().astype(np.float32)
+            scores = boxes.conf.cpu().numpy().astype(np.float32)
+            class_ids = boxes.cls.cpu().numpy().astype(np.int32)
+            if thresholds is not None:
+                keep = scores >= thresholds[class_ids]
+                xyxy, scores, class_ids = xyxy[keep], scores[keep], class_ids[keep]
+            outputs.append((xyxy, scores, class_ids))
+        return outputs
+
+
+class TorchRawBackend(InferenceBackend):
+    """Ultralytics' PyTorch model called directly; our letterbox, decode and NMS"""
+
+    name = "torch-raw"
+
+    def load(self):
+        import torch
+        from ultralytics import YOLO
+        yolo = YOLO(self.model_path)
+        self.names = yolo.names
+        self.model = yolo.model.fuse(verbose=False).to(self.device).eval()
+        # Rectangular inputs like Ultralytics' predictor: a 640x480 frame runs at 640x480, not 640x640
+        self.stride = int(self.model.stride.max())
+        self.torch = torch
+        return self
+
+    def forward(self, batch):
+        with self.torch.inference_mode():
+            output = self.model(self.torch.from_numpy(batch).to(self.device))
+        # Eval mode returns (predictions, feature maps)
+        output = output[0] if isinstance(output, (list, tuple)) else output
+        return output.float().cpu().numpy()
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime CPU session; the only backend with FP16/INT8 variants (see quantize.py)"""
+
+    name = "onnxruntime"
+
+    def load(self):
+        import onnxruntime as ort
+        from quantize import prepare_precision
+        path = prepare_precision(self.model_path, self.precision, self.calibration_dir, self.imgsz)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = parse_names(self.session.get_modelmeta().custom_metadata_map['names'])
+        return self
+
+    def forward(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(InferenceBackend):
+    name = "openvino"
+
+    def load(self):
+        import openvino as ov
+        import yaml
+        path = export_model(self.model_path, self.name, self.imgsz)
+        core = ov.Core()
+        xml = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".xml"))
+        self.compiled = core.compile_model(core.read_model(xml), "CPU",
+                                           {"PERFORMANCE_HINT": "THROUGHPUT"})
+        self.output = self.compiled.output(0)
+        with open(os.path.join(path, "metadata.yaml"), encoding="utf-8") as f:
+            self.names = parse_names(yaml.safe_load(f)['names'])
+        return self
+
+    def forward(self, batch):
+        return self.compiled(batch)[self.output]
+
+
+class TorchScriptBackend(InferenceBackend):
+    name = "torchscript"
+    dynamic_shapes = False
+
+    def load(self):
+        import torch
+        path = export_model(self.model_path, self.name, self.imgsz)
+        extra_files = {'config.txt': ''}
+        self.model = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+        self.model.eval()
+        self.names = parse_names(json.loads(extra_files['config.txt'])['names'])
+        self.torch = torch
+        return self
+
+    def forward(self, batch):
+        outputs = []
+        # Exported without dynamic axes: run the batch one image at a time
+        with self.torch.inference_mode():
+            for image in batch:
+                output = self.model(self.torch.from_numpy(image[None]))
+                outputs.append((output[0] if isinstance(output, (list, tuple)) else output)[0].numpy())
+        return outputs
+
+
+BACKENDS = {
+    'torch': TorchBackend,
+    'torch-raw': TorchRawBackend,
+    'onnxruntime': OnnxRuntimeBackend,
+    'openvino': OpenVinoBackend,
+    'torchscript': TorchScriptBackend,
+}
+
+
+def check_precision(backend, precision):
+    """Reduced precision is an ONNX Runtime feature; resolve 'auto' to it"""
+    if precision == "fp32":
+        return backend
+    if backend not in ("auto", "onnxruntime"):
+        raise ValueError(f"precision {precision} needs the onnxruntime backend, not {backend}")
+    return "onnxruntime"
+
+
+def select_backend(model_path, backend="auto", imgsz=640, device="cpu", precision="fp32",
+                   calibration_dir=None):
+    """Load the requested backend, or the fastest one that works for 'auto'"""
+    backend = check_precision(backend, precision)
+    if backend != "auto":
+        return BACKENDS[backend](model_path, imgsz, device, precision, calibration_dir).load()
+
+    # Exported runtimes are CPU paths; a GPU is best served by eager PyTorch
+    candidates = list(EAGER_BACKENDS) if device == "cuda" else available_backends()
+    for name in candidates:
+        try:
+            loaded = BACKENDS[name](model_path, imgsz, device).load()
+            logger.info(f"Using {name} backend")
+            return loaded
+        except Exception as e:
+            logger.warning(f"{name} backend unavailable ({e}), trying the next one")
+    raise RuntimeError("No inference backend could be loaded")
+
+
+def prepare_backend(model_path, backend="auto", imgsz=640, device="cpu", precision="fp32",
+                    calibration_dir=None):
+    """Resolve 'auto' and export the artifact up front; returns a concrete backend name.
+
+    Worker processes call this before forking so N workers don't race to
+    export (or quantize) the same model.
+    """
+    backend = check_precision(backend, precision)
+    if precision != "fp32":
+        from quantize import prepare_precision
+        prepare_precision(model_path, precision, calibration_dir, imgsz)
+        return backend
+    candidates = [backend] if backend != "auto" else (
+        list(EAGER_BACKENDS) if device == "cuda" else available_backends()
+    )
+    for name in candidates:
+        if name in EAGER_BACKENDS:
+            return name
+        try:
+            export_model(model_path, name, imgsz)
+            return name
+        except Exception as e:
+            if backend != "auto":
+                raise
+            logger.warning(f"{name} export failed ({e}), trying the next backend")
+    return "torch"
+
+
+def match_boxes(reference, candidate, tolerance):
+    """Fraction of reference boxes with a same-class candidate within tolerance pixels"""
+    ref_boxes, _, ref_classes = reference
+    boxes, _, classes = candidate
+    if len(ref_boxes) == 0:
+        return 1.0 if len(boxes) == 0 else 0.0
+    matched = 0
+    for box, class_id in zip(ref_boxes, ref_classes):
+        same_class = boxes[classes == class_id]
+        if len(same_class) and np.abs(same_class - box).max(axis=1).min() <= tolerance:
+            matched += 1
+    return matched / len(ref_boxes)
+
+
+def check_parity(model_path, image_dir, backend, imgsz=640, conf=0.25, iou=0.45, tolerance=2.0):
+    """Compare a backend's boxes with the eager PyTorch path on a folder of images"""
+    import cv2
+    from detection_engine import IMAGE_EXTENSIONS
+
+    reference = TorchBackend(model_path, imgsz).load()
+    candidate = select_backend(model_path, backend, imgsz)
+    scores = {}
+    for name in sorted(os.listdir(image_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        frame = cv2.imread(os.path.join(image_dir, name))
+        if frame is None:
+            continue
+        expected = reference.predict([frame], conf, iou)[0]
+        actual = candidate.predict([frame], conf, iou)[0]
+        scores[name] = match_boxes(expected, actual, tolerance)
+    return candidate.name, scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export models and check inference backends")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--list", action="store_true", help="show installed backends")
+    parser.add_argument("--export", choices=sorted(EXPORT_FORMATS), default=None,
+                        help="export and cache the model for this backend")
+    parser.add_argument("--parity", default=None, metavar="IMAGE_DIR",
+                        help="compare boxes against eager PyTorch on these images")
+    parser.add_argument("--backend", default="auto", choices=["auto"] + list(BACKENDS))
+    parser.add_argument("--tolerance", type=float, default=2.0, help="max box error in pixels")
+    parser.add_argument("--min-match", type=float, default=0.95,
+                        help="minimum fraction of matched boxes per image")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.list:
+        print("Available backends (fastest first): " + ", ".join(available_backends()))
+    if args.export:
+        print(export_model(args.model, args.export, args.imgsz, force=True))
+    if args.parity:
+        name, scores = check_parity(args.model, args.parity, args.backend, args.imgsz,
+                                    tolerance=args.tolerance)
+        failures = {image: score for image, score in scores.items() if score < args.min_match}
+        for image, score in sorted(scores.items()):
+            print(f"{image}: {score * 100:.1f}% of boxes within {args.tolerance}px")
+        print(f"{name}: {len(scores) - len(failures)}/{len(scores)} images match")
+        return 1 if failures or not scores else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Micro-batching inference scheduler.
+
+Frames submitted from any number of sources (threads) are collected until
+either max_batch_size frames are waiting or the oldest one has waited
+max_wait seconds. The batch then goes through a single YOLO forward pass and
+every caller gets its own DetectionResult back through a Future, in the order
+it was submitted. A request may carry a deadline; if it is still queued when
+the deadline passes it is failed with DeadlineExceeded instead of being run.
+
+    scheduler = BatchScheduler.from_preset(engine, "throughput").start()
+    detection = scheduler.submit(frame, source_id=2).result()
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from queue import Full
+
+
+logger = logging.getLogger(__name__)
+
+# Latency/throughput trade-offs: bigger batches use the CPU better but every
+# frame may wait up to max_wait for the batch to fill
+BATCH_PRESETS = {
+    'latency': {'max_batch_size': 1, 'max_wait': 0.0},
+    'balanced': {'max_batch_size': 4, 'max_wait': 0.010},
+    'throughput': {'max_batch_size': 16, 'max_wait': 0.050},
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The frame's deadline passed before it reached the model; it was not run"""
+
+
+class BatchRequest:
+    __slots__ = ('frame', 'source_id', 'frame_index', 'future', 'submitted', 'deadline')
+
+    def __init__(self, frame, source_id, frame_index, deadline=None):
+        self.frame = frame
+        self.source_id = source_id
+        self.frame_index = frame_index
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.deadline = deadline  # time.perf_counter() value, or None
+
+
+class BatchScheduler:
+    """Collect frames from many sources into batched forward passes"""
+
+    def __init__(self, engine, max_batch_size=4, max_wait=0.010, max_pending=64):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        # Counters
+        self.batches = 0
+        self.frames = 0
+        self.total_wait = 0.0
+        self.expired = 0
+
+    @classmethod
+    def from_preset(cls, engine, preset="balanced", **overrides):
+        settings = dict(BATCH_PRESETS[preset])
+        settings.update(overrides)
+        return cls(engine, **settings)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.schedule_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def submit(self, frame, source_id=0, frame_index=0, timeout=None, deadline=None):
+        """Queue a frame and return a Future resolving to its DetectionResult.
+
+        Blocks while max_pending frames are already waiting; raises queue.Full
+        if no room frees up within timeout. deadline is a time.perf_counter()
+        value after which the frame is dropped unrun.
+        """
+        request = BatchRequest(frame, source_id, frame_index, deadline)
+        with self.condition:
+            if not self.running:
+                raise RuntimeError("BatchScheduler is not running")
+            if not self.condition.wait_for(
+                lambda: len(self.pending) < self.max_pending or not self.running, timeout
+            ):
+                raise Full("BatchScheduler queue is full")
+            self.pending.append(request)
+            self.condition.notify_all()
+        return request.future
+
+    def next_batch(self):
+        """Wait for a full batch or for the oldest frame's deadline"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending or not self.running)
+            if not self.pending:
+                return []
+
+            deadline = self.pending[0].submitted + self.max_wait
+            while self.running and len(self.pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            size = min(len(self.pending), self.max_batch_size)
+            batch = [self.pending.popleft() for _ in range(size)]
+            self.condition.notify_all()
+            return batch
+
+    def schedule_loop(self):
+        """Batching loop running in separate thread"""
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                if not self.running:
+                    break
+                continue
+            self.run_batch(batch)
+
+        # Fail anything still queued so callers don't wait forever
+        with self.condition:
+            while self.pending:
+                self.pending.popleft().future.set_exception(RuntimeError("BatchScheduler stopped"))
+
+    def run_batch(self, batch):
+        started = time.perf_counter()
+        expired = [request for request in batch if request.deadline is not None and request.deadline < started]
+        if expired:
+            self.expired += len(expired)
+            for request in expired:
+                request.future.set_exception(DeadlineExceeded("Deadline passed before inference"))
+            batch = [request for request in batch if request.deadline is None or request.deadline >= started]
+            if not batch:
+                return
+        try:
+            detections = self.engine.process_batch(
+                [request.frame for request in batch],
+                [request.frame_index for request in batch],
+                [request.source_id for request in batch],
+                preprocess=False  # callers submit frames that are ready for the model
+            )
+        except Exception as e:
+            logger.error(f"Batch inference error: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.frames += len(batch)
+        self.total_wait += sum(started - request.submitted for request in batch)
+
+        # Scatter results back in submission order
+        for request, detection in zip(batch, detections):
+            request.future.set_result(detection)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch_size': self.frames / max(self.batches, 1),
+            'avg_wait_ms': 1000 * self.total_wait / max(self.frames, 1),
+            'pending': len(self.pending),
+            'expired': self.expired,
+        }
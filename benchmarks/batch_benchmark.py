@@ -0,0 +1,120 @@
+"""CPU throughput of batched YOLO inference against batch size.
+
+Runs without a camera: frames come from a video file/image folder when
+--source is given, otherwise from a fixed-seed synthetic generator.
+
+    python benchmarks/batch_benchmark.py --batch-sizes 1 2 4 8 16
+    python benchmarks/batch_benchmark.py --scheduler --streams 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_scheduler import BatchScheduler
+from detection_engine import DEFAULT_MODEL, DetectionEngine, open_source
+
+
+def synthetic_frames(count, width=640, height=480, seed=0):
+    """Deterministic frames with a few solid rectangles on a noisy background"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        frame = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+        for _ in range(4):
+            x, y = rng.integers(0, width - 120), rng.integers(0, height - 120)
+            w, h = rng.integers(40, 120, size=2)
+            frame[y:y + h, x:x + w] = rng.integers(64, 256, size=3, dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(source, count):
+    cap = open_source(source, width=None, height=None, fps=None)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def bench_direct(engine, frames, batch_size, rounds):
+    """Call engine.process_batch() back to back"""
+    engine.process_batch(frames[:batch_size])  # warm-up
+    processed = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in range(0, len(frames) - batch_size + 1, batch_size):
+            engine.process_batch(frames[i:i + batch_size])
+            processed += batch_size
+    elapsed = time.perf_counter() - start
+    return processed / elapsed
+
+
+def bench_scheduler(engine, frames, batch_size, max_wait, streams, rounds):
+    """Feed the scheduler from several concurrent streams"""
+    scheduler = BatchScheduler(engine, max_batch_size=batch_size, max_wait=max_wait).start()
+
+    def stream(source_id):
+        for _ in range(rounds):
+            for index, frame in enumerate(frames):
+                scheduler.submit(frame, source_id=source_id, frame_index=index).result()
+
+    threads = [threading.Thread(target=stream, args=(i,)) for i in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = scheduler.stats()
+    scheduler.stop()
+    return stats['frames'] / elapsed, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch size vs throughput on CPU")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--source", default=None, help="video file or image folder (default: synthetic)")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--scheduler", action="store_true", help="go through BatchScheduler")
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--max-wait", type=float, default=0.05)
+    parser.add_argument("--json", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.source, args.frames) if args.source else synthetic_frames(args.frames)
+    engine = DetectionEngine(model_path=args.model, device=args.device)
+    engine.load()
+
+    rows = []
+    print(f"{'batch':>6} {'frames/s':>10}")
+    for batch_size in args.batch_sizes:
+        if args.scheduler:
+            fps, stats = bench_scheduler(engine, frames, batch_size, args.max_wait, args.streams, args.rounds)
+            rows.append({'batch_size': batch_size, 'fps': fps, **stats})
+        else:
+            fps = bench_direct(engine, frames, batch_size, args.rounds)
+            rows.append({'batch_size': batch_size, 'fps': fps})
+        print(f"{batch_size:>6} {fps:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'device': args.device, 'model': args.model, 'results': rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,305 @@
+"""Per-stage latency, throughput and peak memory of the detection pipeline.
+
+Runs without a camera or GPU. Frames come from the deterministic synthetic
+generator, the synthetic clip (created on first use) or any video/folder.
+Each app variant x backend combination runs in a fresh subprocess, so peak
+RSS belongs to that combination alone. Per frame it times:
+
+    capture, preprocess (flip), letterbox, inference, nms, track, annotate,
+    display_convert and the total
+
+and reports mean/p50/p95/p99 per stage, frames/sec and peak RSS as JSON.
+
+    python benchmarks/pipeline_benchmark.py --json baseline.json
+    python benchmarks/pipeline_benchmark.py --variants advanced headless --backends torch torch-raw onnxruntime
+    python benchmarks/pipeline_benchmark.py --source clip --frames 300 --json after.json
+    python benchmarks/pipeline_benchmark.py --compare baseline.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+STAGES = ("capture", "preprocess", "letterbox", "inference", "nms", "track", "annotate",
+          "display_convert", "total")
+
+# Engine and display settings of each front-end
+VARIANTS = {
+    'app': {  # app.py: Ultralytics defaults, full-size annotate, new PIL image per frame
+        'conf': 0.25, 'iou': 0.7, 'max_det': 300, 'flip': False, 'track': False,
+        'display': None, 'reuse_display_buffer': False,
+    },
+    'enhanced': {  # enhanced_app.py: 800x600 display through TkDisplaySink
+        'conf': 0.5, 'iou': 0.7, 'max_det': 300, 'flip': False, 'track': False,
+        'display': (800, 600), 'reuse_display_buffer': True,
+    },
+    'advanced': {  # advanced_app.py: flipped camera, tracker ids, 900x600 display
+        'conf': 0.5, 'iou': 0.45, 'max_det': 100, 'flip': True, 'track': True,
+        'display': (900, 600), 'reuse_display_buffer': True,
+    },
+    'headless': {  # detection_engine.py: no drawing at all
+        'conf': 0.5, 'iou': 0.45, 'max_det': 100, 'flip': False, 'track': False,
+        'display': None, 'annotate': False,
+    },
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unavailable"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes vs KB
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20  # Windows
+    except (ImportError, AttributeError):
+        return None
+
+
+def open_frames(spec, count):
+    from synthetic import SyntheticSource, ensure_clip
+    from detection_engine import open_source
+
+    if spec == "synthetic":
+        return SyntheticSource(frames=count)
+    path = ensure_clip() if spec == "clip" else spec
+    return open_source(path, width=None, height=None, fps=None)
+
+
+def predict_stages(engine, frame):
+    """Run one frame through the engine, timing letterbox, inference and NMS separately"""
+    from postprocess import decode_batch, make_batch
+
+    backend = engine.backend
+    if backend is None:
+        # Eager PyTorch: Ultralytics measures its own stages (milliseconds)
+        started = time.perf_counter()
+        results = engine.infer(frame)
+        detection = engine.postprocess(results, frame)
+        elapsed = time.perf_counter() - started
+        speed = results[0].speed
+        letterbox, nms = speed['preprocess'] / 1000, speed['postprocess'] / 1000
+        return detection, letterbox, elapsed - letterbox - nms, nms
+
+    started = time.perf_counter()
+    batch, transforms = make_batch([frame], engine.imgsz if backend.dynamic_shapes else backend.imgsz,
+                                   backend.stride)
+    letterboxed = time.perf_counter()
+    outputs = backend.forward(batch)
+    inferred = time.perf_counter()
+    arrays = decode_batch(outputs, transforms, engine.confidence_threshold, engine.iou_threshold,
+                          engine.max_detections)[0]
+    detection = engine.postprocess([arrays], frame)
+    done = time.perf_counter()
+    return detection, letterboxed - started, inferred - letterboxed, done - inferred
+
+
+def run_variant(variant, backend, source_spec, frames, warmup, imgsz, model):
+    """Child process: time every stage for one variant/backend, return the summary dict"""
+    import cv2
+    from detection_engine import DetectionEngine
+    from frame_pool import FramePool
+    from renderer import fit_size
+    from tracker import MultiObjectTracker
+
+    config = VARIANTS[variant]
+    engine = DetectionEngine(model_path=model, device="cpu", backend=backend, imgsz=imgsz,
+                             confidence_threshold=config['conf'], iou_threshold=config['iou'],
+                             max_detections=config['max_det'], flip=config['flip'])
+    started = time.perf_counter()
+    engine.load()
+    load_time = time.perf_counter() - started
+
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    tracker = MultiObjectTracker() if config['track'] else None
+    pool = FramePool()
+    source = open_frames(source_spec, frames + warmup)
+    timings = {stage: [] for stage in STAGES}
+    detections = 0
+    measured_start = None
+
+    for i in range(warmup + frames):
+        if i == warmup:
+            measured_start = time.perf_counter()
+        t0 = time.perf_counter()
+        ret, frame = source.read()
+        if not ret:
+            # Loop short clips
+            source.release()
+            source = open_frames(source_spec, frames + warmup)
+            ret, frame = source.read()
+            if not ret:
+                raise RuntimeError(f"No frames from {source_spec}")
+        t1 = time.perf_counter()
+        frame = engine.preprocess(frame, out=pool.scratch("flip", frame.shape) if engine.flip else None)
+        t2 = time.perf_counter()
+        detection, letterbox, inference, nms = predict_stages(engine, frame)
+        t3 = time.perf_counter()
+        if tracker is not None:
+            detection.track_ids = tracker.update(detection.boxes, detection.scores, detection.class_ids)
+        t4 = time.perf_counter()
+
+        annotated = None
+        if config.get('annotate', True):
+            size = fit_size(frame.shape, *config['display']) if config['display'] else None
+            annotated = engine.annotate(detection, size, pool if config['display'] else None)
+        t5 = time.perf_counter()
+        if annotated is not None:
+            if config['reuse_display_buffer']:
+                rgb = pool.scratch("rgb", annotated.shape)
+                cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB, dst=rgb)
+            else:
+                rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+                if Image is not None:
+                    Image.fromarray(rgb)
+        t6 = time.perf_counter()
+
+        if i >= warmup:
+            detections += detection.count
+            for stage, value in (("capture", t1 - t0), ("preprocess", t2 - t1), ("letterbox", letterbox),
+                                 ("inference", inference), ("nms", nms), ("track", t4 - t3),
+                                 ("annotate", t5 - t4), ("display_convert", t6 - t5), ("total", t6 - t0)):
+                timings[stage].append(value)
+    wall = time.perf_counter() - measured_start
+    source.release()
+
+    stages = {}
+    for stage, values in timings.items():
+        ms = np.array(values) * 1000
+        stages[stage] = {
+            'mean': float(ms.mean()),
+            'p50': float(np.percentile(ms, 50)),
+            'p95': float(np.percentile(ms, 95)),
+            'p99': float(np.percentile(ms, 99)),
+        }
+    return {
+        'variant': variant,
+        'backend': engine.backend_name,
+        'frames': frames,
+        'fps': frames / wall,
+        'load_s': load_time,
+        'avg_detections': detections / frames,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages_ms': stages,
+    }
+
+
+def run_child(variant, backend, args):
+    """Run one combination in a fresh interpreter; returns its summary or an error entry"""
+    command = [sys.executable, os.path.abspath(__file__), "--child", variant, backend,
+               "--source", args.source, "--frames", str(args.frames), "--warmup", str(args.warmup),
+               "--imgsz", str(args.imgsz), "--model", args.model]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {'variant': variant, 'backend': backend,
+                'error': (completed.stderr.strip().splitlines() or ["unknown error"])[-1]}
+    return json.loads(lines[-1])
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def print_results(results):
+    print(f"{'variant':>10} {'backend':>12} {'fps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'infer p50':>10} {'rss MB':>8}")
+    for row in results:
+        if 'error' in row:
+            print(f"{row['variant']:>10} {row['backend']:>12}  failed: {row['error']}")
+            continue
+        total, inference = row['stages_ms']['total'], row['stages_ms']['inference']
+        rss = f"{row['peak_rss_mb']:.0f}" if row['peak_rss_mb'] is not None else "-"
+        print(f"{row['variant']:>10} {row['backend']:>12} {row['fps']:>7.1f} {total['p50']:>8.1f} "
+              f"{total['p95']:>8.1f} {total['p99']:>8.1f} {inference['p50']:>10.1f} {rss:>8}")
+
+
+def compare(base_path, new_path):
+    """Print throughput and latency changes between two result files"""
+    with open(base_path, encoding="utf-8") as f:
+        base = {(r['variant'], r['backend']): r for r in json.load(f)['results'] if 'error' not in r}
+    with open(new_path, encoding="utf-8") as f:
+        new = {(r['variant'], r['backend']): r for r in json.load(f)['results'] if 'error' not in r}
+    print(f"{'variant':>10} {'backend':>12} {'fps':>16} {'p50 ms':>16} {'p95 ms':>16}")
+    for key in sorted(base.keys() & new.keys()):
+        old_row, new_row = base[key], new[key]
+        cells = []
+        for old, current in ((old_row['fps'], new_row['fps']),
+                             (old_row['stages_ms']['total']['p50'], new_row['stages_ms']['total']['p50']),
+                             (old_row['stages_ms']['total']['p95'], new_row['stages_ms']['total']['p95'])):
+            cells.append(f"{current:.1f} ({(current / old - 1) * 100:+.0f}%)" if old else f"{current:.1f}")
+        print(f"{key[0]:>10} {key[1]:>12} " + " ".join(f"{cell:>16}" for cell in cells))
+    return 0
+
+
+def main(argv=None):
+    from backends import available_backends
+    from detection_engine import DEFAULT_MODEL
+
+    parser = argparse.ArgumentParser(description="Per-stage pipeline benchmark (CPU, no camera)")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-raw"],
+                        help="backends to run ('installed' for every installed one)")
+    parser.add_argument("--source", default="synthetic",
+                        help="'synthetic', 'clip' (generated once) or a video file / image folder")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), default=None,
+                        help="compare two result files instead of running")
+    parser.add_argument("--child", nargs=2, metavar=("VARIANT", "BACKEND"), default=None,
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+    if args.child:
+        variant, backend = args.child
+        result = run_variant(variant, backend, args.source, args.frames, args.warmup, args.imgsz, args.model)
+        print(json.dumps(result))
+        return 0
+
+    backends = available_backends() if args.backends == ["installed"] else args.backends
+    results = [run_child(variant, backend, args) for backend in backends for variant in args.variants]
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'environment': environment(), 'source': args.source, 'frames': args.frames,
+                       'warmup': args.warmup, 'imgsz': args.imgsz, 'model': args.model,
+                       'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+"""Post-processing cost per frame: Ultralytics NMS + Results against decode_batch().
+
+No model or camera needed: raw (N, 4 + C, A) YOLOv8 outputs are synthesized
+with a cluster of overlapping high-scoring anchors around each object, so NMS
+has real work to do. --dense adds that many scattered mid-confidence anchors
+per image, like a busy scene at a low threshold, where NMS cost dominates.
+Both paths start from the same output and end with the boxes/scores/class_ids
+arrays the pipeline keeps:
+
+    ultralytics  ops.non_max_suppression -> scale_boxes -> Results -> .cpu().numpy()
+    raw          postprocess.decode_batch (the torch-raw and exported backends)
+
+Times are per frame. Allocations are the peak memory tracemalloc sees per
+frame (Python objects and numpy buffers); torch's CPU allocator is not
+traced, so the Ultralytics figure is a lower bound.
+
+    python benchmarks/postprocess_benchmark.py --batch 1 8 --objects 5 50
+    python benchmarks/postprocess_benchmark.py --batch 1 4 --dense 1500 --conf 0.1 --max-det 100
+    python benchmarks/postprocess_benchmark.py --classes 0 2 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import decode_batch
+
+
+NUM_CLASSES = 80
+NAMES = {i: str(i) for i in range(NUM_CLASSES)}
+ANCHORS_PER_OBJECT = 12
+
+
+def synthetic_output(batch, objects, dense=0, imgsz=640, anchors=8400, seed=0):
+    """(batch, 4 + 80, anchors) output: background noise, a cluster per object and
+    dense scattered candidates scoring 0.1-0.6"""
+    rng = np.random.default_rng(seed)
+    output = np.empty((batch, 4 + NUM_CLASSES, anchors), dtype=np.float32)
+    output[:, 0:2] = rng.uniform(0, imgsz, (batch, 2, anchors))
+    output[:, 2:4] = rng.uniform(4, imgsz / 4, (batch, 2, anchors))
+    output[:, 4:] = rng.uniform(0, 0.05, (batch, NUM_CLASSES, anchors))
+    for image in range(batch):
+        clusters = rng.choice(anchors, objects * ANCHORS_PER_OBJECT, replace=False)
+        for ids in clusters.reshape(objects, ANCHORS_PER_OBJECT):
+            center = rng.uniform(64, imgsz - 64, 2)
+            size = rng.uniform(16, 128, 2)
+            output[image, 0:2, ids] = center + rng.normal(0, 2, (len(ids), 2))
+            output[image, 2:4, ids] = size + rng.normal(0, 2, (len(ids), 2))
+            output[image, 4 + rng.integers(NUM_CLASSES), ids] = rng.uniform(0.3, 0.95, len(ids))
+        scattered = rng.choice(anchors, min(dense, anchors), replace=False)
+        output[image, 4 + rng.integers(NUM_CLASSES, size=len(scattered)), scattered] = \
+            rng.uniform(0.1, 0.6, len(scattered))
+    return output
+
+
+def ultralytics_path(output, frames, imgsz, conf, iou, max_det, classes):
+    import torch
+    from ultralytics.engine.results import Results
+    from ultralytics.utils import ops
+
+    predictions = ops.non_max_suppression(torch.from_numpy(output), conf, iou, classes=classes,
+                                          max_det=max_det)
+    arrays = []
+    for prediction, frame in zip(predictions, frames):
+        prediction[:, :4] = ops.scale_boxes((imgsz, imgsz), prediction[:, :4], frame.shape)
+        boxes = Results(frame, path="", names=NAMES, boxes=prediction).boxes
+        arrays.append((
+            boxes.xyxy.cpu().numpy().astype(np.float32),
+            boxes.conf.cpu().numpy().astype(np.float32),
+            boxes.cls.cpu().numpy().astype(np.int32),
+        ))
+    return arrays
+
+
+def raw_path(output, transforms, conf, iou, max_det, classes):
+    return decode_batch(output, transforms, conf, iou, max_det, classes=classes)
+
+
+def time_call(function, rounds):
+    function()  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds
+
+
+def peak_allocation(function):
+    """Peak bytes allocated (and visible to tracemalloc) during one call"""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def bench(batch, objects, dense, args):
+    output = synthetic_output(batch, objects, dense, args.imgsz)
+    frames = [np.zeros((args.height, args.width, 3), dtype=np.uint8)] * batch
+    ratio = min(args.imgsz / args.height, args.imgsz / args.width)
+    pad = ((args.imgsz - round(args.width * ratio)) // 2, (args.imgsz - round(args.height * ratio)) // 2)
+    transforms = [(ratio, pad, (args.height, args.width))] * batch
+    settings = (args.conf, args.iou, args.max_det, args.classes)
+
+    raw = lambda: raw_path(output, transforms, *settings)
+    row = {
+        'batch': batch,
+        'objects': objects,
+        'dense': dense,
+        'raw_ms': 1000 * time_call(raw, args.rounds) / batch,
+        'raw_kb': peak_allocation(raw) / 1024 / batch,
+        'raw_detections': sum(len(scores) for _, scores, _ in raw()) / batch,
+    }
+    try:
+        ultralytics = lambda: ultralytics_path(output.copy(), frames, args.imgsz, *settings)
+        row.update({
+            'ultralytics_ms': 1000 * time_call(ultralytics, args.rounds) / batch,
+            'ultralytics_kb': peak_allocation(ultralytics) / 1024 / batch,
+            'ultralytics_detections': sum(len(scores) for _, scores, _ in ultralytics()) / batch,
+        })
+    except ImportError as e:
+        row['ultralytics_error'] = str(e)
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Ultralytics NMS + Results with decode_batch()")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--objects", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--dense", type=int, nargs="+", default=[0, 1500],
+                        help="scattered candidate anchors per image (0: clustered objects only)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-det", type=int, default=300)
+    parser.add_argument("--classes", type=int, nargs="+", default=None, help="class allowlist")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    rows = [bench(batch, objects, dense, args)
+            for batch in args.batch for objects in args.objects for dense in args.dense]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"{'batch':>6} {'objects':>8} {'dense':>6} {'ultralytics ms':>15} {'raw ms':>8} {'speedup':>8} "
+          f"{'ultralytics KB':>15} {'raw KB':>8} {'boxes':>12}")
+    for row in rows:
+        if 'ultralytics_error' in row:
+            print(f"{row['batch']:>6} {row['objects']:>8} {row['dense']:>6} {'-':>15} "
+                  f"{row['raw_ms']:>8.3f} {'-':>8} {'-':>15} {row['raw_kb']:>8.0f} {row['raw_detections']:>12.1f}")
+            continue
+        print(f"{row['batch']:>6} {row['objects']:>8} {row['dense']:>6} {row['ultralytics_ms']:>15.3f} "
+              f"{row['raw_ms']:>8.3f} {row['ultralytics_ms'] / row['raw_ms']:>7.1f}x {row['ultralytics_kb']:>15.0f} "
+              f"{row['raw_kb']:>8.0f} {row['ultralytics_detections']:>5.1f}/{row['raw_detections']:<6.1f}")
+    if any('ultralytics_error' in row for row in rows):
+        print("(ultralytics not installed: raw path only)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Overlay drawing cost: Ultralytics Results.plot() against DetectionRenderer.
+
+No model or camera needed: boxes are random and Results objects are built
+directly. Both paths end with a display-size BGR image, which is what the
+apps show, so plot() is timed together with the resize that follows it.
+
+    python benchmarks/render_benchmark.py --boxes 1 10 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import DetectionResult
+from frame_pool import FramePool
+from renderer import DetectionRenderer, fit_size
+
+
+NAMES = {i: name for i, name in enumerate((
+    "person", "bicycle", "car", "motorcycle", "bus", "truck", "traffic light", "dog", "cat", "chair",
+))}
+
+
+def random_detections(count, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width - 60, count)
+    y1 = rng.uniform(0, height - 60, count)
+    w = rng.uniform(20, min(width, height) / 3, count)
+    h = rng.uniform(20, min(width, height) / 3, count)
+    boxes = np.stack([x1, y1, np.minimum(x1 + w, width), np.minimum(y1 + h, height)], axis=1)
+    scores = rng.uniform(0.25, 1.0, count)
+    class_ids = rng.integers(0, len(NAMES), count)
+    return boxes.astype(np.float32), scores.astype(np.float32), class_ids.astype(np.int32)
+
+
+def time_call(function, rounds):
+    function()  # warm-up (glyph cache, buffers)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return 1000 * (time.perf_counter() - start) / rounds
+
+
+def bench(count, frame, display_size, rounds):
+    import torch
+    from ultralytics.engine.results import Results
+
+    boxes, scores, class_ids = random_detections(count, frame.shape[1], frame.shape[0])
+    data = torch.from_numpy(np.concatenate([boxes, scores[:, None], class_ids[:, None]], axis=1))
+    results = Results(frame, path="", names=NAMES, boxes=data)
+    detection = DetectionResult(boxes, scores, class_ids, NAMES, frame=frame)
+    renderer = DetectionRenderer()
+    pool = FramePool()
+
+    return {
+        'boxes': count,
+        'plot_ms': time_call(lambda: cv2.resize(results.plot(), display_size), rounds),
+        'render_full_ms': time_call(lambda: renderer.render(detection, pool=pool), rounds),
+        'render_display_ms': time_call(lambda: renderer.render(detection, display_size, pool), rounds),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Results.plot() with DetectionRenderer")
+    parser.add_argument("--boxes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--display", type=int, nargs=2, default=[900, 600], metavar=("W", "H"))
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(args.height, args.width, 3), dtype=np.uint8)
+    display_size = fit_size(frame.shape, *args.display)
+
+    rows = [bench(count, frame, display_size, args.rounds) for count in args.boxes]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    print(f"{args.width}x{args.height} frame, display {display_size[0]}x{display_size[1]}")
+    print(f"{'boxes':>6} {'plot+resize ms':>15} {'render full ms':>15} {'render display ms':>18} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['boxes']:>6} {row['plot_ms']:>15.2f} {row['render_full_ms']:>15.2f} "
+              f"{row['render_display_ms']:>18.2f} {row['plot_ms'] / row['render_display_ms']:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Deterministic frames for benchmarks that must run without a camera.
+
+SyntheticSource behaves like cv2.VideoCapture: a fixed textured background
+with shapes moving on bouncing paths. The same seed always gives the same
+frames, so runs on different machines or commits see identical input.
+write_clip() encodes those frames to a short video, and ensure_clip()
+creates the default benchmark clip on first use, so the clip path is
+stable without committing a binary file.
+
+    source = SyntheticSource(640, 480, frames=300)
+    clip = ensure_clip()          # benchmarks/data/synthetic_640x480.avi
+"""
+import os
+
+import cv2
+import numpy as np
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_CLIP = os.path.join(DATA_DIR, "synthetic_640x480.avi")
+
+
+def bounce(start, velocity, span, t):
+    """Position after t frames moving back and forth inside [0, span]"""
+    if span <= 0:
+        return 0
+    position = (start + velocity * t) % (2 * span)
+    return int(position if position <= span else 2 * span - position)
+
+
+class SyntheticSource:
+    """cv2.VideoCapture-like reader producing the same moving shapes for a seed"""
+
+    def __init__(self, width=640, height=480, frames=300, objects=6, fps=30.0, seed=0):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.fps = fps
+        self.index = 0
+        rng = np.random.default_rng(seed)
+
+        # Low-contrast blocky texture, so frames are neither flat nor pure noise
+        blocks = rng.integers(30, 90, size=(height // 16 + 1, width // 16 + 1, 3), dtype=np.uint8)
+        self.background = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_LINEAR)
+
+        self.objects = []
+        for _ in range(objects):
+            w, h = (int(v) for v in rng.integers(40, min(width, height) // 3, size=2))
+            self.objects.append({
+                'size': (w, h),
+                'start': (float(rng.uniform(0, width - w)), float(rng.uniform(0, height - h))),
+                'velocity': (float(rng.uniform(-6, 6)), float(rng.uniform(-4, 4))),
+                'color': tuple(int(c) for c in rng.integers(100, 256, size=3)),
+                'ellipse': bool(rng.integers(0, 2)),
+            })
+
+    def isOpened(self):
+        return self.index < self.frames
+
+    def render(self, t):
+        frame = self.background.copy()
+        for obj in self.objects:
+            w, h = obj['size']
+            x = bounce(obj['start'][0], obj['velocity'][0], self.width - w, t)
+            y = bounce(obj['start'][1], obj['velocity'][1], self.height - h, t)
+            if obj['ellipse']:
+                cv2.ellipse(frame, (x + w // 2, y + h // 2), (w // 2, h // 2), 0, 0, 360, obj['color'], -1)
+            else:
+                cv2.rectangle(frame, (x, y), (x + w, y + h), obj['color'], -1)
+        return frame
+
+    def read(self, image=None):
+        if self.index >= self.frames:
+            return False, None
+        frame = self.render(self.index)
+        self.index += 1
+        return True, frame
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FRAME_COUNT: float(self.frames),
+            cv2.CAP_PROP_FRAME_WIDTH: float(self.width),
+            cv2.CAP_PROP_FRAME_HEIGHT: float(self.height),
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_POS_FRAMES: float(self.index),
+        }.get(prop, 0.0)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.index = int(value)
+            return True
+        return False
+
+    def release(self):
+        self.index = self.frames
+
+
+def write_clip(path, width=640, height=480, frames=150, fps=30.0, seed=0):
+    """Encode a synthetic clip (MJPG, readable by every OpenCV build)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    source = SyntheticSource(width, height, frames, fps=fps, seed=seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    try:
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def ensure_clip(path=DEFAULT_CLIP):
+    if not os.path.exists(path):
+        write_clip(path)
+    return path
@@ -0,0 +1,107 @@
+"""Small-object recall and throughput: plain downscale vs tiled inference.
+
+Needs a labeled high-resolution dataset in YOLO txt format (see evaluate.py).
+Each image is run twice, once downscaled to imgsz as usual and once cut into
+overlapping imgsz tiles (plus a full-frame pass) by regions.RegionPlan.
+
+    python benchmarks/tiling_benchmark.py --dataset datasets/drone-1080p
+    python benchmarks/tiling_benchmark.py --dataset datasets/drone-1080p --tile 512 --overlap 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection_engine import DEFAULT_MODEL, DetectionEngine
+from evaluate import DetectionEvaluator, load_dataset, scale_labels
+from regions import RegionPlan
+
+
+SMALL_AREA = 32 * 32  # COCO "small" objects
+
+
+def load_images(root, max_images):
+    images = []
+    for image_path, rows in load_dataset(root):
+        if max_images and len(images) >= max_images:
+            break
+        frame = cv2.imread(image_path)
+        if frame is not None:
+            images.append((frame, *scale_labels(rows, frame.shape)))
+    return images
+
+
+def bench(engine, images, regions):
+    """Run every image once; returns throughput and accuracy for this configuration"""
+    engine.regions = regions
+    engine.process(images[0][0])  # warm-up
+    evaluator, small = DetectionEvaluator(), DetectionEvaluator()
+    start = time.perf_counter()
+    for frame, gt_boxes, gt_classes in images:
+        detection = engine.process(frame)
+        evaluator.add(detection.boxes, detection.scores, detection.class_ids, gt_boxes, gt_classes)
+        areas = np.prod(gt_boxes[:, 2:] - gt_boxes[:, :2], axis=1)
+        is_small = areas < SMALL_AREA
+        small.add(detection.boxes, detection.scores, detection.class_ids,
+                  gt_boxes[is_small], gt_classes[is_small])
+    elapsed = time.perf_counter() - start
+    summary = evaluator.summary()
+    return {
+        'fps': len(images) / elapsed,
+        'map50': summary['map50'],
+        'recall50': summary['recall50'],
+        'small_recall50': small.recall(0),
+        'small_objects': int(sum(len(classes) for classes in small.gt_classes)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plain vs tiled inference on a high-resolution dataset")
+    parser.add_argument("--dataset", required=True, help="YOLO-format dataset root (images/, labels/)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--tile", type=int, default=None, help="tile size (default: imgsz)")
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--max-images", type=int, default=None)
+    parser.add_argument("--json", default=None, help="write results to this file")
+    args = parser.parse_args(argv)
+
+    images = load_images(args.dataset, args.max_images)
+    if not images:
+        parser.error(f"no labeled images found in {args.dataset}")
+    engine = DetectionEngine(model_path=args.model, device=args.device, backend=args.backend,
+                             imgsz=args.imgsz)
+    engine.load()
+
+    configs = [
+        ('downscale', None),
+        ('tiled', RegionPlan(tile_size=args.tile or args.imgsz, overlap=args.overlap)),
+    ]
+    rows = []
+    print(f"{'mode':>10} {'frames/s':>10} {'mAP50':>8} {'recall':>8} {'small':>8}")
+    for name, regions in configs:
+        row = {'mode': name, **bench(engine, images, regions)}
+        if regions is not None:
+            row['windows_per_frame'] = regions.stats()['windows_per_frame']
+        rows.append(row)
+        print(f"{name:>10} {row['fps']:>10.2f} {row['map50']:>8.3f} {row['recall50']:>8.3f} "
+              f"{row['small_recall50']:>8.3f}")
+    print(f"Small objects (< 32x32 px): {rows[0]['small_objects']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'device': args.device, 'model': args.model, 'images': len(images),
+                       'results': rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
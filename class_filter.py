@@ -0,0 +1,167 @@
+"""Per-class confidence thresholds and a class allowlist, applied before NMS.
+
+A ClassFilter names the classes to keep (all when None) and optional
+confidence thresholds per class; classes without one use the engine's
+confidence_threshold. The engine hands it to the backend with every batch:
+the raw/exported decoder folds it into its candidate test, so ignored classes
+and low-scoring boxes never reach NMS, and eager Ultralytics gets classes= and
+the lowest threshold in use, with the per-class thresholds checked after.
+
+Filters are immutable: set engine.class_filter to a new one to change it,
+which takes effect on the next frame without restarting the stream.
+
+    engine.class_filter = ClassFilter(["person", "car"], thresholds={"person": 0.35})
+    engine.class_filter = ClassFilter.from_config("classes.json")
+    pipeline.sinks.append(ConfigWatcher(engine, "classes.json"))   # reload on edit
+
+    {"classes": ["person", "car", "dog"], "thresholds": {"person": 0.35, "car": 0.6}}
+"""
+import json
+import logging
+import os
+import time
+
+from postprocess import class_thresholds
+
+
+logger = logging.getLogger(__name__)
+
+
+class ClassFilter:
+    """Class allowlist plus per-class confidence thresholds, by name or id"""
+
+    def __init__(self, classes=None, thresholds=None):
+        self.classes = tuple(classes) if classes is not None else None  # names or ids; None = all
+        self.thresholds = dict(thresholds or {})                        # name or id -> confidence
+        self.cache = (None, None)                                       # (names, resolved)
+
+    @classmethod
+    def from_config(cls, path):
+        """Load {"classes": [...], "thresholds": {class: confidence}}"""
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config.get('classes'), config.get('thresholds'))
+
+    def to_config(self):
+        return {
+            'classes': list(self.classes) if self.classes is not None else None,
+            'thresholds': {str(key): value for key, value in self.thresholds.items()},
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_config(), f, indent=2)
+
+    def key(self):
+        """Picklable, comparable form; ClassFilter(*key) rebuilds the filter"""
+        return self.classes, tuple(sorted(self.thresholds.items(), key=str))
+
+    def unknown(self, names):
+        """Class names in this filter that the model doesn't have"""
+        known = set(names.values())
+        wanted = list(self.classes or ()) + list(self.thresholds)
+        # Digit strings are class ids, as in resolve()
+        return [name for name in wanted if isinstance(name, str) and not name.isdigit() and name not in known]
+
+    def resolve(self, names):
+        """(allowed class ids or None, {class id: threshold}) for a model's names"""
+        cached_names, resolved = self.cache
+        if cached_names is names:
+            return resolved
+        ids = {name: class_id for class_id, name in names.items()}
+
+        def class_id(value):
+            return int(value) if not isinstance(value, str) or value.isdigit() else ids.get(value)
+
+        classes = None
+        if self.classes is not None:
+            classes = sorted({class_id(value) for value in self.classes} - {None})
+        thresholds = {class_id(key): float(value) for key, value in self.thresholds.items()}
+        thresholds.pop(None, None)
+        resolved = (classes, thresholds)
+        self.cache = (names, resolved)
+        return resolved
+
+    def min_threshold(self, names, conf):
+        """Lowest confidence any kept class needs (what an Ultralytics conf= must be)"""
+        classes, thresholds = self.resolve(names)
+        values = [value for class_id, value in thresholds.items() if classes is None or class_id in classes]
+        if classes is None or any(class_id not in thresholds for class_id in classes):
+            values.append(conf)
+        return min(values) if values else conf
+
+    def mask(self, scores, class_ids, names, conf):
+        """Boolean mask of detections that pass, for results filtered after NMS"""
+        classes, thresholds = self.resolve(names)
+        num_classes = max(len(names), int(class_ids.max()) + 1 if len(class_ids) else 0)
+        return scores >= class_thresholds(num_classes, conf, thresholds, classes)[class_ids]
+
+    def describe(self):
+        classes = "all classes" if self.classes is None else ", ".join(map(str, self.classes))
+        if self.thresholds:
+            classes += " (" + ", ".join(f"{key} >= {value:.2f}" for key, value in self.thresholds.items()) + ")"
+        return classes
+
+
+def parse_class_filter(classes=None, thresholds=None, config=None):
+    """ClassFilter from CLI values ('person,car' and 'person=0.4,car=0.6') and/or a
+    JSON config, or None when nothing is set; command-line values override the file"""
+    # A config that doesn't exist yet is picked up by ConfigWatcher once written
+    base = ClassFilter.from_config(config) if config and os.path.exists(config) else None
+    if base is None and not classes and not thresholds:
+        return None
+    allowed = base.classes if base is not None else None
+    if classes:
+        allowed = tuple(name.strip() for name in classes.split(",") if name.strip())
+    merged = dict(base.thresholds) if base is not None else {}
+    for item in (thresholds or "").split(","):
+        if item.strip():
+            name, _, value = item.partition("=")
+            merged[name.strip()] = float(value)
+    return ClassFilter(allowed, merged)
+
+
+class ConfigWatcher:
+    """Re-read a class filter config into engine.class_filter when the file changes.
+
+    Works as a pipeline sink (checks at most every interval seconds, on the
+    pipeline thread) or by calling poll() from a GUI timer.
+    """
+
+    def __init__(self, engine, path, interval=1.0):
+        self.engine = engine
+        self.path = path
+        self.interval = interval
+        self.mtime = self.modified()
+        self.checked = time.monotonic()
+        self.reloads = 0
+
+    def modified(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def poll(self):
+        """Install and return the new ClassFilter if the file changed, else None"""
+        self.checked = time.monotonic()
+        mtime = self.modified()
+        if mtime is None or mtime == self.mtime:
+            return None
+        self.mtime = mtime
+        try:
+            class_filter = ClassFilter.from_config(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Keeping the current class filter, cannot read {self.path}: {e}")
+            return None
+        self.engine.class_filter = class_filter
+        self.reloads += 1
+        logger.info(f"Class filter reloaded: {class_filter.describe()}")
+        return class_filter
+
+    def write(self, detection):
+        if time.monotonic() - self.checked >= self.interval:
+            self.poll()
+
+    def close(self):
+        pass
@@ -0,0 +1,877 @@
+"""Headless real-time object detection engine.
+
+The detection path shared by every front-end lives here as a plain
+source -> preprocess -> infer -> postprocess -> sink pipeline. Nothing in this
+module touches Tk, CustomTkinter or PIL, so it runs on machines without a
+display and can be driven from the command line. torch and ultralytics are
+imported only when a model is loaded, so importing this module stays cheap:
+
+    python detection_engine.py --source 0 --output detections.jsonl
+    python detection_engine.py --source clip.mp4 --output clip.jsonl
+    python detection_engine.py --source images/ --output images.jsonl
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, select_backend
+from class_filter import ConfigWatcher, parse_class_filter
+from frame_capture import CaptureThread
+from frame_pool import flip_into
+from quantize import PRECISIONS
+from renderer import DetectionRenderer
+from startup import FirstFrameSink, StartupProfile
+
+
+DEFAULT_MODEL = "yolov8n.pt"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+logger = logging.getLogger(__name__)
+
+
+def detect_device():
+    """Return 'cuda' when a GPU is available, otherwise 'cpu' (imports torch)"""
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+class ImageFolderSource:
+    """cv2.VideoCapture-like reader over the images in a directory"""
+
+    def __init__(self, path):
+        self.path = path
+        self.paths = sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.index = 0
+        self.first_shape = None
+
+    def isOpened(self):
+        return self.index < len(self.paths)
+
+    def read(self, image=None):
+        while self.index < len(self.paths):
+            frame = cv2.imread(self.paths[self.index])
+            self.index += 1
+            if frame is not None:
+                return True, frame
+            logger.warning(f"Skipping unreadable image: {self.paths[self.index - 1]}")
+        return False, None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.paths))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.index)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) and self.paths:
+            # Size of the first image, so shared-memory pools can be sized before reading
+            if self.first_shape is None:
+                image = cv2.imread(self.paths[0])
+                self.first_shape = image.shape if image is not None else (0, 0)
+            return float(self.first_shape[1 if prop == cv2.CAP_PROP_FRAME_WIDTH else 0])
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.index = int(value)
+            return True
+        return False
+
+    def release(self):
+        self.index = len(self.paths)
+
+
+def open_source(source, width=640, height=480, fps=30):
+    """Open a camera index, video file/URL or image directory.
+
+    The returned object follows the cv2.VideoCapture read()/release() API.
+    Capture properties are only applied to cameras; files keep their native
+    resolution.
+    """
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    if isinstance(source, str) and os.path.isdir(source):
+        return ImageFolderSource(source)
+
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int) and cap.isOpened():
+        # Optimize camera settings for better performance
+        if width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class DetectionResult:
+    """Detections for a single frame as compact numpy arrays"""
+
+    def __init__(self, boxes, scores, class_ids, names, frame=None, results=None,
+                 timestamp=None, frame_index=0, source_id=0, lease=None):
+        self.boxes = boxes            # (N, 4) float32 xyxy in frame pixels
+        self.scores = scores          # (N,) float32
+        self.class_ids = class_ids    # (N,) int32
+        self.names = names
+        self.frame = frame
+        self.results = results        # raw Ultralytics results, if any
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.frame_index = frame_index
+        self.source_id = source_id
+        self.lease = lease            # FrameLease backing self.frame, if pooled
+        self.inference_time = None    # seconds spent in infer + postprocess (batch share)
+        self.latency = None           # seconds from frame read to sinks, set by the pipeline
+        self.track_ids = None         # (N,) int32 when a tracker is attached
+
+    @property
+    def count(self):
+        return len(self.scores)
+
+    def retain(self):
+        """Keep a pooled frame alive beyond the sink call; pair with release()"""
+        if self.lease is not None:
+            self.lease.retain()
+        return self
+
+    def release(self):
+        """Drop a frame reference; the arrays stay valid, the frame may not"""
+        if self.lease is not None and self.lease.release():
+            # The buffer is back in the pool - don't let anything draw from it
+            self.frame = None
+            self.results = None
+            self.lease = None
+
+    def filter(self, confidence_threshold=None, max_detections=None, class_filter=None):
+        """Return a DetectionResult keeping only the detections that pass"""
+        keep = np.arange(self.count)
+        if class_filter is not None:
+            keep = keep[class_filter.mask(self.scores, self.class_ids, self.names, confidence_threshold or 0.0)]
+        elif confidence_threshold is not None:
+            keep = keep[self.scores >= confidence_threshold]
+        if max_detections is not None:
+            keep = keep[:max_detections]  # detections are sorted by confidence
+        if len(keep) == self.count:
+            return self
+        filtered = DetectionResult(
+            self.boxes[keep], self.scores[keep], self.class_ids[keep], self.names,
+            frame=self.frame,
+            results=[self.results[0][keep]] if self.results is not None else None,
+            timestamp=self.timestamp, frame_index=self.frame_index, source_id=self.source_id,
+            lease=self.lease  # shared, not retained
+        )
+        filtered.inference_time = self.inference_time
+        filtered.latency = self.latency
+        if self.track_ids is not None:
+            filtered.track_ids = self.track_ids[keep]
+        return filtered
+
+    def labels(self):
+        return [self.names.get(int(class_id), str(class_id)) for class_id in self.class_ids]
+
+    def to_dict(self):
+        detections = [
+            {
+                'class_id': int(class_id),
+                'label': label,
+                'confidence': round(float(score), 4),
+                'box': [round(float(v), 1) for v in box],
+            }
+            for box, score, class_id, label in zip(
+                self.boxes, self.scores, self.class_ids, self.labels()
+            )
+        ]
+        if self.track_ids is not None:
+            for entry, track_id in zip(detections, self.track_ids):
+                entry['track_id'] = int(track_id)
+        return {
+            'timestamp': self.timestamp,
+            'source': self.source_id,
+            'frame': self.frame_index,
+            'count': self.count,
+            'detections': detections,
+        }
+
+
+class DetectionEngine:
+    """YOLO model plus the per-frame preprocess/infer/postprocess steps"""
+
+    def __init__(self, model_path=DEFAULT_MODEL, device=None, confidence_threshold=0.5,
+                 iou_threshold=0.45, max_detections=100, flip=False, backend="torch-raw", imgsz=640,
+                 precision="fp32", calibration_dir=None):
+        self.model_path = model_path
+        self.device = device         # None: detected when the model is loaded
+        self.model = None
+        self.backend_name = backend  # torch-raw, torch, onnxruntime, openvino, torchscript or auto
+        self.backend = None          # set for exported (non-torch) backends
+        self.imgsz = imgsz
+        self.precision = precision   # fp32, fp16, int8-dynamic or int8-static (see quantize.py)
+        self.calibration_dir = calibration_dir
+
+        # Settings (may be changed while a pipeline is running)
+        self.confidence_threshold = confidence_threshold
+        self.iou_threshold = iou_threshold
+        self.max_detections = max_detections
+        self.flip = flip
+
+        # Optional RegionPlan (regions.py): run on ROI crops / tiles instead of
+        # the whole downscaled frame; may be swapped while a pipeline is running
+        self.regions = None
+
+        # Optional ClassFilter (class_filter.py): class allowlist and per-class
+        # thresholds applied before NMS; may be swapped while a pipeline is running
+        self.class_filter = None
+
+        self.renderer = DetectionRenderer()
+
+    def load(self):
+        """Load the model and move it to the configured device"""
+        if self.device is None:
+            self.device = detect_device()
+        if self.backend_name != "torch" or self.precision != "fp32":
+            backend = select_backend(self.model_path, self.backend_name, self.imgsz, self.device,
+                                     self.precision, self.calibration_dir)
+            self.backend_name = backend.name
+            if backend.name != "torch":
+                self.backend = backend
+                return backend
+            self.model = backend.model
+            return self.model
+
+        from ultralytics import YOLO
+        self.model = YOLO(self.model_path)
+        if self.device == 'cuda':
+            self.model.to('cuda')
+        return self.model
+
+    def warmup(self, shape=(480, 640, 3), runs=1):
+        """Dummy inferences so the first real frame doesn't pay for lazy initialization"""
+        frame = np.zeros(shape, dtype=np.uint8)
+        started = time.perf_counter()
+        for _ in range(runs):
+            self.infer(frame)
+        return time.perf_counter() - started
+
+    @property
+    def names(self):
+        if self.backend is not None:
+            return self.backend.names
+        return self.model.names if self.model is not None else {}
+
+    def preprocess(self, frame, out=None):
+        if self.flip:
+            frame = cv2.flip(frame, 1, dst=out)  # Horizontal flip
+        return frame
+
+    @property
+    def dynamic_imgsz(self):
+        """Whether imgsz may be changed between frames (fixed-shape exports can't)"""
+        return self.backend is None or self.backend.dynamic_shapes
+
+    def class_settings(self):
+        """(class filter, allowed class ids or None, {class id: threshold}) for this frame"""
+        class_filter = self.class_filter
+        if class_filter is None:
+            return None, None, None
+        return (class_filter,) + class_filter.resolve(self.names)
+
+    def predict_args(self, class_filter=None, classes=None):
+        conf = self.confidence_threshold
+        if class_filter is not None:
+            # Ultralytics has one conf; per-class thresholds are checked in postprocess
+            conf = class_filter.min_threshold(self.names, conf)
+        return {
+            'conf': conf,
+            'iou': self.iou_threshold,
+            'max_det': self.max_detections,
+            'imgsz': self.imgsz,
+            'classes': classes,
+            'verbose': False,
+            'device': self.device,
+        }
+
+    def infer(self, frame):
+        return self.infer_batch([frame])
+
+    def infer_batch(self, frames):
+        """Run a single batched forward pass over a list of frames"""
+        class_filter, classes, thresholds = self.class_settings()
+        if self.backend is not None:
+            return self.backend.predict(
+                list(frames), self.confidence_threshold, self.iou_threshold, self.max_detections,
+                self.imgsz, classes=classes, class_conf=thresholds
+            )
+        return self.model(list(frames), **self.predict_args(class_filter, classes))
+
+    def postprocess(self, results, frame, frame_index=0, source_id=0):
+        if self.backend is not None:
+            # Exported backends already return (boxes, scores, class_ids), class filter applied
+            xyxy, scores, class_ids = results[0]
+            return DetectionResult(
+                xyxy, scores, class_ids, self.names, frame=frame,
+                frame_index=frame_index, source_id=source_id
+            )
+
+        boxes = results[0].boxes
+        if boxes is None or len(boxes) == 0:
+            xyxy = np.zeros((0, 4), dtype=np.float32)
+            scores = np.zeros(0, dtype=np.float32)
+            class_ids = np.zeros(0, dtype=np.int32)
+        else:
+            xyxy = boxes.xyxy.cpu().numpy().astype(np.float32)
+            scores = boxes.conf.cpu().numpy().astype(np.float32)
+            class_ids = boxes.cls.cpu().numpy().astype(np.int32)
+        detection = DetectionResult(
+            xyxy, scores, class_ids, self.names,
+            frame=frame, results=results,
+            frame_index=frame_index, source_id=source_id
+        )
+        class_filter = self.class_filter
+        if class_filter is not None and class_filter.thresholds:
+            detection = detection.filter(self.confidence_threshold, class_filter=class_filter)
+        return detection
+
+    def process(self, frame, frame_index=0, source_id=0, preprocess=True):
+        """Run the full preprocess -> infer -> postprocess path on one frame"""
+        if preprocess:
+            frame = self.preprocess(frame)
+        regions = self.regions
+        if regions is not None and regions.active:
+            return regions.process(self, [frame], [frame_index], [source_id])[0]
+        started = time.perf_counter()
+        results = self.infer(frame)
+        detection = self.postprocess(results, frame, frame_index, source_id)
+        detection.inference_time = time.perf_counter() - started
+        return detection
+
+    def process_batch(self, frames, frame_indices=None, source_ids=None, preprocess=True):
+        """Batched process(); returns one DetectionResult per input frame, in order"""
+        if preprocess:
+            frames = [self.preprocess(frame) for frame in frames]
+        frame_indices = frame_indices or [0] * len(frames)
+        source_ids = source_ids or [0] * len(frames)
+        regions = self.regions
+        if regions is not None and regions.active:
+            return regions.process(self, frames, frame_indices, source_ids)
+        started = time.perf_counter()
+        results = self.infer_batch(frames)
+        detections = [
+            self.postprocess(results[i:i + 1], frames[i], frame_indices[i], source_ids[i])
+            for i in range(len(frames))
+        ]
+        share = (time.perf_counter() - started) / max(len(frames), 1)
+        for detection in detections:
+            detection.inference_time = share
+        return detections
+
+    def annotate(self, detection, size=None, pool=None):
+        """Frame with boxes and labels drawn on it, optionally at display size (width, height).
+
+        Without a pool this returns a new image; with one it reuses the
+        pool's buffer (see DetectionRenderer.render).
+        """
+        return self.renderer.render(detection, size, pool)
+
+
+class RateMeter:
+    """Events per second over a sliding window of timestamps.
+
+    Averaging per-frame 1/dt values overweights short intervals (one 5 ms
+    gap counts as 200 FPS); counting frames over the window's time span
+    does not.
+    """
+
+    def __init__(self, window=30):
+        self.times = deque(maxlen=window)
+
+    def tick(self, now=None):
+        self.times.append(time.perf_counter() if now is None else now)
+
+    def rate(self):
+        if len(self.times) < 2:
+            return 0.0
+        span = self.times[-1] - self.times[0]
+        return (len(self.times) - 1) / span if span > 0 else 0.0
+
+    def reset(self):
+        self.times.clear()
+
+
+class CallbackSink:
+    """Forward every detection to a callable (used by the GUI front-ends)"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, detection):
+        self.callback(detection)
+
+    def close(self):
+        pass
+
+
+class DetectionPipeline:
+    """Pull frames from a source, run them through the engine, push to sinks"""
+
+    def __init__(self, source, engine, sinks=(), frame_skip=1, source_id=0, max_frames=None,
+                 batch_size=1, executor=None, max_in_flight=1, tracker=None, gate=None, metrics=None):
+        self.source = source
+        self.engine = engine
+        self.sinks = list(sinks)
+        self.frame_skip = frame_skip
+        self.batch_size = batch_size  # >1 batches consecutive frames (files)
+
+        # Optional asynchronous executor with submit(frame, source_id, frame_index)
+        # -> Future (BatchScheduler, ProcessInferencePool); up to max_in_flight
+        # frames are submitted before the oldest result is awaited
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.source_id = source_id
+        self.max_frames = max_frames
+
+        # Optional KeyframeTracker: full detection on keyframes only, tracks
+        # propagated in between (with an executor it only assigns track ids)
+        self.tracker = tracker
+        # Optional MotionGate: unchanged frames reuse the previous detections
+        self.gate = gate
+        # Optional metrics.Metrics; None skips every timer (may be set while running)
+        self.metrics = metrics
+
+        self.running = False
+        self.thread = None
+        self.total_frames = 0
+        self.processed_frames = 0
+        self.expired_frames = 0  # dropped by the executor after their deadline
+
+    @property
+    def captured_frames(self):
+        # A capture thread sees frames that were dropped before we read them
+        return getattr(self.source, 'captured_frames', self.total_frames)
+
+    @property
+    def dropped_frames(self):
+        return getattr(self.source, 'dropped_frames', 0)
+
+    @property
+    def efficiency(self):
+        return (self.processed_frames / max(self.captured_frames, 1)) * 100
+
+    def stats(self):
+        return {
+            'captured': self.captured_frames,
+            'dropped': self.dropped_frames,
+            'processed': self.processed_frames,
+            'expired': self.expired_frames,
+            'efficiency': self.efficiency,
+        }
+
+    def track(self, detection):
+        return self.tracker.update(detection) if self.tracker is not None else detection
+
+    def finish(self, future, lease, read_time):
+        """Emit an executor result; frames it dropped past their deadline are skipped"""
+        try:
+            detection = future.result()
+        except TimeoutError:
+            self.expired_frames += 1
+            if lease is not None:
+                lease.release()
+            return
+        self.emit(self.track(detection), lease, read_time)
+
+    def emit(self, detection, lease=None, read_time=None):
+        if lease is not None:
+            detection.lease = lease
+        if read_time is not None:
+            detection.latency = time.perf_counter() - read_time
+        self.processed_frames += 1
+        metrics = self.metrics
+        if metrics is None:
+            for sink in self.sinks:
+                sink.write(detection)
+        else:
+            self.emit_timed(detection, metrics)
+        # Sinks that keep the frame past this call retain() it themselves
+        detection.release()
+
+    def emit_timed(self, detection, metrics):
+        if detection.inference_time is not None:
+            metrics.observe("inference", detection.inference_time)
+        for sink in self.sinks:
+            started = time.perf_counter()
+            sink.write(detection)
+            metrics.observe("sink." + type(sink).__name__, time.perf_counter() - started)
+        if detection.latency is not None:
+            metrics.observe("latency", detection.latency)
+
+    def read(self):
+        """Return (frame, lease); lease is None for sources without pooled buffers"""
+        if hasattr(self.source, 'read_lease'):
+            lease = self.source.read_lease()
+            return (None, None) if lease is None else (lease.array, lease)
+        ret, frame = self.source.read()
+        return (frame if ret else None), None
+
+    def prepare(self, frame, lease):
+        """Apply the engine's preprocessing, into a pooled buffer when possible"""
+        if not self.engine.flip:
+            return frame, lease
+        if lease is not None:
+            lease = flip_into(lease, lease.pool)
+            return lease.array, lease
+        return self.engine.preprocess(frame), None
+
+    def process_single(self, frame, frame_index, lease, read_time):
+        """One frame through the optional motion gate and tracker"""
+        region = None
+        if self.gate is not None:
+            changed, region = self.gate.check(frame)
+            if not changed:
+                self.emit(self.gate.reuse(frame, frame_index, self.source_id), lease, read_time)
+                return
+            if self.engine.regions is not None and self.engine.regions.active:
+                region = None  # ROIs/tiles are in frame coordinates; run the plan on the whole frame
+
+        inferred = self.tracker is None or self.tracker.needs_detection()
+        if not inferred:
+            detection = self.tracker.propagate(frame, frame_index, self.source_id, self.engine.names)
+        else:
+            if region is not None:
+                detection = self.gate.detect_region(self.engine, frame, region, frame_index, self.source_id)
+            else:
+                detection = self.engine.process(frame, frame_index, self.source_id, preprocess=False)
+            if self.tracker is not None:
+                self.tracker.update(detection)
+        if self.gate is not None:
+            self.gate.remember(detection, cropped=region is not None, inferred=inferred)
+        self.emit(detection, lease, read_time)
+
+    def process_batch(self, batch):
+        if len(batch) == 1:
+            frame, frame_index, _, _ = batch[0]
+            detections = [self.engine.process(frame, frame_index, self.source_id, preprocess=False)]
+        else:
+            detections = self.engine.process_batch(
+                [frame for frame, _, _, _ in batch],
+                [frame_index for _, frame_index, _, _ in batch],
+                [self.source_id] * len(batch),
+                preprocess=False
+            )
+        for detection, (_, _, lease, read_time) in zip(detections, batch):
+            self.emit(detection, lease, read_time)
+
+    def run(self):
+        """Process frames until the source ends or stop() is called"""
+        self.running = True
+        batch = []
+        in_flight = deque()
+        try:
+            while self.running:
+                metrics = self.metrics
+                if metrics is not None:
+                    read_started = time.perf_counter()
+                frame, lease = self.read()
+                if frame is None:
+                    break
+                read_time = time.perf_counter()
+                if metrics is not None:
+                    # Waiting for the next frame (capture thread) or decoding it (files)
+                    metrics.observe("capture", read_time - read_started)
+
+                self.total_frames += 1
+
+                # Skip frames for better performance
+                if self.total_frames % self.frame_skip != 0:
+                    if lease is not None:
+                        lease.release()
+                    continue
+
+                frame, lease = self.prepare(frame, lease)
+                if metrics is not None:
+                    metrics.observe("preprocess", time.perf_counter() - read_time)
+                frame_index = self.total_frames - 1
+
+                if self.executor is not None:
+                    future = self.executor.submit(frame, self.source_id, frame_index)
+                    in_flight.append((future, lease, read_time))
+                    # Results are emitted in submission order
+                    while in_flight and (len(in_flight) >= self.max_in_flight or in_flight[0][0].done()):
+                        self.finish(*in_flight.popleft())
+                elif self.tracker is not None or self.gate is not None:
+                    self.process_single(frame, frame_index, lease, read_time)
+                else:
+                    batch.append((frame, frame_index, lease, read_time))
+                    if len(batch) >= self.batch_size:
+                        self.process_batch(batch)
+                        batch = []
+
+                if self.max_frames and self.processed_frames >= self.max_frames:
+                    break
+
+            if batch:
+                self.process_batch(batch)
+                batch = []
+            while in_flight:
+                self.finish(*in_flight.popleft())
+        except Exception as e:
+            logger.error(f"Detection error: {e}")
+        finally:
+            self.running = False
+            # Hand back buffers of frames that never made it to the sinks
+            for _, _, lease, _ in batch:
+                if lease is not None:
+                    lease.release()
+            for _, lease, _ in in_flight:
+                if lease is not None:
+                    lease.release()
+            self.source.release()
+
+    def start(self):
+        """Run the pipeline on a daemon thread"""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless real-time object detection")
+    parser.add_argument("--source", default="0",
+                        help="camera index, video file/URL or image directory")
+    parser.add_argument("--output", default="detections.jsonl",
+                        help="where detections go: .jsonl, .parquet, .db/.sqlite, http://... or tcp://host:port")
+    parser.add_argument("--sink-policy", choices=("drop", "block"), default="drop",
+                        help="when the output falls behind: drop records or briefly block the pipeline")
+    parser.add_argument("--sink-queue", type=int, default=1024,
+                        help="records buffered in memory before the sink policy applies")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None, help="cpu or cuda (default: auto)")
+    parser.add_argument("--backend", default="auto", choices=["auto"] + list(BACKENDS),
+                        help="inference runtime (auto: fastest installed)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32",
+                        help="reduced precision runs on onnxruntime (see quantize.py)")
+    parser.add_argument("--calibration", default=None, metavar="IMAGE_DIR",
+                        help="calibration images for --precision int8-static")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-det", type=int, default=100)
+    parser.add_argument("--classes", default=None, metavar="NAMES",
+                        help="only detect these comma-separated class names or ids (filtered before NMS)")
+    parser.add_argument("--class-conf", default=None, metavar="NAME=CONF,...",
+                        help="per-class confidence thresholds, e.g. person=0.35,car=0.6")
+    parser.add_argument("--class-config", default=None, metavar="CONFIG",
+                        help="JSON file with classes/thresholds; re-read while running when it changes")
+    parser.add_argument("--frame-skip", type=int, default=1)
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="adapt frame skip, imgsz and capture resolution to this rate")
+    parser.add_argument("--latency-budget", type=float, default=None, metavar="MS",
+                        help="with --target-fps, also keep read-to-sink latency under this")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run inference in N worker processes (0: in this process)")
+    parser.add_argument("--server", default=None, metavar="ADDRESS",
+                        help="use a running model_server.py (unix:/path.sock or tcp://host:port) "
+                             "instead of loading a model here")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="frames per forward pass (best for files and image folders)")
+    parser.add_argument("--keyframe-interval", type=int, default=0, metavar="K",
+                        help="track objects and run full detection only every K frames (0: no tracking)")
+    parser.add_argument("--motion-gate", choices=("off", "diff", "mog2"), default="off",
+                        help="reuse the previous detections while the scene is static")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="fraction of changed pixels that counts as motion")
+    parser.add_argument("--motion-crop", action="store_true",
+                        help="run the model only on the changed region when it is small")
+    parser.add_argument("--resolution", default="640x480", metavar="WxH",
+                        help="camera capture resolution (use a high one with --tile or --roi)")
+    parser.add_argument("--roi", action="append", default=[], metavar="X1,Y1,X2,Y2",
+                        help="only detect inside this region (normalized 0-1 or pixels); repeatable")
+    parser.add_argument("--tile", type=int, default=None, metavar="SIZE",
+                        help="tiled inference with SIZE x SIZE tiles for high-resolution sources")
+    parser.add_argument("--tile-overlap", type=float, default=0.2)
+    parser.add_argument("--regions", default=None, metavar="CONFIG",
+                        help="JSON file with rois/tile_size/overlap (overrides --roi/--tile)")
+    parser.add_argument("--record", default=None, metavar="DIR",
+                        help="record annotated video segments into DIR")
+    parser.add_argument("--record-trigger", default=None, metavar="CLASSES",
+                        help="with --record, only record around detections of these comma-separated classes")
+    parser.add_argument("--pre-event", type=float, default=5.0, metavar="SECONDS",
+                        help="footage kept from before a triggered recording")
+    parser.add_argument("--segment-minutes", type=float, default=5.0)
+    parser.add_argument("--raw-recording", action="store_true",
+                        help="record unannotated video plus a JSON lines detection sidecar")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="time every stage and serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--warmup", action="store_true",
+                        help="run a dummy inference before the first frame")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--flip", action="store_true", help="mirror frames horizontally")
+    parser.add_argument("--capture-thread", choices=("auto", "on", "off"), default="auto",
+                        help="read frames on a separate latest-frame-wins thread "
+                             "(auto: cameras and URLs only, files are processed frame by frame)")
+    return parser
+
+
+def main(argv=None):
+    profile = StartupProfile()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.motion_crop and (args.regions or args.roi or args.tile):
+        parser.error("--motion-crop can't be combined with --roi/--tile/--regions")
+    logging.basicConfig(level=logging.INFO)
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    source = open_source(args.source, width, height)
+    if not source.isOpened():
+        logger.error(f"Cannot open source: {args.source}")
+        return 1
+
+    engine = DetectionEngine(
+        model_path=args.model,
+        device=args.device,
+        confidence_threshold=args.conf,
+        iou_threshold=args.iou,
+        max_detections=args.max_det,
+        flip=args.flip,
+        backend=args.backend,
+        imgsz=args.imgsz,
+        precision=args.precision,
+        calibration_dir=args.calibration
+    )
+
+    if args.regions or args.roi or args.tile:
+        from regions import RegionPlan, parse_roi
+        engine.regions = RegionPlan.from_config(args.regions) if args.regions else RegionPlan(
+            rois=[parse_roi(roi) for roi in args.roi], tile_size=args.tile, overlap=args.tile_overlap
+        )
+
+    engine.class_filter = parse_class_filter(args.classes, args.class_conf, args.class_config)
+
+    pool = None
+    in_flight = args.workers or 1
+    # Shared-memory slots must fit the source's frames (4K cameras, large images)
+    slot_size = {
+        'max_width': max(int(source.get(cv2.CAP_PROP_FRAME_WIDTH)), width or 0, 1920),
+        'max_height': max(int(source.get(cv2.CAP_PROP_FRAME_HEIGHT)), height or 0, 1080),
+    }
+    if args.server:
+        from model_server import ModelClient
+        pool = ModelClient(args.server, engine, **slot_size).start()
+        in_flight = 2 * pool.size  # keep every connection busy while results come back
+    elif args.workers:
+        from process_workers import ProcessInferencePool
+        pool = ProcessInferencePool(engine, workers=args.workers, **slot_size).start()
+    else:
+        with profile.phase("model"):
+            engine.load()
+        if args.warmup:
+            with profile.phase("warmup"):
+                engine.warmup((height, width, 3))
+    profile.mark("model ready")
+
+    live = args.source.isdigit() or "://" in args.source
+    if args.capture_thread == "on" or (args.capture_thread == "auto" and live):
+        # With --workers/--server frames are read straight into the executor's shared memory
+        source = CaptureThread(source, pool=getattr(pool, 'frame_pool', None))
+    if engine.class_filter is not None:
+        names = engine.names or getattr(pool, 'names', None)
+        unknown = engine.class_filter.unknown(names) if names else []
+        if unknown:
+            logger.warning(f"Unknown classes ignored: {', '.join(unknown)}")
+        logger.info(f"Class filter: {engine.class_filter.describe()}")
+
+    tracker = None
+    if args.keyframe_interval:
+        from tracker import KeyframeTracker
+        tracker = KeyframeTracker(keyframe_interval=args.keyframe_interval)
+
+    gate = None
+    if args.motion_gate != "off":
+        from motion import MotionGate
+        gate = MotionGate(method=args.motion_gate, min_changed=args.motion_threshold,
+                          crop=args.motion_crop)
+
+    from events import open_sink
+    sink = open_sink(args.output, max_queue=args.sink_queue, policy=args.sink_policy)
+    pipeline = DetectionPipeline(
+        source, engine, sinks=[sink],
+        frame_skip=args.frame_skip, max_frames=args.max_frames, batch_size=args.batch_size,
+        executor=pool, max_in_flight=in_flight, tracker=tracker, gate=gate
+    )
+    recorder = None
+    if args.record:
+        from recorder import VideoRecorder, parse_classes
+        recorder = VideoRecorder(
+            directory=args.record, trigger_classes=parse_classes(args.record_trigger),
+            pre_event_seconds=args.pre_event, segment_seconds=args.segment_minutes * 60,
+            annotate=not args.raw_recording, sidecar=args.raw_recording
+        )
+        if not args.record_trigger:
+            recorder.start_recording()
+        pipeline.sinks.append(recorder)
+    if args.class_config:
+        pipeline.sinks.append(ConfigWatcher(engine, args.class_config))
+    if args.target_fps:
+        from adaptive import AdaptiveController
+        pipeline.sinks.append(AdaptiveController(
+            pipeline, target_fps=args.target_fps,
+            latency_budget=args.latency_budget / 1000 if args.latency_budget else None
+        ))
+
+    server = None
+    if args.metrics_port is not None:
+        from metrics import Metrics, MetricsServer, watch
+        pipeline.metrics = Metrics()
+        watch(pipeline.metrics, pipeline=pipeline, sinks=pipeline.sinks)
+        server = MetricsServer(pipeline.metrics, port=args.metrics_port).start()
+        logger.info(f"Metrics at {server.url}")
+
+    pipeline.sinks.append(FirstFrameSink(profile))
+    start_time = time.time()
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        pipeline.stop()
+    finally:
+        sink.close()
+        if recorder:
+            recorder.close()
+        if pool:
+            pool.stop()
+        if server:
+            server.stop()
+
+    elapsed = max(time.time() - start_time, 1e-6)
+    logger.info(
+        f"Processed {pipeline.processed_frames}/{pipeline.captured_frames} frames "
+        f"({pipeline.dropped_frames} dropped) in {elapsed:.1f}s ({pipeline.processed_frames / elapsed:.1f} FPS) -> {args.output}"
+    )
+    logger.info(f"Sink: {sink.stats()}")
+    if args.server:
+        logger.info(f"Model server client: {pool.stats()}")
+    if recorder:
+        logger.info(f"Recorder: {recorder.stats()}")
+    if tracker:
+        logger.info(f"Tracker: {tracker.stats()}")
+    if gate:
+        logger.info(f"Motion gate: {gate.stats()}")
+    if pipeline.metrics is not None:
+        logger.info("Stage timings:\n" + pipeline.metrics.format_summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
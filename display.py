@@ -0,0 +1,132 @@
+"""Tk display sink that draws into one reused PhotoImage.
+
+Building an Image.fromarray plus a new ImageTk.PhotoImage for every frame
+allocates a few MB per frame and makes Tk create a new image each time. This
+sink keeps one RGB numpy buffer, a PIL image that shares that buffer's memory
+and a single PhotoImage per display size. Each frame is converted BGR->RGB
+straight into the buffer and pasted into the existing PhotoImage.
+
+write() may be called from any thread. Only the newest detection is kept:
+if the mainloop falls behind, older pending frames are dropped (and counted)
+instead of queuing up behind it.
+
+    display = TkDisplaySink(root, video_label, render=lambda d, pool: engine.annotate(d, size, pool))
+    pipeline = DetectionPipeline(source, engine, sinks=[display])
+"""
+import threading
+import time
+
+import cv2
+from PIL import Image, ImageTk
+
+from frame_pool import FramePool
+from renderer import DetectionRenderer, fit_size
+
+
+class TkDisplaySink:
+    """Pipeline sink that presents the newest detection in a Tk/CTk label"""
+
+    def __init__(self, master, label, render=None, max_size=(900, 600), on_present=None):
+        self.master = master
+        self.label = label
+        self.max_size = max_size
+        self.render = render or self.default_render
+        self.on_present = on_present  # called on the Tk thread after each presented frame
+        self.metrics = None           # optional metrics.Metrics timing render and convert
+        self.pool = FramePool()
+        self.renderer = DetectionRenderer()
+
+        self.lock = threading.Lock()
+        self.pending = None
+        self.scheduled = False
+        self.closed = False
+
+        # One PhotoImage per display size, refreshed with paste()
+        self.photo = None
+        self.pil_image = None
+        self.rgb = None
+
+        # Counters
+        self.received_frames = 0
+        self.presented_frames = 0
+        self.dropped_frames = 0
+
+    def default_render(self, detection, pool):
+        size = fit_size(detection.frame.shape, *self.max_size)
+        return self.renderer.render(detection, size, pool)
+
+    def write(self, detection):
+        """Keep the newest detection and schedule a redraw (any thread)"""
+        detection.retain()
+        with self.lock:
+            if self.closed:
+                detection.release()
+                return
+            previous, self.pending = self.pending, detection
+            schedule = not self.scheduled
+            self.scheduled = True
+            self.received_frames += 1
+            if previous is not None:
+                self.dropped_frames += 1
+        if previous is not None:
+            previous.release()
+        if schedule:
+            self.master.after(0, self.present)
+
+    def present(self):
+        """Draw the pending detection (Tk thread)"""
+        with self.lock:
+            detection, self.pending = self.pending, None
+            self.scheduled = False
+        if detection is None:
+            return
+        metrics = self.metrics
+        try:
+            if metrics is not None:
+                started = time.perf_counter()
+            bgr = self.render(detection, self.pool)
+            if metrics is not None:
+                rendered = time.perf_counter()
+                metrics.observe("annotate", rendered - started)
+            height, width = bgr.shape[:2]
+            if self.rgb is None or self.rgb.shape != bgr.shape:
+                self.resize(width, height)
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self.rgb)
+            self.photo.paste(self.pil_image)
+            if metrics is not None:
+                metrics.observe("display_convert", time.perf_counter() - rendered)
+            self.presented_frames += 1
+            if self.on_present:
+                self.on_present(detection)
+        finally:
+            detection.release()
+
+    def resize(self, width, height):
+        """New buffer, PIL view and PhotoImage for a new display size"""
+        self.rgb = self.pool.scratch("rgb", (height, width, 3))
+        # frombuffer shares memory with the numpy buffer, so no copy per frame
+        self.pil_image = Image.frombuffer("RGB", (width, height), self.rgb, "raw", "RGB", 0, 1)
+        self.photo = ImageTk.PhotoImage(self.pil_image)
+        self.label.configure(image=self.photo)
+        self.label.image = self.photo  # Keep a reference
+
+    def stats(self):
+        return {
+            'received': self.received_frames,
+            'presented': self.presented_frames,
+            'dropped': self.dropped_frames,
+            'buffers': self.pool.stats(),
+        }
+
+    def clear(self):
+        """Drop any pending frame and forget the current image"""
+        with self.lock:
+            detection, self.pending = self.pending, None
+        if detection is not None:
+            detection.release()
+        self.photo = self.pil_image = self.rgb = None
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.clear()
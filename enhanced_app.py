@@ -1,17 +1,22 @@
-import cv2
-import numpy as np
+# First, so the startup breakdown includes the imports below
+from startup import FirstFrameSink, StartupProfile, load_in_background
+STARTUP = StartupProfile()
+
+import argparse
+import logging
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 import customtkinter as ctk
-from PIL import Image, ImageTk
-from ultralytics import YOLO
-import threading
-import time
-from collections import deque
+
+from detection_engine import CallbackSink, DetectionEngine, DetectionPipeline, RateMeter, open_source
+from adaptive import AdaptiveController
+from class_filter import ConfigWatcher, parse_class_filter
+from display import TkDisplaySink
+from model_server import ModelClient
 
 
 class OptimizedObjectDetectionApp:
-    def __init__(self, master):
+    def __init__(self, master, server=None, class_filter=None, class_config=None, target_fps=None):
         self.master = master
         self.master.title("Enhanced Real-Time Object Detection")
         self.master.geometry("1200x800")
@@ -23,15 +28,20 @@ class OptimizedObjectDetectionApp:
         # Initialize variables
         self.cap = None
         self.model = None
-        self.running = False
-        self.detection_thread = None
-        self.fps_counter = deque(maxlen=30)
-        self.last_frame_time = time.time()
+        self.pipeline = None
+        self.display = None
+        self.fps_meter = RateMeter(window=30)
         
         # Performance settings
-        self.confidence_threshold = 0.5
-        self.frame_skip = 2  # Process every nth frame for better performance
-        self.frame_counter = 0
+        self.engine = DetectionEngine(confidence_threshold=0.5, iou_threshold=0.7, max_detections=300)
+        self.engine.class_filter = class_filter  # class allowlist / per-class thresholds, before NMS
+        self.class_config = class_config        # re-read while running when the file changes
+        self.frame_skip = 2  # Process every nth frame; with target_fps the controller tunes it
+        self.target_fps = target_fps  # None: adaptive quality off
+        self.adaptive = None
+        self.first_frame = FirstFrameSink(STARTUP)  # logs the startup breakdown once
+        self.server = server  # address of a shared model_server.py instead of a local model
+        self.client = None
         
         self.setup_ui()
         self.load_model()
@@ -50,6 +60,7 @@ class OptimizedObjectDetectionApp:
             self.control_frame, 
             text="Start Detection", 
             command=self.start_detection,
+            state="disabled",  # enabled once the model is loaded
             width=120,
             height=40
         )
@@ -126,35 +137,57 @@ class OptimizedObjectDetectionApp:
         self.status_label.pack(side=tk.LEFT, padx=5, pady=5)
         
     def load_model(self):
-        try:
-            self.status_label.configure(text="Loading YOLO model...")
-            self.master.update()
-            self.model = YOLO("yolov8n.pt")  # Fast nano model for real-time
-            self.status_label.configure(text="Model loaded successfully")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load model: {str(e)}")
-            self.status_label.configure(text="Error loading model")
+        """Load the model on a background thread; the window stays responsive"""
+        self.status_label.configure(text="Loading YOLO model...")
+        load_in_background(self.master, self.load_model_background, self.on_model_ready,
+                           self.on_model_error, profile=STARTUP)
+    
+    def load_model_background(self):
+        if self.server:
+            self.client = ModelClient(self.server, self.engine).start()
+            return None
+        model = self.engine.load()  # Fast nano model for real-time
+        with STARTUP.phase("warmup"):
+            self.engine.warmup()
+        return model
+    
+    def on_model_ready(self, model):
+        self.model = model
+        self.status_label.configure(text="Model loaded successfully")
+        self.start_button.configure(state="normal")
+    
+    def on_model_error(self, error):
+        messagebox.showerror("Error", f"Failed to load model: {str(error)}")
+        self.status_label.configure(text="Error loading model")
     
     def update_confidence(self, value):
-        self.confidence_threshold = float(value)
+        self.engine.confidence_threshold = float(value)
         self.confidence_value_label.configure(text=f"{value:.1f}")
     
     def start_detection(self):
         try:
-            self.cap = cv2.VideoCapture(0)
+            # Camera settings are optimized for performance in open_source
+            self.cap = open_source(0, width=640, height=480, fps=30)
             if not self.cap.isOpened():
                 messagebox.showerror("Error", "Cannot open camera")
                 return
             
-            # Optimize camera settings for better performance
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.cap.set(cv2.CAP_PROP_FPS, 30)
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            
-            self.running = True
-            self.detection_thread = threading.Thread(target=self.detection_loop, daemon=True)
-            self.detection_thread.start()
+            self.display = TkDisplaySink(self.master, self.video_label, max_size=(800, 600),
+                                         on_present=self.update_ui)
+            self.pipeline = DetectionPipeline(
+                self.cap,
+                self.engine,
+                sinks=[CallbackSink(self.on_detection), self.display, self.first_frame],
+                frame_skip=self.frame_skip,
+                executor=self.client,
+                max_in_flight=2 * self.client.size if self.client else 1
+            )
+            if self.target_fps:
+                self.adaptive = AdaptiveController(self.pipeline, target_fps=self.target_fps)
+                self.pipeline.sinks.append(self.adaptive)
+            if self.class_config:
+                self.pipeline.sinks.append(ConfigWatcher(self.engine, self.class_config))
+            self.pipeline.start()
             
             self.start_button.configure(state="disabled")
             self.stop_button.configure(state="normal")
@@ -164,9 +197,12 @@ class OptimizedObjectDetectionApp:
             messagebox.showerror("Error", f"Failed to start detection: {str(e)}")
     
     def stop_detection(self):
-        self.running = False
-        if self.cap:
+        if self.pipeline:
+            self.pipeline.stop()
+        elif self.cap:
             self.cap.release()
+        if self.display:
+            self.display.close()
         
         self.start_button.configure(state="normal")
         self.stop_button.configure(state="disabled")
@@ -174,83 +210,51 @@ class OptimizedObjectDetectionApp:
         self.fps_label.configure(text="FPS: 0")
         self.detection_label.configure(text="Objects: 0")
     
-    def detection_loop(self):
-        while self.running:
-            try:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                
-                # Skip frames for better performance
-                self.frame_counter += 1
-                if self.frame_counter % self.frame_skip != 0:
-                    continue
-                
-                # Perform detection
-                results = self.model(frame, conf=self.confidence_threshold, verbose=False)
-                
-                # Count detections
-                detection_count = len(results[0].boxes) if results[0].boxes is not None else 0
-                
-                # Draw bounding boxes and labels
-                annotated_frame = results[0].plot()
-                
-                # Calculate FPS
-                current_time = time.time()
-                fps = 1 / (current_time - self.last_frame_time)
-                self.fps_counter.append(fps)
-                avg_fps = sum(self.fps_counter) / len(self.fps_counter)
-                self.last_frame_time = current_time
-                
-                # Update UI in main thread
-                self.master.after(0, self.update_ui, annotated_frame, avg_fps, detection_count)
-                
-            except Exception as e:
-                print(f"Detection error: {e}")
-                break
-        
-        if self.cap:
-            self.cap.release()
+    def on_detection(self, detection):
+        """Called on the detection thread for every processed frame"""
+        # FPS of processed frames
+        self.fps_meter.tick()
     
-    def update_ui(self, frame, fps, detection_count):
+    def update_ui(self, detection):
+        """Called by the display sink on the main thread after each presented frame"""
         try:
-            # Resize frame for display
-            height, width = frame.shape[:2]
-            max_width, max_height = 800, 600
-            
-            if width > max_width or height > max_height:
-                scale = min(max_width/width, max_height/height)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                frame = cv2.resize(frame, (new_width, new_height))
-            
-            # Convert to RGB and then to ImageTk
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(rgb_frame)
-            tk_image = ImageTk.PhotoImage(pil_image)
-            
-            # Update video display
-            self.video_label.configure(image=tk_image)
-            self.video_label.image = tk_image  # Keep a reference
-            
-            # Update labels
-            self.fps_label.configure(text=f"FPS: {fps:.1f}")
-            self.detection_label.configure(text=f"Objects: {detection_count}")
+            avg_fps = self.fps_meter.rate()
+            self.fps_label.configure(text=f"FPS: {avg_fps:.1f}")
+            self.detection_label.configure(text=f"Objects: {detection.count}")
+            status = f"Detection running... {self.adaptive.describe()}" if self.adaptive else "Detection running..."
+            self.status_label.configure(text=status)
             
         except Exception as e:
             print(f"UI update error: {e}")
     
     def on_closing(self):
         self.stop_detection()
+        if self.client:
+            self.client.stop()
         self.master.destroy()
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enhanced Real-Time Object Detection")
+    parser.add_argument("--server", default=None, metavar="ADDRESS",
+                        help="run as a client of model_server.py (unix:/path.sock or tcp://host:port)")
+    parser.add_argument("--classes", default=None, metavar="NAMES",
+                        help="only detect these comma-separated classes (filtered before NMS)")
+    parser.add_argument("--class-config", default=None, metavar="CONFIG",
+                        help="JSON file with classes/thresholds; re-read when it changes")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="adapt frame skip, imgsz and camera resolution to this rate")
+    args = parser.parse_args(argv)
+    STARTUP.mark("imports")
+    logging.basicConfig(level=logging.INFO)
     root = ctk.CTk()
-    app = OptimizedObjectDetectionApp(root)
+    app = OptimizedObjectDetectionApp(root, server=args.server,
+                                      class_filter=parse_class_filter(args.classes, config=args.class_config),
+                                      class_config=args.class_config, target_fps=args.target_fps)
     
     # Handle window closing
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    root.after(0, lambda: STARTUP.mark("window"))
     
     root.mainloop()
 
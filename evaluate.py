@@ -0,0 +1,156 @@
+"""Detection accuracy on a local labeled dataset (YOLO txt format).
+
+Dataset layout, as produced by most labeling tools for Ultralytics:
+
+    dataset/images/*.jpg
+    dataset/labels/*.txt   # one "class cx cy w h" line per object, normalized 0-1
+
+mAP follows the COCO recipe (101-point interpolated AP, IoU 0.50:0.95) but
+is computed here in numpy so it works for any backend's output arrays.
+"""
+import os
+
+import cv2
+import numpy as np
+
+from postprocess import xywh_to_xyxy
+
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def load_dataset(root):
+    """Yield (image_path, rows) for a YOLO dataset; rows is (K, 5) float32
+    `class cx cy w h` with coordinates normalized to the image size"""
+    from detection_engine import IMAGE_EXTENSIONS
+
+    image_dir = os.path.join(root, "images") if os.path.isdir(os.path.join(root, "images")) else root
+    label_dir = os.path.join(root, "labels")
+    for name in sorted(os.listdir(image_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image_path = os.path.join(image_dir, name)
+        label_path = os.path.join(label_dir, os.path.splitext(name)[0] + ".txt")
+        rows = np.zeros((0, 5), dtype=np.float32)
+        if os.path.exists(label_path):
+            loaded = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+            if loaded.size:
+                rows = loaded[:, :5]
+        yield image_path, rows
+
+
+def scale_labels(rows, shape):
+    """Normalized cx, cy, w, h rows -> xyxy pixel boxes and class ids"""
+    height, width = shape[:2]
+    boxes = xywh_to_xyxy(rows[:, 1:5] * np.array([width, height, width, height], dtype=np.float32))
+    return boxes, rows[:, 0].astype(np.int32)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU, shape (len(a), len(b))"""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def match_predictions(pred_boxes, pred_scores, pred_classes, gt_boxes, gt_classes):
+    """True-positive flags (num_preds, num_iou_thresholds) via greedy score-ordered matching"""
+    tp = np.zeros((len(pred_boxes), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(pred_boxes) == 0 or len(gt_boxes) == 0:
+        return tp
+    ious = iou_matrix(pred_boxes, gt_boxes)
+    ious[pred_classes[:, None] != gt_classes[None, :]] = 0
+    order = np.argsort(-pred_scores)
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        taken = np.zeros(len(gt_boxes), dtype=bool)
+        for i in order:
+            candidates = np.where((ious[i] >= threshold) & ~taken)[0]
+            if candidates.size:
+                best = candidates[ious[i, candidates].argmax()]
+                taken[best] = True
+                tp[i, t] = True
+    return tp
+
+
+def average_precision(tp, scores, num_gt):
+    """101-point interpolated AP for each IoU threshold column of tp"""
+    if num_gt == 0:
+        return np.full(tp.shape[1], np.nan)
+    if len(scores) == 0:
+        return np.zeros(tp.shape[1])
+    order = np.argsort(-scores)
+    tp = tp[order]
+    tp_cumulative = np.cumsum(tp, axis=0)
+    fp_cumulative = np.cumsum(~tp, axis=0)
+    recall = tp_cumulative / num_gt
+    precision = tp_cumulative / np.maximum(tp_cumulative + fp_cumulative, 1e-9)
+
+    recall_points = np.linspace(0, 1, 101)
+    ap = np.zeros(tp.shape[1])
+    for t in range(tp.shape[1]):
+        # Precision envelope, then sample it at the recall points
+        envelope = np.maximum.accumulate(precision[::-1, t])[::-1]
+        indices = np.searchsorted(recall[:, t], recall_points, side="left")
+        sampled = np.where(indices < len(envelope), envelope[np.minimum(indices, len(envelope) - 1)], 0)
+        ap[t] = sampled.mean()
+    return ap
+
+
+class DetectionEvaluator:
+    """Accumulate predictions per image, then report mAP@0.5 and mAP@0.5:0.95"""
+
+    def __init__(self):
+        self.tp = []
+        self.scores = []
+        self.pred_classes = []
+        self.gt_classes = []
+
+    def add(self, pred_boxes, pred_scores, pred_classes, gt_boxes, gt_classes):
+        self.tp.append(match_predictions(pred_boxes, pred_scores, pred_classes, gt_boxes, gt_classes))
+        self.scores.append(pred_scores)
+        self.pred_classes.append(pred_classes)
+        self.gt_classes.append(gt_classes)
+
+    def recall(self, iou_index=0):
+        """Fraction of ground-truth objects found at IOU_THRESHOLDS[iou_index]"""
+        num_gt = sum(len(classes) for classes in self.gt_classes)
+        found = sum(int(tp[:, iou_index].sum()) for tp in self.tp)
+        return found / max(num_gt, 1)
+
+    def summary(self):
+        if not self.tp:
+            return {'map50': 0.0, 'map50_95': 0.0, 'classes': 0}
+        tp = np.concatenate(self.tp)
+        scores = np.concatenate(self.scores)
+        pred_classes = np.concatenate(self.pred_classes)
+        gt_classes = np.concatenate(self.gt_classes)
+
+        per_class = []
+        for class_id in np.unique(gt_classes):
+            mask = pred_classes == class_id
+            per_class.append(average_precision(tp[mask], scores[mask], int((gt_classes == class_id).sum())))
+        ap = np.array(per_class) if per_class else np.zeros((0, len(IOU_THRESHOLDS)))
+        return {
+            'map50': float(np.nanmean(ap[:, 0])) if len(ap) else 0.0,
+            'map50_95': float(np.nanmean(ap)) if len(ap) else 0.0,
+            'recall50': self.recall(0),
+            'classes': len(per_class),
+        }
+
+
+def evaluate_engine(engine, dataset_root, max_images=None):
+    """Run a loaded DetectionEngine over a labeled dataset and return the summary"""
+    evaluator = DetectionEvaluator()
+    for count, (image_path, rows) in enumerate(load_dataset(dataset_root)):
+        if max_images and count >= max_images:
+            break
+        frame = cv2.imread(image_path)
+        if frame is None:
+            continue
+        detection = engine.process(frame)
+        gt_boxes, gt_classes = scale_labels(rows, frame.shape)
+        evaluator.add(detection.boxes, detection.scores, detection.class_ids, gt_boxes, gt_classes)
+    return evaluator.summary()
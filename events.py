@@ -0,0 +1,502 @@
+"""Structured detection events and asynchronous sinks.
+
+Every processed frame becomes a DetectionRecord: timestamp, stream id, frame
+index and the detections as packed numpy arrays (class ids, xyxy boxes,
+scores, optional track ids). Records are handed to sinks that write them on
+their own thread, in batches:
+
+    JsonlEventSink    one JSON object per line
+    ParquetEventSink  Arrow/Parquet with list columns (needs pyarrow)
+    SQLiteEventSink   frames + detections tables, one transaction per batch
+    HttpEventSink     POSTs newline-delimited JSON batches to a URL
+    SocketEventSink   streams length-prefixed packed records over TCP
+
+write() never waits for the disk or the network: records go into a bounded
+queue, and when it is full the record is dropped and counted (policy
+"drop") or the caller waits at most block_timeout (policy "block").
+
+    sink = open_sink("detections.parquet")
+    pipeline = DetectionPipeline(source, engine, sinks=[sink])
+
+A stand-in receiver for the push sinks:
+
+    python events.py serve --http 8765 --tcp 8766 --output received.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# timestamp, source id, frame index, count, has track ids
+HEADER = struct.Struct("<dIqIB")
+LENGTH = struct.Struct("<I")
+CLOSE = object()
+
+
+class DetectionRecord:
+    """One frame's detections, packed; independent of the frame buffer"""
+
+    __slots__ = ('timestamp', 'source_id', 'frame_index', 'class_ids', 'boxes', 'scores',
+                 'track_ids', 'names')
+
+    def __init__(self, timestamp, source_id, frame_index, class_ids, boxes, scores, track_ids=None,
+                 names=None):
+        self.timestamp = timestamp
+        self.source_id = source_id
+        self.frame_index = frame_index
+        self.class_ids = class_ids    # (N,) int16
+        self.boxes = boxes            # (N, 4) float32 xyxy
+        self.scores = scores          # (N,) float32
+        self.track_ids = track_ids    # (N,) int32 or None
+        self.names = names            # shared class-name dict, not serialized in binary form
+
+    @classmethod
+    def from_detection(cls, detection):
+        track_ids = detection.track_ids
+        return cls(
+            detection.timestamp, detection.source_id, detection.frame_index,
+            np.asarray(detection.class_ids, dtype=np.int16).copy(),
+            np.asarray(detection.boxes, dtype=np.float32).reshape(-1, 4).copy(),
+            np.asarray(detection.scores, dtype=np.float32).copy(),
+            None if track_ids is None else np.asarray(track_ids, dtype=np.int32).copy(),
+            detection.names
+        )
+
+    @property
+    def count(self):
+        return len(self.scores)
+
+    def to_dict(self):
+        names = self.names or {}
+        detections = [
+            {
+                'class_id': int(class_id),
+                'label': names.get(int(class_id), str(class_id)),
+                'confidence': round(float(score), 4),
+                'box': [round(float(v), 1) for v in box],
+            }
+            for box, score, class_id in zip(self.boxes, self.scores, self.class_ids)
+        ]
+        if self.track_ids is not None:
+            for entry, track_id in zip(detections, self.track_ids):
+                entry['track_id'] = int(track_id)
+        return {
+            'timestamp': self.timestamp,
+            'source': self.source_id,
+            'frame': self.frame_index,
+            'count': self.count,
+            'detections': detections,
+        }
+
+    def to_bytes(self):
+        has_tracks = self.track_ids is not None
+        parts = [HEADER.pack(self.timestamp, self.source_id, self.frame_index, self.count, has_tracks),
+                 self.class_ids.tobytes(), self.scores.tobytes(), self.boxes.tobytes()]
+        if has_tracks:
+            parts.append(self.track_ids.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, names=None):
+        timestamp, source_id, frame_index, count, has_tracks = HEADER.unpack_from(data)
+        offset = HEADER.size
+        class_ids = np.frombuffer(data, np.int16, count, offset)
+        offset += class_ids.nbytes
+        scores = np.frombuffer(data, np.float32, count, offset)
+        offset += scores.nbytes
+        boxes = np.frombuffer(data, np.float32, count * 4, offset).reshape(-1, 4)
+        offset += boxes.nbytes
+        track_ids = np.frombuffer(data, np.int32, count, offset) if has_tracks else None
+        return cls(timestamp, source_id, frame_index, class_ids, boxes, scores, track_ids, names)
+
+
+class AsyncSink:
+    """Pipeline sink that queues records and writes them in batches on a thread"""
+
+    def __init__(self, max_queue=1024, batch_size=256, flush_interval=0.5, policy="drop",
+                 block_timeout=0.05):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.queue = queue.Queue(max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # max seconds a record waits for its batch
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        # Counters
+        self.queued_records = 0
+        self.written_records = 0
+        self.dropped_records = 0
+        self.batches = 0
+        self.errors = 0
+        self.write_time = 0.0
+
+        self.thread = threading.Thread(target=self.run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    def write(self, detection):
+        """Sink interface (pipeline thread): pack and enqueue, never touch the disk"""
+        self.put(DetectionRecord.from_detection(detection))
+
+    def put(self, record):
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+            self.queued_records += 1
+        except queue.Full:
+            self.dropped_records += 1
+
+    def run(self):
+        try:
+            self.open()
+        except Exception as e:
+            logger.error(f"{type(self).__name__}: cannot open output: {e}")
+            self.errors += 1
+        closing = False
+        while not closing:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            while True:
+                if item is CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self.flush(batch)
+        try:
+            self.close_output()
+        except Exception as e:
+            logger.error(f"{type(self).__name__}: close failed: {e}")
+
+    def flush(self, batch):
+        started = time.perf_counter()
+        try:
+            self.write_batch(batch)
+            self.written_records += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            self.dropped_records += len(batch)
+            logger.warning(f"{type(self).__name__}: dropped {len(batch)} records: {e}")
+        self.write_time += time.perf_counter() - started
+
+    def open(self):
+        pass
+
+    def write_batch(self, records):
+        raise NotImplementedError
+
+    def close_output(self):
+        pass
+
+    def close(self, timeout=10.0):
+        """Write everything still queued, then close the output"""
+        if self.thread.is_alive():
+            self.queue.put(CLOSE)
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self.queued_records,
+            'written': self.written_records,
+            'dropped': self.dropped_records,
+            'pending': self.queue.qsize(),
+            'batches': self.batches,
+            'errors': self.errors,
+            'avg_batch_ms': 1000 * self.write_time / max(self.batches, 1),
+        }
+
+
+class JsonlEventSink(AsyncSink):
+    """One JSON object per frame, appended in batches"""
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.file = None
+        super().__init__(**kwargs)
+
+    def open(self):
+        self.file = open(self.path, "w", encoding="utf-8")
+
+    def write_batch(self, records):
+        self.file.write("".join(json.dumps(record.to_dict()) + "\n" for record in records))
+        self.file.flush()
+
+    def close_output(self):
+        if self.file:
+            self.file.close()
+
+
+class ParquetEventSink(AsyncSink):
+    """Arrow/Parquet file, one row per frame with list columns; one row group per batch"""
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.writer = None
+        super().__init__(**kwargs)
+
+    def open(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('timestamp', pa.float64()),
+            ('source', pa.int32()),
+            ('frame', pa.int64()),
+            ('class_ids', pa.list_(pa.int16())),
+            ('scores', pa.list_(pa.float32())),
+            ('boxes', pa.list_(pa.float32())),      # x1, y1, x2, y2 per detection
+            ('track_ids', pa.list_(pa.int32())),
+        ])
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+
+    def list_column(self, arrays, dtype, width=1):
+        """Concatenate per-frame arrays into one ListArray without per-value Python work"""
+        pa = self.pa
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int32)
+        np.cumsum([len(a) * width for a in arrays], out=offsets[1:])
+        values = np.concatenate([a.ravel() for a in arrays]) if arrays else np.zeros(0, dtype)
+        return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values.astype(dtype, copy=False)))
+
+    def write_batch(self, records):
+        pa = self.pa
+        empty = np.zeros(0, dtype=np.int32)
+        table = pa.Table.from_arrays([
+            pa.array([r.timestamp for r in records], pa.float64()),
+            pa.array([r.source_id for r in records], pa.int32()),
+            pa.array([r.frame_index for r in records], pa.int64()),
+            self.list_column([r.class_ids for r in records], np.int16),
+            self.list_column([r.scores for r in records], np.float32),
+            self.list_column([r.boxes for r in records], np.float32, width=4),
+            self.list_column([r.track_ids if r.track_ids is not None else empty for r in records],
+                             np.int32),
+        ], schema=self.schema)
+        self.writer.write_table(table)
+
+    def close_output(self):
+        if self.writer:
+            self.writer.close()
+
+
+class SQLiteEventSink(AsyncSink):
+    """frames and detections tables; each batch is one transaction"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS frames (
+            id INTEGER PRIMARY KEY, timestamp REAL, source INTEGER, frame INTEGER, count INTEGER);
+        CREATE TABLE IF NOT EXISTS detections (
+            frame_id INTEGER REFERENCES frames(id), class_id INTEGER, label TEXT, score REAL,
+            x1 REAL, y1 REAL, x2 REAL, y2 REAL, track_id INTEGER);
+        CREATE INDEX IF NOT EXISTS frames_time ON frames(timestamp);
+        CREATE INDEX IF NOT EXISTS detections_class ON detections(class_id);
+    """
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.db = None
+        super().__init__(**kwargs)
+
+    def open(self):
+        # Opened on the writer thread, which is the only one using it
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+    def write_batch(self, records):
+        with self.db:
+            cursor = self.db.cursor()
+            rows = []
+            for record in records:
+                cursor.execute("INSERT INTO frames (timestamp, source, frame, count) VALUES (?, ?, ?, ?)",
+                               (record.timestamp, record.source_id, record.frame_index, record.count))
+                frame_id = cursor.lastrowid
+                names = record.names or {}
+                track_ids = record.track_ids if record.track_ids is not None else [None] * record.count
+                for class_id, score, box, track_id in zip(record.class_ids.tolist(), record.scores.tolist(),
+                                                          record.boxes.tolist(), track_ids):
+                    rows.append((frame_id, class_id, names.get(class_id, str(class_id)), score, *box,
+                                 None if track_id is None else int(track_id)))
+            cursor.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def close_output(self):
+        if self.db:
+            self.db.close()
+
+
+class HttpEventSink(AsyncSink):
+    """POST each batch as newline-delimited JSON"""
+
+    def __init__(self, url, timeout=2.0, **kwargs):
+        self.url = url
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def write_batch(self, records):
+        body = "".join(json.dumps(record.to_dict()) + "\n" for record in records).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={'Content-Type': 'application/x-ndjson'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SocketEventSink(AsyncSink):
+    """Stream packed records over TCP, each prefixed with its byte length"""
+
+    def __init__(self, host, port, timeout=2.0, **kwargs):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.socket = None
+        super().__init__(**kwargs)
+
+    def write_batch(self, records):
+        payload = b"".join(LENGTH.pack(len(data)) + data for data in (r.to_bytes() for r in records))
+        if self.socket is None:
+            self.socket = socket.create_connection(self.address, timeout=self.timeout)
+        try:
+            self.socket.sendall(payload)
+        except OSError:
+            # Reconnect on the next batch
+            self.socket.close()
+            self.socket = None
+            raise
+
+    def close_output(self):
+        if self.socket:
+            self.socket.close()
+
+
+def open_sink(target, **kwargs):
+    """Pick a sink from an output path or URL (.jsonl, .parquet, .db/.sqlite, http://, tcp://)"""
+    parsed = urlparse(target)
+    if parsed.scheme in ("http", "https"):
+        return HttpEventSink(target, **kwargs)
+    if parsed.scheme == "tcp":
+        return SocketEventSink(parsed.hostname or "127.0.0.1", parsed.port, **kwargs)
+    extension = os.path.splitext(target)[1].lower()
+    if extension in (".parquet", ".arrow"):
+        return ParquetEventSink(target, **kwargs)
+    if extension in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteEventSink(target, **kwargs)
+    return JsonlEventSink(target, **kwargs)
+
+
+class EventReceiver:
+    """Stand-in server for the push sinks: HTTP ndjson and/or TCP packed records"""
+
+    def __init__(self, http_port=None, tcp_port=None, host="127.0.0.1", output=None):
+        self.host = host
+        self.http_port = http_port
+        self.tcp_port = tcp_port
+        self.output = open(output, "a", encoding="utf-8") if output else None
+        self.lock = threading.Lock()
+        self.servers = []
+        self.received_records = 0
+        self.received_bytes = 0
+
+    def receive(self, entries, size):
+        with self.lock:
+            self.received_records += len(entries)
+            self.received_bytes += size
+            if self.output:
+                self.output.write("".join(json.dumps(entry) + "\n" for entry in entries))
+                self.output.flush()
+
+    def start(self):
+        receiver = self
+
+        class HttpHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                entries = [json.loads(line) for line in body.decode("utf-8").splitlines() if line]
+                receiver.receive(entries, len(body))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        class TcpHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    header = self.rfile.read(LENGTH.size)
+                    if len(header) < LENGTH.size:
+                        return
+                    data = self.rfile.read(LENGTH.unpack(header)[0])
+                    receiver.receive([DetectionRecord.from_bytes(data).to_dict()], len(data) + LENGTH.size)
+
+        if self.http_port is not None:
+            self.servers.append(ThreadingHTTPServer((self.host, self.http_port), HttpHandler))
+        if self.tcp_port is not None:
+            server = socketserver.ThreadingTCPServer((self.host, self.tcp_port), TcpHandler)
+            server.daemon_threads = True
+            self.servers.append(server)
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        if self.output:
+            self.output.close()
+
+    def stats(self):
+        return {'records': self.received_records, 'bytes': self.received_bytes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detection event tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="receive events pushed by HttpEventSink/SocketEventSink")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--http", type=int, default=8765, help="HTTP port (POST ndjson)")
+    serve.add_argument("--tcp", type=int, default=8766, help="TCP port (packed records)")
+    serve.add_argument("--output", default=None, help="append received events to this JSONL file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    receiver = EventReceiver(args.http, args.tcp, args.host, args.output).start()
+    logger.info(f"Receiving on http://{args.host}:{args.http}/ and tcp://{args.host}:{args.tcp}")
+    try:
+        while True:
+            time.sleep(5)
+            logger.info(f"Received: {receiver.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
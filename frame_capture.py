@@ -0,0 +1,231 @@
+"""Dedicated capture thread feeding a latest-frame-wins ring of buffers.
+
+The camera is read on its own thread straight into pooled frame buffers
+(see frame_pool.py). The consumer (the detection pipeline) always gets the
+newest frame; a frame that is replaced before anyone read it is counted as
+dropped, and dropping it costs nothing because its buffer simply goes back to
+the pool for the next capture.
+"""
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool, same_buffer
+
+
+logger = logging.getLogger(__name__)
+
+
+class FrameRing:
+    """Latest-frame-wins hand-off of frame leases from one writer to one reader.
+
+    Only the newest published lease is kept; publishing over an unread lease
+    releases it back to its pool and counts a drop.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.latest = None  # newest unread FrameLease
+        self.closed = False
+
+        # Counters
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.consumed_frames = 0
+
+    def publish(self, lease):
+        """Publish a captured frame; an unread older frame is dropped"""
+        with self.condition:
+            stale, self.latest = self.latest, lease
+            self.captured_frames += 1
+            if stale is not None:
+                # Latest frame wins - the stale buffer is recycled, never copied
+                self.dropped_frames += 1
+            self.condition.notify()
+        if stale is not None:
+            stale.release()
+
+    def take(self, timeout=None):
+        """Return the newest lease (the caller now owns it), or None on timeout/close"""
+        with self.condition:
+            ready = self.condition.wait_for(
+                lambda: self.latest is not None or self.closed, timeout
+            )
+            if not ready or self.latest is None:
+                return None
+            lease, self.latest = self.latest, None
+            self.consumed_frames += 1
+            return lease
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            stale, self.latest = self.latest, None
+            self.condition.notify_all()
+        if stale is not None:
+            stale.release()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'captured': self.captured_frames,
+                'dropped': self.dropped_frames,
+                'consumed': self.consumed_frames,
+            }
+
+
+class CaptureThread:
+    """Read a cv2.VideoCapture-like source on its own thread.
+
+    Exposes the same isOpened()/read()/release() API as the source it wraps,
+    so it can be handed to DetectionPipeline in place of the raw capture.
+    read_lease() hands over ownership of the pooled buffer instead.
+    """
+
+    # Frames returned by read() are pooled buffers that get reused
+    reuses_buffers = True
+
+    def __init__(self, source, slots=4, on_frame=None, pool=None):
+        self.source = source
+        self.pool = pool or FramePool(capacity=slots)
+        self.ring = FrameRing()
+        self.on_frame = on_frame  # called on the capture thread after each frame
+        self.running = False
+        self.thread = None
+        self.held = None  # lease lent out by read() until the next read()
+        self.shape = None
+        self.source_lock = threading.Lock()  # serializes read() and set() on the source
+
+    @property
+    def captured_frames(self):
+        return self.ring.captured_frames
+
+    @property
+    def dropped_frames(self):
+        return self.ring.dropped_frames
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def get(self, prop):
+        with self.source_lock:
+            return self.source.get(prop)
+
+    def set(self, prop, value):
+        """cv2-style set; waits for the current read to finish and returns the source's result"""
+        with self.source_lock:
+            return self.source.set(prop, value)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def capture_loop(self):
+        """Capture loop running in separate thread"""
+        try:
+            while self.running:
+                lease = self.pool.acquire(self.shape) if self.shape else None
+                with self.source_lock:
+                    ret, frame = self.source.read(lease.array if lease else None)
+                if not ret:
+                    if lease:
+                        lease.release()
+                    break
+
+                # First frame (or a resolution change): adopt the array the
+                # source allocated, later reads land directly in pooled buffers.
+                # Sources that ignore the buffer (image folders) are copied into
+                # it, so the pool keeps its size instead of adopting every frame
+                if lease is None or lease.array.shape != frame.shape:
+                    if lease:
+                        lease.release()
+                    lease = self.pool.adopt(frame)
+                    self.shape = frame.shape
+                elif not same_buffer(frame, lease.array):
+                    np.copyto(lease.array, frame)
+
+                self.ring.publish(lease)
+                if self.on_frame:
+                    self.on_frame()
+        except Exception as e:
+            logger.error(f"Capture error: {e}")
+        finally:
+            self.running = False
+            self.ring.close()
+
+    def read_lease(self):
+        """Return the newest frame as a FrameLease the caller must release"""
+        if self.thread is None:
+            self.start()
+        while True:
+            lease = self.ring.take(timeout=0.5)
+            if lease is not None:
+                return lease
+            if self.ring.closed:
+                return None
+
+    def read(self):
+        """cv2-style read; the frame stays valid until the next read()"""
+        if self.held is not None:
+            self.held.release()
+            self.held = None
+        lease = self.read_lease()
+        if lease is None:
+            return False, None
+        self.held = lease
+        return True, lease.array
+
+    def release(self):
+        self.running = False
+        self.ring.close()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(1.0)
+        self.source.release()
+
+    def stats(self):
+        stats = self.ring.stats()
+        stats['pool'] = self.pool.stats()
+        return stats
+
+
+class PacedSource:
+    """Play a video file back at its native frame rate, like a live stream.
+
+    Handy as a local stand-in for an RTSP camera: frames arrive on a wall-clock
+    schedule, so a slow consumer sees drops exactly as it would on a real feed.
+    """
+
+    def __init__(self, source, fps=None, loop=False):
+        self.source = source
+        native_fps = source.get(cv2.CAP_PROP_FPS) or 0
+        self.interval = 1.0 / (fps or native_fps or 30)
+        self.loop = loop
+        self.next_time = None
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def get(self, prop):
+        return self.source.get(prop)
+
+    def read(self, image=None):
+        now = time.perf_counter()
+        if self.next_time is None:
+            self.next_time = now
+        elif now < self.next_time:
+            time.sleep(self.next_time - now)
+        self.next_time = max(self.next_time + self.interval, time.perf_counter() - self.interval)
+
+        ret, frame = self.source.read(image)
+        if not ret and self.loop:
+            self.source.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.source.read(image)
+        return ret, frame
+
+    def release(self):
+        self.source.release()
@@ -0,0 +1,252 @@
+"""Pooled frame buffers with explicit lease semantics.
+
+Every stage used to allocate a fresh numpy array per frame (capture,
+cv2.flip, resize, cvtColor). A FramePool hands out preallocated buffers as
+FrameLease objects instead; a lease is reference counted and its buffer goes
+back to the pool when the last holder calls release(). Operations write into
+leased buffers through OpenCV's dst= arguments, so in steady state no frame
+memory is allocated at all - FramePool.stats() shows the allocation count.
+
+SharedFramePool keeps its buffers in one multiprocessing.shared_memory block,
+so a lease can be handed to another process by (name, offset) without
+pickling or copying the pixels.
+"""
+import logging
+import threading
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def same_buffer(a, b):
+    """True when two arrays start at the same memory address"""
+    return a.__array_interface__['data'][0] == b.__array_interface__['data'][0]
+
+
+class FrameLease:
+    """A pooled buffer checked out of a FramePool"""
+
+    __slots__ = ('pool', 'slot', 'array', 'refcount')
+
+    def __init__(self, pool, slot, array):
+        self.pool = pool
+        self.slot = slot
+        self.array = array
+        self.refcount = 1
+
+    @property
+    def location(self):
+        """(shared memory name, byte offset) for SharedFramePool leases, else None"""
+        return self.pool.location(self.slot)
+
+    def retain(self):
+        with self.pool.lock:
+            if self.refcount <= 0:
+                raise RuntimeError("Cannot retain a released FrameLease")
+            self.refcount += 1
+        return self
+
+    def release(self):
+        """Drop one reference; returns True when the buffer went back to the pool"""
+        with self.pool.lock:
+            self.refcount -= 1
+            if self.refcount > 0:
+                return False
+            if self.refcount < 0:
+                raise RuntimeError("FrameLease released more times than retained")
+        self.pool.give_back(self)
+        return True
+
+    def __enter__(self):
+        return self.array
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class FramePool:
+    """Reusable frame buffers, bucketed by shape.
+
+    Buffers are allocated on first use of a shape and recycled afterwards.
+    The pool never blocks: if every buffer is leased out it allocates another
+    one (and counts it), so a leak shows up as a growing allocation count
+    rather than a deadlock.
+    """
+
+    def __init__(self, capacity=8, dtype=np.uint8):
+        self.capacity = capacity
+        self.dtype = dtype
+        self.lock = threading.Lock()
+        self.free = {}    # shape -> [slot, ...]
+        self.buffers = []  # slot -> array
+        self.scratch_buffers = {}
+
+        # Counters
+        self.allocations = 0
+        self.acquired = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def allocate(self, shape):
+        array = np.empty(shape, dtype=self.dtype)
+        self.buffers.append(array)
+        self.allocations += 1
+        if self.allocations == self.capacity + 1:
+            logger.warning(f"FramePool grew past its capacity of {self.capacity} buffers")
+        return len(self.buffers) - 1
+
+    def acquire(self, shape):
+        """Lease a buffer of the given shape"""
+        shape = tuple(shape)
+        with self.lock:
+            free = self.free.get(shape)
+            slot = free.pop() if free else self.allocate(shape)
+            self.acquired += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            return FrameLease(self, slot, self.buffers[slot])
+
+    def adopt(self, array):
+        """Lease an array allocated elsewhere (e.g. by the first camera read)"""
+        with self.lock:
+            self.buffers.append(array)
+            self.allocations += 1
+            self.acquired += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            return FrameLease(self, len(self.buffers) - 1, array)
+
+    def give_back(self, lease):
+        with self.lock:
+            self.in_use -= 1
+            self.free.setdefault(lease.array.shape, []).append(lease.slot)
+
+    def location(self, slot):
+        return None
+
+    def scratch(self, name, shape):
+        """Persistent single-owner buffer (e.g. the display-size RGB frame)"""
+        shape = tuple(shape)
+        buffer = self.scratch_buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=self.dtype)
+            self.scratch_buffers[name] = buffer
+            with self.lock:
+                self.allocations += 1
+        return buffer
+
+    def stats(self):
+        with self.lock:
+            return {
+                'buffers': len(self.buffers),
+                'allocations': self.allocations,
+                'acquired': self.acquired,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+            }
+
+
+class SharedFramePool(FramePool):
+    """FramePool whose buffers live in one shared-memory block.
+
+    The block is split into fixed-size slots of max_frame_bytes; any frame
+    shape that fits can be leased. The size is fixed, so acquire() waits for
+    a slot to be released instead of growing.
+    """
+
+    def __init__(self, capacity=8, max_width=1920, max_height=1080, channels=3, timeout=2.0):
+        super().__init__(capacity)
+        self.slot_bytes = max_width * max_height * channels
+        self.timeout = timeout
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * self.slot_bytes)
+        self.memory = np.ndarray(capacity * self.slot_bytes, dtype=np.uint8, buffer=self.shm.buf)
+        self.free_slots = list(range(capacity))
+        self.available = threading.Condition(self.lock)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def fits(self, shape):
+        return int(np.prod(shape)) <= self.slot_bytes
+
+    def view(self, slot, shape):
+        if not self.fits(shape):
+            raise ValueError(f"Frame {shape} does not fit the shared-memory slots")
+        start = slot * self.slot_bytes
+        return self.memory[start:start + int(np.prod(shape))].reshape(shape)
+
+    def acquire(self, shape):
+        shape = tuple(shape)
+        # Check before taking a slot: a failed view() would otherwise leak it
+        if not self.fits(shape):
+            raise ValueError(f"Frame {shape} does not fit the shared-memory slots "
+                             f"({self.slot_bytes} bytes each)")
+        with self.available:
+            if not self.available.wait_for(lambda: self.free_slots, self.timeout):
+                raise RuntimeError("SharedFramePool exhausted - leases are not being released")
+            slot = self.free_slots.pop()
+            self.acquired += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return FrameLease(self, slot, self.view(slot, shape))
+
+    def adopt(self, array):
+        # Pixels outside shared memory have to be copied in once
+        lease = self.acquire(array.shape)
+        np.copyto(lease.array, array)
+        return lease
+
+    def give_back(self, lease):
+        with self.available:
+            self.in_use -= 1
+            self.free_slots.append(lease.slot)
+            self.available.notify()
+
+    def location(self, slot):
+        return self.shm.name, slot * self.slot_bytes
+
+    def locate(self, frame):
+        """Byte offset of a frame inside this pool's block, or None if it lives elsewhere"""
+        if self.memory is None or not frame.flags['C_CONTIGUOUS']:
+            return None
+        base = self.memory.__array_interface__['data'][0]
+        address = frame.__array_interface__['data'][0]
+        if base <= address and address + frame.nbytes <= base + self.memory.nbytes:
+            return address - base
+        return None
+
+    def close(self):
+        self.memory = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_frame(shm, offset, shape):
+    """View a frame inside an attached SharedMemory block (other process side)"""
+    return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+
+def flip_into(lease, pool):
+    """Mirror a leased frame horizontally into a new lease and release the old one"""
+    flipped = pool.acquire(lease.array.shape)
+    cv2.flip(lease.array, 1, dst=flipped.array)
+    lease.release()
+    return flipped
+
+
+def resize_into(frame, size, pool, name="resize"):
+    """cv2.resize into the pool's persistent buffer for this size"""
+    width, height = size
+    dst = pool.scratch(name, (height, width) + frame.shape[2:])
+    return cv2.resize(frame, (width, height), dst=dst)
+
+
+def convert_color_into(frame, code, pool, name="color"):
+    """cv2.cvtColor into the pool's persistent buffer (3-channel conversions)"""
+    dst = pool.scratch(name, frame.shape)
+    return cv2.cvtColor(frame, code, dst=dst)
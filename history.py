@@ -0,0 +1,287 @@
+"""Bounded, columnar detection history with time-range queries.
+
+Nothing here keeps a frame or an Ultralytics Results object. Every processed
+frame adds one row to fixed-size ring buffers:
+
+    frames      timestamp, source, frame index, first detection, count and a
+                class-presence bitmask (one bit per class)
+    detections  xyxy boxes (float32), scores (float16), class ids (int16), track ids
+    buckets     per-class detection counts per bucket_seconds of wall time
+
+At 30 FPS the defaults hold about 4.5 hours of frames in roughly 80 MB, and
+the arrays are allocated with np.zeros so pages are only committed as they
+fill. Queries never walk the whole store: counts per class come from the
+time buckets, and frames containing a class are found by binary search on
+the timestamps followed by a vectorized bit test over that range only.
+Optional JPEG thumbnails are kept under a memory budget, oldest evicted first.
+
+    history = DetectionHistory(thumbnail_budget_mb=32)
+    pipeline.sinks.append(history)
+    history.class_counts(seconds=300)            # {class_id: detections} over 5 minutes
+    history.frames_with_class(0, seconds=600)    # frame sequence numbers containing class 0
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from renderer import fit_size
+
+
+class HistoryEntry:
+    """One frame read back from the history"""
+
+    __slots__ = ('seq', 'timestamp', 'source_id', 'frame_index', 'boxes', 'scores', 'class_ids',
+                 'track_ids')
+
+    def __init__(self, seq, timestamp, source_id, frame_index, boxes, scores, class_ids, track_ids):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.source_id = source_id
+        self.frame_index = frame_index
+        self.boxes = boxes
+        self.scores = scores
+        self.class_ids = class_ids
+        self.track_ids = track_ids  # -1 where no tracker was attached
+
+    @property
+    def count(self):
+        return len(self.scores)
+
+
+class DetectionHistory:
+    """Pipeline sink keeping compact per-frame detections for hours of footage"""
+
+    def __init__(self, max_frames=500_000, max_detections=2_000_000, num_classes=None,
+                 bucket_seconds=1.0, max_buckets=6 * 3600, thumbnail_budget_mb=0,
+                 thumbnail_size=(160, 120), thumbnail_interval=1.0, thumbnail_quality=70):
+        self.max_frames = max_frames
+        self.max_detections = max_detections
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.thumbnail_budget = int(thumbnail_budget_mb * 1024 * 1024)
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_interval = thumbnail_interval  # seconds between stored thumbnails
+        self.thumbnail_quality = thumbnail_quality
+        self.lock = threading.Lock()
+        self.names = {}
+        self.num_classes = 0
+        if num_classes:
+            self.allocate(num_classes)
+
+        # Frame and detection sequence numbers only grow; ring position = seq % size
+        self.first_seq = 0
+        self.next_seq = 0
+        self.next_detection = 0
+
+        self.thumbnails = OrderedDict()  # frame seq -> JPEG bytes
+        self.thumbnail_bytes = 0
+        self.last_thumbnail = 0.0
+
+    def allocate(self, num_classes):
+        """Create the ring buffers once the number of classes is known"""
+        frames, detections = self.max_frames, self.max_detections
+        self.num_classes = num_classes
+        self.mask_words = (num_classes + 63) // 64
+        self.frame_timestamps = np.zeros(frames, dtype=np.float64)
+        self.frame_sources = np.zeros(frames, dtype=np.int32)
+        self.frame_indices = np.zeros(frames, dtype=np.int64)
+        self.frame_starts = np.zeros(frames, dtype=np.int64)
+        self.frame_counts = np.zeros(frames, dtype=np.int32)
+        self.frame_masks = np.zeros((frames, self.mask_words), dtype=np.uint64)
+        self.boxes = np.zeros((detections, 4), dtype=np.float32)
+        self.scores = np.zeros(detections, dtype=np.float16)
+        self.class_ids = np.zeros(detections, dtype=np.int16)
+        self.track_ids = np.zeros(detections, dtype=np.int32)
+        self.bucket_ids = np.full(self.max_buckets, -1, dtype=np.int64)
+        self.bucket_counts = np.zeros((self.max_buckets, num_classes), dtype=np.int32)
+
+    def write(self, detection):
+        """Sink interface: append one frame (pipeline thread)"""
+        with self.lock:
+            if not self.num_classes:
+                self.names = dict(detection.names)
+                self.allocate(max(len(detection.names), 1))
+            self.add(detection)
+        if self.thumbnail_budget and detection.frame is not None:
+            self.maybe_thumbnail(detection)
+
+    def add(self, detection):
+        class_ids = np.asarray(detection.class_ids, dtype=np.int16)
+        valid = (class_ids >= 0) & (class_ids < self.num_classes)
+        count = min(len(class_ids), self.max_detections)
+
+        seq = self.next_seq
+        row = seq % self.max_frames
+        start = self.next_detection
+        self.frame_timestamps[row] = detection.timestamp
+        self.frame_sources[row] = detection.source_id
+        self.frame_indices[row] = detection.frame_index
+        self.frame_starts[row] = start
+        self.frame_counts[row] = count
+        self.frame_masks[row] = 0
+        for class_id in np.unique(class_ids[valid]):
+            self.frame_masks[row, class_id // 64] |= np.uint64(1) << np.uint64(class_id % 64)
+
+        if count:
+            positions = np.arange(start, start + count) % self.max_detections
+            self.boxes[positions] = detection.boxes[:count]
+            self.scores[positions] = detection.scores[:count]
+            self.class_ids[positions] = class_ids[:count]
+            self.track_ids[positions] = detection.track_ids[:count] if detection.track_ids is not None else -1
+        self.next_detection = start + count
+        self.next_seq = seq + 1
+
+        # Drop frames that fell out of either ring
+        oldest_detection = self.next_detection - self.max_detections
+        while self.first_seq < self.next_seq and (
+                self.next_seq - self.first_seq > self.max_frames
+                or self.frame_starts[self.first_seq % self.max_frames] < oldest_detection):
+            self.first_seq += 1
+
+        bucket = int(detection.timestamp // self.bucket_seconds)
+        slot = bucket % self.max_buckets
+        if self.bucket_ids[slot] != bucket:
+            self.bucket_ids[slot] = bucket
+            self.bucket_counts[slot] = 0
+        self.bucket_counts[slot] += np.bincount(class_ids[valid], minlength=self.num_classes)
+
+    def maybe_thumbnail(self, detection):
+        if detection.timestamp - self.last_thumbnail < self.thumbnail_interval:
+            return
+        self.last_thumbnail = detection.timestamp
+        small = cv2.resize(detection.frame, fit_size(detection.frame.shape, *self.thumbnail_size),
+                           interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.thumbnail_quality])
+        if not ok:
+            return
+        data = encoded.tobytes()
+        with self.lock:
+            self.thumbnails[self.next_seq - 1] = data
+            self.thumbnail_bytes += len(data)
+            while self.thumbnail_bytes > self.thumbnail_budget and self.thumbnails:
+                _, dropped = self.thumbnails.popitem(last=False)
+                self.thumbnail_bytes -= len(dropped)
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def seq_at(self, timestamp):
+        """First stored frame seq with a timestamp >= timestamp (binary search)"""
+        lo, hi = self.first_seq, self.next_seq
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.frame_timestamps[mid % self.max_frames] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def time_range(self, seconds=None, since=None, until=None):
+        """Resolve 'last N seconds' / explicit bounds to (since, until) timestamps"""
+        until = time.time() if until is None else until
+        if since is None:
+            since = until - seconds if seconds is not None else 0.0
+        return since, until
+
+    def entry(self, seq):
+        """The stored frame with this sequence number, or None once it was evicted"""
+        with self.lock:
+            if not self.first_seq <= seq < self.next_seq:
+                return None
+            row = seq % self.max_frames
+            start, count = int(self.frame_starts[row]), int(self.frame_counts[row])
+            positions = np.arange(start, start + count) % self.max_detections
+            return HistoryEntry(
+                seq, float(self.frame_timestamps[row]), int(self.frame_sources[row]),
+                int(self.frame_indices[row]), self.boxes[positions],
+                self.scores[positions].astype(np.float32), self.class_ids[positions].astype(np.int32),
+                self.track_ids[positions]
+            )
+
+    def latest(self):
+        return self.entry(self.next_seq - 1)
+
+    def class_counts(self, seconds=None, since=None, until=None):
+        """Detections per class in a time range, to bucket_seconds resolution"""
+        if not self.num_classes:
+            return {}
+        since, until = self.time_range(seconds, since, until)
+        first, last = int(since // self.bucket_seconds), int(until // self.bucket_seconds)
+        with self.lock:
+            rows = (self.bucket_ids >= first) & (self.bucket_ids <= last)
+            totals = self.bucket_counts[rows].sum(axis=0)
+        return {int(class_id): int(totals[class_id]) for class_id in np.nonzero(totals)[0]}
+
+    def label_counts(self, seconds=None, since=None, until=None):
+        counts = self.class_counts(seconds, since, until)
+        return {self.names.get(class_id, str(class_id)): count for class_id, count in counts.items()}
+
+    def frames_with_class(self, class_id, seconds=None, since=None, until=None, limit=None):
+        """Sequence numbers of stored frames containing class_id, oldest first"""
+        if not self.num_classes or not 0 <= class_id < self.num_classes:
+            return []
+        since, until = self.time_range(seconds, since, until)
+        word, bit = class_id // 64, np.uint64(class_id % 64)
+        with self.lock:
+            lo, hi = self.seq_at(since), self.seq_at(np.nextafter(until, np.inf))
+            seqs = np.arange(lo, hi)
+            present = (self.frame_masks[seqs % self.max_frames, word] >> bit) & np.uint64(1)
+        found = seqs[present.astype(bool)]
+        if limit is not None:
+            found = found[:limit]
+        return found.tolist()
+
+    def thumbnail(self, seq):
+        """Decoded BGR thumbnail stored for this frame, if any"""
+        with self.lock:
+            data = self.thumbnails.get(seq)
+        if data is None:
+            return None
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def nearest_thumbnail(self, seq):
+        """(seq, image) of the closest stored thumbnail at or before seq"""
+        with self.lock:
+            candidates = [s for s in self.thumbnails if s <= seq]
+        if not candidates:
+            return None, None
+        best = max(candidates)
+        return best, self.thumbnail(best)
+
+    def memory_mb(self):
+        if not self.num_classes:
+            return 0.0
+        arrays = (self.frame_timestamps, self.frame_sources, self.frame_indices, self.frame_starts,
+                  self.frame_counts, self.frame_masks, self.boxes, self.scores, self.class_ids,
+                  self.track_ids, self.bucket_ids, self.bucket_counts)
+        return (sum(array.nbytes for array in arrays) + self.thumbnail_bytes) / (1024 * 1024)
+
+    def stats(self):
+        with self.lock:
+            span = 0.0
+            if len(self):
+                span = (self.frame_timestamps[(self.next_seq - 1) % self.max_frames]
+                        - self.frame_timestamps[self.first_seq % self.max_frames])
+            return {
+                'frames': len(self),
+                'detections': min(self.next_detection, self.max_detections),
+                'span_s': float(span),
+                'thumbnails': len(self.thumbnails),
+                'thumbnail_mb': self.thumbnail_bytes / (1024 * 1024),
+                'reserved_mb': self.memory_mb(),
+            }
+
+    def clear(self):
+        with self.lock:
+            self.first_seq = self.next_seq
+            self.thumbnails.clear()
+            self.thumbnail_bytes = 0
+            if self.num_classes:
+                self.bucket_ids[:] = -1
+                self.bucket_counts[:] = 0
+
+    def close(self):
+        pass
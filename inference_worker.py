@@ -0,0 +1,80 @@
+"""Entry point of the inference worker processes started by process_workers.py.
+
+Kept in its own importable module so spawned workers find their target by
+import, without touching the parent's __main__.
+"""
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from class_filter import ClassFilter
+from detection_engine import DetectionEngine
+from frame_pool import attach_frame
+
+
+# Result rows per slot: x1, y1, x2, y2, score, class_id
+MAX_RESULT_ROWS = 300
+RESULT_COLUMNS = 6
+
+
+def inference_worker(model_path, device, backend, imgsz, precision, threads, result_name,
+                     task_queue, result_queue):
+    """Worker process main: load a model, then serve frames until told to stop"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+
+        engine = DetectionEngine(model_path=model_path, device=device, backend=backend, imgsz=imgsz,
+                                 precision=precision)
+        engine.load()
+    except Exception as e:
+        # Bad model path, missing backend, out of memory: tell the pool instead of dying silently
+        result_queue.put(('failed', os.getpid(), f"{type(e).__name__}: {e}"))
+        return
+    outputs = shared_memory.SharedMemory(name=result_name)
+    attached = {}  # frame pool name -> SharedMemory
+    result_queue.put(('ready', os.getpid(), engine.names))
+
+    frame = rows = detection = None
+    class_key = None
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        slot, frame_name, offset, height, width, conf, iou, max_det, imgsz, filter_key = task
+        try:
+            if frame_name not in attached:
+                attached[frame_name] = shared_memory.SharedMemory(name=frame_name)
+            frame = attach_frame(attached[frame_name], offset, (height, width, 3))
+            engine.confidence_threshold = conf
+            engine.iou_threshold = iou
+            engine.max_detections = max_det
+            engine.imgsz = imgsz
+            if filter_key != class_key:
+                engine.class_filter = ClassFilter(*filter_key) if filter_key is not None else None
+                class_key = filter_key
+
+            started = time.perf_counter()
+            detection = engine.postprocess(engine.infer(frame), frame)
+            elapsed = time.perf_counter() - started
+
+            count = min(detection.count, MAX_RESULT_ROWS)
+            rows = np.ndarray((MAX_RESULT_ROWS, RESULT_COLUMNS), dtype=np.float32,
+                              buffer=outputs.buf, offset=slot * MAX_RESULT_ROWS * RESULT_COLUMNS * 4)
+            rows[:count, :4] = detection.boxes[:count]
+            rows[:count, 4] = detection.scores[:count]
+            rows[:count, 5] = detection.class_ids[:count]
+            result_queue.put(('done', slot, count, elapsed))
+        except Exception as e:
+            result_queue.put(('error', slot, str(e), 0.0))
+        finally:
+            frame = rows = detection = None
+
+    try:
+        for shm in list(attached.values()) + [outputs]:
+            shm.close()
+    except BufferError:
+        # The model may still reference the last frame view; exiting frees it
+        pass
@@ -0,0 +1,263 @@
+"""Low-overhead stage timers, counters and gauges with a Prometheus endpoint.
+
+Instrumented code holds a `metrics` attribute that is None by default and
+checks it before timing anything, so with metrics off the hot path does no
+extra work at all. With metrics on, one observation is a bisect into fixed
+histogram buckets plus a few additions, about a microsecond, or well under
+0.1% of a 30 ms frame at the handful of stages timed per frame
+(`python metrics.py --overhead` measures it on this machine).
+
+Gauges and drop counters are callables that read existing stats() methods
+when the endpoint is scraped or the panel refreshes, so they cost nothing
+per frame.
+
+    metrics = Metrics()
+    pipeline.metrics = metrics                  # capture/preprocess/inference/sink timers
+    watch(metrics, pipeline=pipeline, display=display)
+    MetricsServer(metrics, port=9464).start()   # http://127.0.0.1:9464/metrics
+"""
+import argparse
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Seconds; covers sub-millisecond sink writes up to multi-second stalls
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class StageHistogram:
+    """Cumulative histogram plus a window of recent values for percentiles"""
+
+    __slots__ = ('counts', 'total', 'count', 'recent')
+
+    def __init__(self, window=512):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect_right(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, q):
+        values = sorted(self.recent)
+        if not values:
+            return 0.0
+        return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+class Metrics:
+    """Registry of stage histograms, counters and callback gauges"""
+
+    def __init__(self, prefix="detection"):
+        self.prefix = prefix
+        self.stages = {}
+        self.counters = {}
+        self.gauges = []       # (name, labels, fn, type, help)
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(stage, StageHistogram())
+        histogram.observe(seconds)
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, fn, help="", kind="gauge", **labels):
+        """Register fn() -> number, read at scrape time; kind "counter" for monotonic totals"""
+        with self.lock:
+            self.gauges.append((name, labels, fn, kind, help))
+
+    def clear_gauges(self):
+        """Forget registered gauges, e.g. before watching a restarted pipeline"""
+        with self.lock:
+            self.gauges = []
+
+    def read_gauges(self):
+        values = []
+        for name, labels, fn, kind, help in list(self.gauges):
+            try:
+                value = fn()
+            except Exception:
+                continue  # the component may be gone (e.g. detection stopped)
+            if value is not None:
+                values.append((name, labels, float(value), kind, help))
+        return values
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each pipeline stage",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.total}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value}")
+
+        # A family's samples must follow its TYPE line together, whatever order they registered in
+        families = {}
+        for name, labels, value, kind, help in self.read_gauges():
+            families.setdefault(name, []).append((labels, value, kind, help))
+        for name, samples in families.items():
+            _, _, kind, help = samples[0]
+            if help:
+                lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value, _, _ in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in sorted(labels.items()))
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+        lines.append(f"{prefix}_uptime_seconds {time.time() - self.started}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Plain dict for the stats panel and logs"""
+        return {
+            'stages': {
+                stage: {
+                    'count': histogram.count,
+                    'mean_ms': 1000 * histogram.total / max(histogram.count, 1),
+                    'p50_ms': 1000 * histogram.percentile(50),
+                    'p95_ms': 1000 * histogram.percentile(95),
+                }
+                for stage, histogram in sorted(self.stages.items())
+            },
+            'counters': dict(self.counters),
+            'gauges': {
+                name + "".join(f"[{val}]" for val in labels.values()): value
+                for name, labels, value, _, _ in self.read_gauges()
+            },
+        }
+
+    def format_summary(self):
+        summary = self.summary()
+        lines = [f"{'stage':<22}{'p50 ms':>8}{'p95 ms':>8}{'mean':>8}{'count':>9}"]
+        for stage, row in summary['stages'].items():
+            lines.append(f"{stage:<22}{row['p50_ms']:>8.2f}{row['p95_ms']:>8.2f}{row['mean_ms']:>8.2f}"
+                         f"{row['count']:>9}")
+        lines.append("")
+        for name, value in sorted(summary['counters'].items()):
+            lines.append(f"{name:<30}{value:>12}")
+        for name, value in sorted(summary['gauges'].items()):
+            lines.append(f"{name:<30}{value:>12g}")
+        return "\n".join(lines)
+
+
+def watch(metrics, pipeline=None, display=None, sinks=()):
+    """Register queue-depth gauges and drop counters for the usual components"""
+    if pipeline is not None:
+        metrics.gauge("frames_captured_total", lambda: pipeline.captured_frames, kind="counter")
+        metrics.gauge("frames_dropped_total", lambda: pipeline.dropped_frames, kind="counter",
+                      help="Frames dropped", where="capture")
+        metrics.gauge("frames_processed_total", lambda: pipeline.processed_frames, kind="counter")
+        metrics.gauge("frame_skip", lambda: pipeline.frame_skip)
+        metrics.gauge("imgsz", lambda: pipeline.engine.imgsz)
+    if display is not None:
+        metrics.gauge("queue_depth", lambda: display.pending is not None, help="Items waiting", queue="display")
+        metrics.gauge("frames_dropped_total", lambda: display.dropped_frames, kind="counter", where="display")
+    for sink in sinks:
+        name = type(sink).__name__
+        if hasattr(sink, 'queue'):
+            metrics.gauge("queue_depth", sink.queue.qsize, queue=name)
+        elif hasattr(sink, 'writer'):
+            metrics.gauge("queue_depth", sink.writer.queue.qsize, queue=name)
+        if hasattr(sink, 'dropped_records'):
+            metrics.gauge("frames_dropped_total", lambda sink=sink: sink.dropped_records, kind="counter",
+                          where=name)
+        elif hasattr(sink, 'dropped_frames'):
+            metrics.gauge("frames_dropped_total", lambda sink=sink: sink.dropped_frames, kind="counter",
+                          where=name)
+
+
+class MetricsServer:
+    """Serve Metrics.render() at http://host:port/metrics (localhost by default)"""
+
+    def __init__(self, metrics, port=9464, host="127.0.0.1"):
+        self.metrics = metrics
+        self.address = (host, port)
+        self.server = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        return f"http://{self.address[0]}:{self.server.server_address[1] if self.server else self.address[1]}/metrics"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def measure_overhead(observations=200_000, frame_ms=30.0, stages_per_frame=8):
+    """Cost of one observe() call and its share of a typical frame"""
+    metrics = Metrics()
+    started = time.perf_counter()
+    for i in range(observations):
+        t0 = time.perf_counter()
+        metrics.observe("stage", time.perf_counter() - t0)
+    per_call = (time.perf_counter() - started) / observations
+    return {
+        'per_observation_us': per_call * 1e6,
+        'per_frame_us': per_call * stages_per_frame * 1e6,
+        'share_of_frame': per_call * stages_per_frame / (frame_ms / 1000),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Metrics instrumentation tools")
+    parser.add_argument("--overhead", action="store_true", help="measure the cost of a timed observation")
+    parser.add_argument("--frame-ms", type=float, default=30.0)
+    args = parser.parse_args(argv)
+    if args.overhead:
+        result = measure_overhead(frame_ms=args.frame_ms)
+        print(f"{result['per_observation_us']:.2f} us per timed stage, {result['per_frame_us']:.1f} us per frame "
+              f"({result['share_of_frame'] * 100:.3f}% of a {args.frame_ms:.0f} ms frame)")
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,513 @@
+"""Local inference daemon: one warm model shared by many client processes.
+
+    python model_server.py                                   # unix socket in the temp dir
+    python model_server.py --address tcp://127.0.0.1:8770    # where AF_UNIX is unavailable
+    python advanced_app.py --server unix:/tmp/detection-model.sock
+    python detection_engine.py --source 0 --server unix:/tmp/detection-model.sock
+
+The server loads the model once (plus a warmup inference) and feeds requests
+from every connection into one BatchScheduler, so frames from different
+clients share forward passes. Pixels travel through shared memory: each
+client owns a SharedFramePool and sends only the block name, offset and shape,
+and the server attaches each block once per connection. Clients without
+shared memory send the frame bytes inline.
+
+Every request carries a deadline budget. A request still queued when its
+deadline passes is answered EXPIRED instead of being run, so one stalled
+client never makes the others wait behind stale frames. Replies are packed
+DetectionRecords (boxes, scores, class ids; see events.py), never pixels.
+The server applies its own IoU threshold and image size; confidence and max
+detections are per request, as long as the confidence is at or above the
+server's --conf floor. A client's class filter is applied to its replies; a
+server-wide --classes / --class-config is applied before NMS for everyone.
+
+ModelClient keeps a small pool of connections, spreads requests over them,
+reconnects after a failure and offers the submit() -> Future API of
+BatchScheduler and ProcessInferencePool, so it plugs into
+DetectionPipeline(executor=client, max_in_flight=N).
+
+Wire format: every message is a little-endian uint32 length and a body. The
+server first sends a JSON hello (class names, model, device); requests are
+REQUEST plus the shared-memory name or the raw frame; replies are REPLY plus a
+packed record (OK) or an error text.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backends import BACKENDS
+from batch_scheduler import BatchScheduler, DeadlineExceeded
+from class_filter import parse_class_filter
+from detection_engine import DEFAULT_MODEL, DetectionEngine, DetectionResult
+from events import LENGTH, DetectionRecord
+from frame_pool import SharedFramePool, attach_frame
+
+
+logger = logging.getLogger(__name__)
+
+# request id, frame index, source id, height, width, confidence, max detections,
+# deadline budget (ms), shared-memory offset, shared-memory name length
+REQUEST = struct.Struct("<QqIIIfIfQB")
+# request id, status, inference time (ms)
+REPLY = struct.Struct("<QBf")
+OK, EXPIRED, ERROR = 0, 1, 2
+
+if hasattr(socket, "AF_UNIX"):
+    DEFAULT_ADDRESS = "unix:" + os.path.join(tempfile.gettempdir(), "detection-model.sock")
+else:
+    DEFAULT_ADDRESS = "tcp://127.0.0.1:8770"
+
+
+def parse_address(address):
+    """'unix:/path.sock' -> (AF_UNIX, path); 'tcp://host:port' or 'host:port' -> (AF_INET, (host, port))"""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.replace("tcp://", "").rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def read_message(rfile):
+    """One length-prefixed body, or None at end of stream"""
+    header = rfile.read(LENGTH.size)
+    if len(header) < LENGTH.size:
+        return None
+    size = LENGTH.unpack(header)[0]
+    body = rfile.read(size)
+    return body if len(body) == size else None
+
+
+class ModelServer:
+    """Serve one engine to many local clients with cross-client batching"""
+
+    def __init__(self, engine, address=DEFAULT_ADDRESS, max_batch_size=8, max_wait=0.005, max_pending=128,
+                 default_budget=1.0):
+        self.engine = engine
+        self.address = address
+        self.default_budget = default_budget  # seconds, for requests that send no budget
+        self.scheduler = BatchScheduler(engine, max_batch_size=max_batch_size, max_wait=max_wait,
+                                        max_pending=max_pending)
+        self.server = None
+        self.lock = threading.Lock()
+
+        # Counters
+        self.connections = 0
+        self.open_connections = 0
+        self.requests = 0
+        self.completed = 0
+        self.expired = 0
+        self.errors = 0
+
+    def hello(self):
+        return {
+            'names': self.engine.names,
+            'model': self.engine.model_path,
+            'backend': self.engine.backend_name,
+            'device': self.engine.device,
+            'imgsz': self.engine.imgsz,
+            'conf': self.engine.confidence_threshold,
+        }
+
+    def start(self):
+        family, location = parse_address(self.address)
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.serve_connection(self.rfile, self.wfile)
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(location):
+                os.unlink(location)  # left over from a server that didn't shut down cleanly
+            self.server = socketserver.ThreadingUnixStreamServer(location, Handler)
+        else:
+            self.server = socketserver.ThreadingTCPServer(location, Handler)
+        self.server.daemon_threads = True
+        self.scheduler.start()
+        threading.Thread(target=self.server.serve_forever, name="ModelServer", daemon=True).start()
+        logger.info(f"Model server listening on {self.address}")
+        return self
+
+    def serve_connection(self, rfile, wfile):
+        send_lock = threading.Lock()
+        attached = {}       # shared-memory name -> SharedMemory
+        outstanding = set()
+
+        def send(body):
+            with send_lock:
+                wfile.write(LENGTH.pack(len(body)) + body)
+                wfile.flush()
+
+        with self.lock:
+            self.connections += 1
+            self.open_connections += 1
+        try:
+            send(json.dumps(self.hello()).encode("utf-8"))
+            while True:
+                body = read_message(rfile)
+                if body is None:
+                    break
+                (request_id, frame_index, source_id, height, width, conf, max_det, budget_ms, offset,
+                 name_length) = REQUEST.unpack_from(body)
+                shape = (height, width, 3)
+                if name_length:
+                    name = body[REQUEST.size:REQUEST.size + name_length].decode("ascii")
+                    if name not in attached:
+                        attached[name] = shared_memory.SharedMemory(name=name)
+                    frame = attach_frame(attached[name], offset, shape)
+                else:
+                    frame = np.frombuffer(body, np.uint8, height * width * 3, REQUEST.size).reshape(shape)
+
+                budget = budget_ms / 1000 if budget_ms > 0 else self.default_budget
+                self.requests += 1
+                # Blocks while the scheduler is full, which pushes back on this client only
+                future = self.scheduler.submit(frame, source_id, frame_index,
+                                               deadline=time.perf_counter() + budget)
+                outstanding.add(future)
+                future.add_done_callback(
+                    lambda future, request_id=request_id, conf=conf, max_det=max_det:
+                    self.reply(send, outstanding, request_id, conf, max_det, future)
+                )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Client connection failed: {e}")
+        finally:
+            # The model may still be reading frames from this client's memory
+            deadline = time.perf_counter() + 5.0
+            while outstanding and time.perf_counter() < deadline:
+                time.sleep(0.01)
+            frame = None
+            for shm in attached.values():
+                try:
+                    shm.close()
+                except BufferError:
+                    pass
+            with self.lock:
+                self.open_connections -= 1
+
+    def reply(self, send, outstanding, request_id, conf, max_det, future):
+        try:
+            detection = future.result()
+        except DeadlineExceeded:
+            self.expired += 1
+            body = REPLY.pack(request_id, EXPIRED, 0.0)
+        except Exception as e:
+            self.errors += 1
+            body = REPLY.pack(request_id, ERROR, 0.0) + str(e).encode("utf-8")
+        else:
+            detection = detection.filter(conf, max_det)
+            self.completed += 1
+            body = (REPLY.pack(request_id, OK, 1000 * (detection.inference_time or 0.0))
+                    + DetectionRecord.from_detection(detection).to_bytes())
+        finally:
+            outstanding.discard(future)
+        try:
+            send(body)
+        except (OSError, ValueError):
+            pass  # the client has gone
+
+    def stats(self):
+        return {
+            'connections': self.connections,
+            'open_connections': self.open_connections,
+            'requests': self.requests,
+            'completed': self.completed,
+            'expired': self.expired,
+            'errors': self.errors,
+            'scheduler': self.scheduler.stats(),
+        }
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.scheduler.stop()
+        family, location = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(location):
+            os.unlink(location)
+
+
+class PendingRequest:
+    __slots__ = ('future', 'frame', 'lease', 'source_id', 'frame_index', 'timestamp')
+
+    def __init__(self, frame, lease, source_id, frame_index):
+        self.future = Future()
+        self.frame = frame
+        self.lease = lease  # our shared-memory copy, when the frame wasn't in the pool already
+        self.source_id = source_id
+        self.frame_index = frame_index
+        self.timestamp = time.time()
+
+
+class ServerConnection:
+    """One socket to the server with its own reader thread"""
+
+    def __init__(self, client, address, timeout):
+        family, location = parse_address(address)
+        self.client = client
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(location)
+        self.rfile = self.socket.makefile("rb")
+        hello = read_message(self.rfile)
+        if hello is None:
+            self.socket.close()
+            raise ConnectionError(f"No hello from model server at {address}")
+        self.hello = json.loads(hello.decode("utf-8"))
+        self.socket.settimeout(None)
+        self.send_lock = threading.Lock()
+        self.pending = {}   # request id -> PendingRequest
+        self.alive = True
+        self.thread = threading.Thread(target=self.read_loop, name="ServerConnection", daemon=True)
+        self.thread.start()
+
+    def send(self, request_id, pending, header, payload):
+        self.pending[request_id] = pending
+        try:
+            with self.send_lock:
+                self.socket.sendall(LENGTH.pack(len(header) + len(payload)) + header)
+                if payload:
+                    self.socket.sendall(payload)
+        except OSError as e:
+            self.pending.pop(request_id, None)
+            self.fail(e)
+            raise
+
+    def read_loop(self):
+        try:
+            while True:
+                body = read_message(self.rfile)
+                if body is None:
+                    break
+                request_id, status, inference_ms = REPLY.unpack_from(body)
+                pending = self.pending.pop(request_id, None)
+                if pending is not None:
+                    self.client.resolve(pending, status, inference_ms, body[REPLY.size:])
+        except OSError:
+            pass
+        self.fail(ConnectionError("Model server connection closed"))
+
+    def fail(self, error):
+        self.alive = False
+        for request_id in list(self.pending):
+            pending = self.pending.pop(request_id, None)
+            if pending is not None:
+                self.client.release(pending)
+                pending.future.set_exception(error)
+
+    def close(self):
+        self.alive = False
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self.thread.join(1.0)
+
+
+class ModelClient:
+    """Pooled connections to a ModelServer behind a submit() -> Future API.
+
+    The engine passed in is only read for its live settings (confidence, max
+    detections) and is never loaded here.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, engine=None, connections=2, budget=0.5, use_shared_memory=True,
+                 max_width=1920, max_height=1080, frame_slots=16, timeout=5.0):
+        self.address = address
+        self.engine = engine
+        self.size = connections
+        self.budget = budget          # seconds a frame may wait at the server before it's dropped
+        self.timeout = timeout
+        self.frame_pool = (SharedFramePool(capacity=frame_slots, max_width=max_width, max_height=max_height)
+                           if use_shared_memory else None)
+        self.connections = []
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.names = {}
+        self.device = None
+        self.running = False
+
+        # Counters
+        self.submitted_frames = 0
+        self.completed_frames = 0
+        self.expired_frames = 0
+        self.copied_frames = 0
+        self.reconnects = 0
+        self.server_time = 0.0
+
+    def start(self):
+        for _ in range(self.size):
+            self.connections.append(self.connect())
+        self.running = True
+        return self
+
+    def connect(self):
+        connection = ServerConnection(self, self.address, self.timeout)
+        self.names = {int(class_id): name for class_id, name in connection.hello['names'].items()}
+        self.device = connection.hello.get('device')
+        return connection
+
+    def pick_connection(self):
+        """Least busy live connection; dead ones are replaced on the way"""
+        with self.lock:
+            for index, connection in enumerate(self.connections):
+                if not connection.alive:
+                    connection.close()
+                    self.connections[index] = self.connect()
+                    self.reconnects += 1
+            return min(self.connections, key=lambda connection: len(connection.pending))
+
+    def submit(self, frame, source_id=0, frame_index=0, timeout=None):
+        if not self.running:
+            raise RuntimeError("ModelClient is not running")
+        height, width = frame.shape[:2]
+        engine = self.engine
+        conf = engine.confidence_threshold if engine is not None else 0.0
+        max_det = engine.max_detections if engine is not None else 300
+        class_filter = engine.class_filter if engine is not None else None
+        if class_filter is not None:
+            # The server applies one threshold; per-class ones are checked in resolve()
+            conf = class_filter.min_threshold(self.names, conf)
+
+        lease = None
+        name = b""
+        offset = 0
+        payload = b""
+        if self.frame_pool is not None and self.frame_pool.fits(frame.shape):
+            offset = self.frame_pool.locate(frame)
+            if offset is None:
+                lease = self.frame_pool.adopt(np.ascontiguousarray(frame))
+                offset = lease.location[1]
+                self.copied_frames += 1
+            name = self.frame_pool.name.encode("ascii")
+        else:
+            # No pool, or a frame larger than its slots: send the pixels inline
+            payload = np.ascontiguousarray(frame).reshape(-1).data  # flat, so len() is the byte count
+
+        pending = PendingRequest(frame, lease, source_id, frame_index)
+        request_id = next(self.request_ids)
+        header = REQUEST.pack(request_id, frame_index, source_id, height, width, conf, max_det,
+                              1000 * self.budget, offset, len(name)) + name
+        try:
+            self.pick_connection().send(request_id, pending, header, payload)
+        except OSError as e:
+            if not pending.future.done():
+                self.release(pending)
+                pending.future.set_exception(ConnectionError(f"Model server unavailable: {e}"))
+        self.submitted_frames += 1
+        return pending.future
+
+    def release(self, pending):
+        if pending.lease is not None:
+            pending.lease.release()
+            pending.lease = None
+
+    def resolve(self, pending, status, inference_ms, data):
+        """Reader thread: turn a reply into a DetectionResult or an exception"""
+        self.release(pending)
+        if status == EXPIRED:
+            self.expired_frames += 1
+            pending.future.set_exception(DeadlineExceeded("Model server dropped the frame after its deadline"))
+            return
+        if status == ERROR:
+            pending.future.set_exception(RuntimeError(data.decode("utf-8", "replace")))
+            return
+        record = DetectionRecord.from_bytes(data)
+        detection = DetectionResult(
+            record.boxes, record.scores, record.class_ids.astype(np.int32), self.names,
+            frame=pending.frame, timestamp=pending.timestamp,
+            frame_index=pending.frame_index, source_id=pending.source_id
+        )
+        class_filter = self.engine.class_filter if self.engine is not None else None
+        if class_filter is not None:
+            detection = detection.filter(self.engine.confidence_threshold, class_filter=class_filter)
+        detection.inference_time = inference_ms / 1000
+        self.completed_frames += 1
+        self.server_time += detection.inference_time
+        pending.future.set_result(detection)
+
+    def stats(self):
+        return {
+            'connections': sum(connection.alive for connection in self.connections),
+            'in_flight': sum(len(connection.pending) for connection in self.connections),
+            'submitted': self.submitted_frames,
+            'completed': self.completed_frames,
+            'expired': self.expired_frames,
+            'copied': self.copied_frames,
+            'reconnects': self.reconnects,
+            'avg_infer_ms': 1000 * self.server_time / max(self.completed_frames, 1),
+            'frame_pool': self.frame_pool.stats() if self.frame_pool is not None else None,
+        }
+
+    def stop(self):
+        self.running = False
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        if self.frame_pool is not None:
+            self.frame_pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared local inference server")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help="unix:/path.sock or tcp://127.0.0.1:PORT")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None, help="cpu or cuda (default: auto)")
+    parser.add_argument("--backend", default="auto", choices=["auto"] + list(BACKENDS))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.1,
+                        help="confidence floor; clients filter above it with their own threshold")
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-det", type=int, default=300)
+    parser.add_argument("--classes", default=None, metavar="NAMES",
+                        help="only detect these classes for every client (skips NMS work on the rest)")
+    parser.add_argument("--class-config", default=None, metavar="CONFIG",
+                        help="JSON file with classes/thresholds for every client")
+    parser.add_argument("--batch-size", type=int, default=8, help="largest cross-client batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="how long the first frame of a batch waits for others")
+    parser.add_argument("--no-warmup", action="store_true")
+    parser.add_argument("--stats-interval", type=float, default=30.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    engine = DetectionEngine(
+        model_path=args.model, device=args.device, confidence_threshold=args.conf, iou_threshold=args.iou,
+        max_detections=args.max_det, backend=args.backend, imgsz=args.imgsz
+    )
+    engine.class_filter = parse_class_filter(args.classes, config=args.class_config)
+    started = time.perf_counter()
+    engine.load()
+    if not args.no_warmup:
+        engine.warmup()
+    logger.info(f"Model ready in {time.perf_counter() - started:.1f}s ({engine.backend_name} on {engine.device})")
+
+    server = ModelServer(engine, args.address, max_batch_size=args.batch_size,
+                         max_wait=args.max_wait_ms / 1000).start()
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            logger.info(f"Server: {server.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
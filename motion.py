@@ -0,0 +1,252 @@
+"""Motion-gated inference: skip the model when the scene hasn't changed.
+
+Each frame is downscaled to a small blurred grayscale image and compared
+with the frame the model last ran on, either by plain differencing or with a
+MOG2 background subtractor. If too few pixels changed, the previous
+detections are reused for the new frame. If the change is confined to a
+small area, the model can optionally run on just that crop; detections
+outside it are carried over.
+
+    gate = MotionGate(pixel_threshold=25, min_changed=0.002, crop=True)
+    pipeline = DetectionPipeline(source, engine, sinks=[...], gate=gate)
+
+Report the savings on a recorded video:
+
+    python motion.py recording.mp4 --max-frames 900
+"""
+import argparse
+import logging
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """Cheap change detector deciding whether (and where) a frame needs inference"""
+
+    def __init__(self, method="diff", width=160, pixel_threshold=25, min_changed=0.002, blur=5,
+                 max_static_frames=30, crop=False, crop_padding=0.1, max_crop_area=0.5):
+        self.method = method                  # "diff" or "mog2"
+        self.width = width                    # analysis width in pixels
+        self.pixel_threshold = pixel_threshold  # gray-level change that counts (diff)
+        self.min_changed = min_changed        # changed-pixel fraction that counts as motion
+        self.blur = blur
+        self.max_static_frames = max_static_frames  # refresh at least this often (0: never)
+        self.crop = crop
+        self.crop_padding = crop_padding      # fraction of the region size added per side
+        self.max_crop_area = max_crop_area    # larger regions run on the full frame
+
+        self.pool = FramePool()
+        self.slot = 0
+        self.reference = None  # small gray frame the model last ran on
+        self.current = None
+        self.subtractor = None
+        if method == "mog2":
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=True)
+        self.previous = None   # (boxes, scores, class_ids, track_ids, names) of the last inference
+        self.static_frames = 0
+        self.last_changed = 0.0
+
+        # Counters
+        self.checked_frames = 0
+        self.avoided_inferences = 0
+        self.cropped_inferences = 0
+        self.full_inferences = 0
+        self.propagated_frames = 0  # changed frames the tracker handled without the model
+        self.gate_time = 0.0
+
+    def small_gray(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(self.width / width, 1.0)
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        small = cv2.resize(frame, size, dst=self.pool.scratch("small", (size[1], size[0], 3)),
+                           interpolation=cv2.INTER_AREA)
+        self.slot ^= 1
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY,
+                            dst=self.pool.scratch(f"gray{self.slot}", (size[1], size[0])))
+        if self.blur:
+            cv2.GaussianBlur(gray, (self.blur, self.blur), 0, dst=gray)
+        return gray
+
+    def change_mask(self, gray):
+        if self.subtractor is not None:
+            return self.subtractor.apply(gray) > 200  # 127 marks shadows
+        diff = cv2.absdiff(gray, self.reference, dst=self.pool.scratch("diff", gray.shape))
+        return diff > self.pixel_threshold
+
+    def check(self, frame):
+        """Return (changed, region); region is an xyxy crop in frame pixels or None for the whole frame"""
+        started = time.perf_counter()
+        self.checked_frames += 1
+        gray = self.small_gray(frame)
+        self.current = gray
+        try:
+            if self.reference is None or self.previous is None or self.reference.shape != gray.shape:
+                return True, None
+            mask = self.change_mask(gray)
+            self.last_changed = float(mask.mean())
+            if self.last_changed < self.min_changed:
+                if self.max_static_frames and self.static_frames >= self.max_static_frames:
+                    return True, None  # periodic refresh
+                self.static_frames += 1
+                self.avoided_inferences += 1
+                return False, None
+            return True, self.changed_region(mask, frame.shape) if self.crop else None
+        finally:
+            self.gate_time += time.perf_counter() - started
+
+    def changed_region(self, mask, shape):
+        """Padded bounding box of the changed pixels, or None if it's too big to be worth it"""
+        ys, xs = np.nonzero(mask)
+        height, width = shape[:2]
+        scale_x, scale_y = width / mask.shape[1], height / mask.shape[0]
+        x1, x2 = xs.min() * scale_x, (xs.max() + 1) * scale_x
+        y1, y2 = ys.min() * scale_y, (ys.max() + 1) * scale_y
+        pad_x, pad_y = (x2 - x1) * self.crop_padding + 16, (y2 - y1) * self.crop_padding + 16
+        x1, y1 = int(max(x1 - pad_x, 0)), int(max(y1 - pad_y, 0))
+        x2, y2 = int(min(x2 + pad_x, width)), int(min(y2 + pad_y, height))
+        if (x2 - x1) * (y2 - y1) > self.max_crop_area * width * height:
+            return None
+        return x1, y1, x2, y2
+
+    def detect_region(self, engine, frame, region, frame_index=0, source_id=0):
+        """Run the model on the changed crop; keep previous detections outside it"""
+        from detection_engine import DetectionResult
+
+        x1, y1, x2, y2 = region
+        crop = np.ascontiguousarray(frame[y1:y2, x1:x2])
+        started = time.perf_counter()
+        inside = engine.process(crop, frame_index, source_id, preprocess=False)
+        boxes = inside.boxes + np.array([x1, y1, x1, y1], dtype=np.float32)
+
+        old_boxes, old_scores, old_classes, _, names = self.previous
+        # Previous boxes that don't touch the crop are still valid
+        outside = ((old_boxes[:, 2] <= x1) | (old_boxes[:, 0] >= x2) |
+                   (old_boxes[:, 3] <= y1) | (old_boxes[:, 1] >= y2))
+        detection = DetectionResult(
+            np.concatenate([boxes, old_boxes[outside]]),
+            np.concatenate([inside.scores, old_scores[outside]]),
+            np.concatenate([inside.class_ids, old_classes[outside]]),
+            names, frame=frame, frame_index=frame_index, source_id=source_id
+        )
+        detection.inference_time = time.perf_counter() - started
+        return detection
+
+    def remember(self, detection, cropped=False, inferred=True):
+        """Record fresh detections (inferred=False: tracker-propagated); the frame becomes the new reference"""
+        self.previous = (detection.boxes, detection.scores, detection.class_ids, detection.track_ids,
+                         detection.names)
+        if self.current is not None:
+            # Keep a copy: the scratch buffers alternate between frames
+            self.reference = self.pool.scratch("reference", self.current.shape)
+            np.copyto(self.reference, self.current)
+        self.static_frames = 0
+        if not inferred:
+            self.propagated_frames += 1
+        elif cropped:
+            self.cropped_inferences += 1
+        else:
+            self.full_inferences += 1
+
+    def reuse(self, frame, frame_index=0, source_id=0):
+        """Previous detections re-issued for an unchanged frame"""
+        from detection_engine import DetectionResult
+
+        boxes, scores, class_ids, track_ids, names = self.previous
+        detection = DetectionResult(boxes, scores, class_ids, names, frame=frame,
+                                    frame_index=frame_index, source_id=source_id)
+        detection.track_ids = track_ids
+        detection.inference_time = 0.0
+        return detection
+
+    def reset(self):
+        self.reference = self.previous = None
+        self.static_frames = 0
+
+    def stats(self):
+        return {
+            'checked': self.checked_frames,
+            'avoided': self.avoided_inferences,
+            'cropped': self.cropped_inferences,
+            'full': self.full_inferences,
+            'propagated': self.propagated_frames,
+            'avoided_ratio': self.avoided_inferences / max(self.checked_frames, 1),
+            'avg_gate_ms': 1000 * self.gate_time / max(self.checked_frames, 1),
+            'changed': self.last_changed,
+        }
+
+
+def run_video(path, engine, gate=None, max_frames=None):
+    """Process a video frame by frame; returns (frames, wall seconds, CPU seconds)"""
+    from detection_engine import DetectionPipeline, open_source
+
+    source = open_source(path, width=None, height=None, fps=None)
+    pipeline = DetectionPipeline(source, engine, max_frames=max_frames, gate=gate)
+    wall, cpu = time.perf_counter(), time.process_time()
+    pipeline.run()
+    return pipeline.processed_frames, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def savings_report(path, engine, gate, max_frames=None):
+    """Run a recording with and without the gate and compare CPU time"""
+    frames, wall, cpu = run_video(path, engine, None, max_frames)
+    gated_frames, gated_wall, gated_cpu = run_video(path, engine, gate, max_frames)
+    stats = gate.stats()
+    return {
+        'frames': frames,
+        'baseline_cpu_s': cpu,
+        'baseline_wall_s': wall,
+        'gated_frames': gated_frames,
+        'gated_cpu_s': gated_cpu,
+        'gated_wall_s': gated_wall,
+        'inferences_avoided': stats['avoided'],
+        'cropped_inferences': stats['cropped'],
+        'full_inferences': stats['full'],
+        'avoided_ratio': stats['avoided_ratio'],
+        'cpu_savings': 1 - gated_cpu / max(cpu, 1e-9),
+        'avg_gate_ms': stats['avg_gate_ms'],
+    }
+
+
+def main(argv=None):
+    from detection_engine import DEFAULT_MODEL, DetectionEngine
+
+    parser = argparse.ArgumentParser(description="CPU savings of motion-gated inference on a recording")
+    parser.add_argument("video")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--method", choices=("diff", "mog2"), default="diff")
+    parser.add_argument("--pixel-threshold", type=int, default=25)
+    parser.add_argument("--min-changed", type=float, default=0.002,
+                        help="fraction of changed pixels that counts as motion")
+    parser.add_argument("--max-static-frames", type=int, default=30)
+    parser.add_argument("--crop", action="store_true", help="run the model on the changed region only")
+    parser.add_argument("--max-frames", type=int, default=None)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    engine = DetectionEngine(model_path=args.model, device="cpu", backend=args.backend)
+    engine.load()
+    gate = MotionGate(method=args.method, pixel_threshold=args.pixel_threshold,
+                      min_changed=args.min_changed, max_static_frames=args.max_static_frames,
+                      crop=args.crop)
+    report = savings_report(args.video, engine, gate, args.max_frames)
+    print(f"Frames:              {report['gated_frames']} (baseline {report['frames']})")
+    print(f"Inferences avoided:  {report['inferences_avoided']} ({report['avoided_ratio'] * 100:.1f}%), "
+          f"cropped: {report['cropped_inferences']}, full: {report['full_inferences']}")
+    print(f"CPU time:            {report['gated_cpu_s']:.1f}s gated vs {report['baseline_cpu_s']:.1f}s "
+          f"({report['cpu_savings'] * 100:.1f}% saved)")
+    print(f"Wall time:           {report['gated_wall_s']:.1f}s gated vs {report['baseline_wall_s']:.1f}s")
+    print(f"Gate cost:           {report['avg_gate_ms']:.2f} ms/frame")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
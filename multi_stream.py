@@ -0,0 +1,264 @@
+"""Serve many camera/video/RTSP streams from one process and one model.
+
+Every stream gets its own capture thread and per-stream state (FPS counter,
+detection history, thresholds). Inference for all streams goes through a
+single shared BatchScheduler, and each stream keeps at most one frame in
+flight, so the FIFO batch queue degrades to round-robin across streams: a
+30 FPS camera can never starve a 5 FPS RTSP feed. Streams can be added and
+removed while the manager is running.
+
+    python multi_stream.py --source 0 --source rtsp://cam/stream --output out.jsonl
+    python multi_stream.py --source clip.mp4 --source clip.mp4 --realtime --loop
+"""
+import argparse
+import logging
+import threading
+import time
+from collections import deque
+
+from batch_scheduler import BatchScheduler
+from detection_engine import DEFAULT_MODEL, DetectionEngine, RateMeter, open_source
+from events import open_sink
+from frame_capture import CaptureThread, PacedSource
+from frame_pool import flip_into
+
+
+logger = logging.getLogger(__name__)
+
+
+class StreamState:
+    """Capture handle plus the per-stream counters and settings"""
+
+    def __init__(self, stream_id, source_spec, capture, confidence_threshold=0.5,
+                 max_detections=100, flip=False, history_size=10, on_detection=None):
+        self.stream_id = stream_id
+        self.source_spec = source_spec
+        self.capture = capture
+        self.on_detection = on_detection
+        self.running = False
+        self.thread = None
+
+        # Settings
+        self.confidence_threshold = confidence_threshold
+        self.max_detections = max_detections
+        self.flip = flip
+
+        # Performance monitoring
+        self.fps_meter = RateMeter(window=30)
+        self.processed_frames = 0
+
+        # Detection history (keep last history_size)
+        self.detection_history = deque(maxlen=history_size)
+
+    @property
+    def fps(self):
+        return self.fps_meter.rate()
+
+    def record(self, detection):
+        self.fps_meter.tick()
+        self.processed_frames += 1
+        self.detection_history.append(detection)
+
+    def stats(self):
+        capture = self.capture.stats()
+        return {
+            'source': str(self.source_spec),
+            'fps': self.fps,
+            'captured': capture['captured'],
+            'dropped': capture['dropped'],
+            'processed': self.processed_frames,
+        }
+
+
+class StreamManager:
+    """Run N streams against one shared engine"""
+
+    def __init__(self, engine, scheduler=None, sinks=()):
+        self.engine = engine
+        # Per-stream flip is applied here, before frames are batched together
+        self.engine.flip = False
+        self.scheduler = scheduler or BatchScheduler(engine, max_batch_size=8, max_wait=0.010)
+        self.sinks = list(sinks)
+        self.sink_lock = threading.Lock()
+
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.next_stream_id = 0
+        self.running = False
+
+    def start(self):
+        self.running = True
+        if not self.scheduler.running:
+            self.scheduler.start()
+        return self
+
+    def add_stream(self, source, stream_id=None, realtime=False, loop=False, on_detection=None,
+                   **settings):
+        """Open a source and start processing it; returns the stream id.
+
+        realtime paces a video file at its native FPS so it behaves like a
+        live feed (a local stand-in for RTSP); loop restarts it at the end.
+        """
+        capture = open_source(source)
+        if not capture.isOpened():
+            raise RuntimeError(f"Cannot open source: {source}")
+        if realtime:
+            capture = PacedSource(capture, loop=loop)
+
+        with self.lock:
+            if stream_id is None:
+                stream_id = self.next_stream_id
+                self.next_stream_id += 1
+            if stream_id in self.streams:
+                capture.release()
+                raise ValueError(f"Stream {stream_id} already exists")
+
+            stream = StreamState(stream_id, source, CaptureThread(capture), on_detection=on_detection,
+                                 **settings)
+            self.streams[stream_id] = stream
+            self.update_confidence_floor()
+
+        stream.running = True
+        stream.capture.start()
+        stream.thread = threading.Thread(target=self.stream_loop, args=(stream,), daemon=True)
+        stream.thread.start()
+        logger.info(f"Stream {stream_id} added: {source}")
+        return stream_id
+
+    def remove_stream(self, stream_id):
+        with self.lock:
+            stream = self.streams.pop(stream_id, None)
+            self.update_confidence_floor()
+        if stream is None:
+            return False
+        stream.running = False
+        stream.capture.release()
+        if stream.thread and stream.thread is not threading.current_thread():
+            stream.thread.join(1.0)
+        logger.info(f"Stream {stream_id} removed")
+        return True
+
+    def update_stream(self, stream_id, **settings):
+        """Change confidence_threshold / max_detections / flip of a live stream"""
+        with self.lock:
+            stream = self.streams[stream_id]
+            for name, value in settings.items():
+                if not hasattr(stream, name):
+                    raise AttributeError(f"Unknown stream setting: {name}")
+                setattr(stream, name, value)
+            self.update_confidence_floor()
+
+    def update_confidence_floor(self):
+        # The shared forward pass keeps everything any stream may want; each
+        # stream then filters to its own threshold (caller holds self.lock)
+        if self.streams:
+            self.engine.confidence_threshold = min(
+                stream.confidence_threshold for stream in self.streams.values()
+            )
+
+    def stream_loop(self, stream):
+        """Per-stream loop: newest frame -> shared scheduler -> sinks"""
+        try:
+            while self.running and stream.running:
+                lease = stream.capture.read_lease()
+                if lease is None:
+                    break
+
+                # The stream owns the pooled frame until its result is out
+                if stream.flip:
+                    lease = flip_into(lease, lease.pool)
+
+                try:
+                    future = self.scheduler.submit(
+                        lease.array, source_id=stream.stream_id,
+                        frame_index=stream.capture.captured_frames - 1
+                    )
+                    detection = future.result().filter(stream.confidence_threshold, stream.max_detections)
+                except BaseException:
+                    lease.release()  # a failed inference must not cost a pool buffer
+                    raise
+                detection.lease = lease
+                try:
+                    stream.record(detection)
+                    if stream.on_detection:
+                        stream.on_detection(detection)
+                    with self.sink_lock:
+                        for sink in self.sinks:
+                            sink.write(detection)
+                finally:
+                    # Callbacks/sinks that keep the frame retain() it themselves
+                    detection.release()
+        except Exception as e:
+            logger.error(f"Stream {stream.stream_id} error: {e}")
+        finally:
+            stream.running = False
+            logger.info(f"Stream {stream.stream_id} finished")
+
+    def active_streams(self):
+        with self.lock:
+            return [stream_id for stream_id, stream in self.streams.items() if stream.running]
+
+    def stats(self):
+        with self.lock:
+            streams = {stream_id: stream.stats() for stream_id, stream in self.streams.items()}
+        return {'streams': streams, 'scheduler': self.scheduler.stats()}
+
+    def stop(self):
+        self.running = False
+        for stream_id in list(self.streams):
+            self.remove_stream(stream_id)
+        self.scheduler.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-stream headless object detection")
+    parser.add_argument("--source", action="append", required=True,
+                        help="camera index, video file or URL (repeat for more streams)")
+    parser.add_argument("--output", default="detections.jsonl",
+                        help=".jsonl, .parquet, .db/.sqlite, http://... or tcp://host:port")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-det", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.010)
+    parser.add_argument("--realtime", action="store_true",
+                        help="play video files at native FPS (stand-in for live streams)")
+    parser.add_argument("--loop", action="store_true", help="with --realtime, restart video files at the end")
+    parser.add_argument("--duration", type=float, default=None, help="stop after N seconds")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    engine = DetectionEngine(
+        model_path=args.model, device=args.device,
+        confidence_threshold=args.conf, iou_threshold=args.iou, max_detections=args.max_det
+    )
+    engine.load()
+
+    sink = open_sink(args.output)
+    scheduler = BatchScheduler(engine, max_batch_size=args.batch_size, max_wait=args.max_wait)
+    manager = StreamManager(engine, scheduler, sinks=[sink]).start()
+    for source in args.source:
+        manager.add_stream(source, realtime=args.realtime, loop=args.loop,
+                           confidence_threshold=args.conf, max_detections=args.max_det)
+
+    start_time = time.time()
+    try:
+        while manager.active_streams():
+            if args.duration and time.time() - start_time > args.duration:
+                break
+            time.sleep(1.0)
+            for stream_id, stats in manager.stats()['streams'].items():
+                logger.info(f"[{stream_id}] {stats['source']}: {stats['fps']:.1f} FPS, "
+                            f"{stats['dropped']}/{stats['captured']} dropped")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        sink.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,347 @@
+"""Offline batch processing of recorded video archives and image folders.
+
+Each input video is split into chunks of --chunk-frames frames. Decoder
+threads seek to their chunk and decode it in parallel (OpenCV releases the
+GIL while decoding), feeding one bounded queue. The main thread pulls
+frames from any chunk, runs them through the engine in batches, and the
+results are merged back into frame order: a chunk's detections are written
+only once every earlier chunk has been written.
+
+After each chunk the output offset is checkpointed, so an interrupted job
+restarted with --resume truncates any partial output and continues with
+the first unfinished chunk. Inputs that can't be opened or decode fewer
+frames than planned are checkpointed as failed, never as done, so --resume
+retries them.
+
+Container frame counts and seeks are approximate for many codecs: the last
+chunk always reads to the real end of the file, and a chunk whose seek
+doesn't land on its first frame is decoded sequentially from the start.
+
+    python offline.py archive/ --output-dir results/ --decoders 4 --batch-size 8
+    python offline.py cam1.mp4 cam2.mp4 --conf 0.4 --iou 0.5 --max-det 50 --resume
+
+One JSON lines file per input is written to the output directory, in the
+same format as the headless detection_engine.py.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from backends import BACKENDS
+from detection_engine import DEFAULT_MODEL, IMAGE_EXTENSIONS, DetectionEngine, open_source
+
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm", ".mpg", ".mpeg", ".wmv")
+CHECKPOINT_NAME = "checkpoint.json"
+
+
+def find_inputs(paths):
+    """Expand files and directories into video files and image folders, in a stable order"""
+    inputs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            if os.path.isfile(path) or "://" in path:
+                inputs.append(path)
+            else:
+                logger.warning(f"Skipping {path}: no such file or directory")
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            files = sorted(files)
+            inputs.extend(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+            if any(name.lower().endswith(IMAGE_EXTENSIONS) for name in files):
+                inputs.append(root)  # an image sequence
+    return inputs
+
+
+def output_name(path):
+    """results file stem for an input: clip.mp4 -> clip, archive/day1/ -> archive_day1"""
+    name = os.path.normpath(path).strip(os.sep).replace(os.sep, "_")
+    return os.path.splitext(name)[0] if os.path.isfile(path) else name
+
+
+def plan_chunks(path, chunk_frames):
+    """[(start, end)] frame ranges; end is None for the last chunk, which reads to the
+    real end of the input (the container's frame count is only an estimate)"""
+    cap = open_source(path, width=None, height=None, fps=None)
+    try:
+        if not cap.isOpened():
+            raise OSError(f"Cannot open {path}")
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if count <= 0 and not cap.read()[0]:
+            raise OSError(f"No frames to decode in {path}")
+    finally:
+        cap.release()
+    if count <= 0:
+        return [(0, None)], 0
+    chunks = [(start, min(start + chunk_frames, count)) for start in range(0, count, chunk_frames)]
+    chunks[-1] = (chunks[-1][0], None)
+    return chunks, count
+
+
+class Checkpoint:
+    """Per-output progress: chunks written and the output size after the last one"""
+
+    EMPTY = {'chunks': 0, 'frames': 0, 'offset': 0, 'done': False, 'error': None}
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def get(self, key):
+        return dict(self.state.get(key, self.EMPTY))
+
+    def update(self, key, **values):
+        entry = self.get(key)
+        entry.update(values)
+        self.state[key] = entry
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temporary, self.path)  # atomic, so a crash never leaves half a checkpoint
+
+
+class ChunkDecoder:
+    """Decode chunks on a pool of threads into one bounded frame queue"""
+
+    def __init__(self, path, chunks, decoders=4, max_queued=64):
+        self.path = path
+        self.chunks = queue.Queue()
+        for chunk_id, (start, end) in chunks:
+            self.chunks.put((chunk_id, start, end))
+        self.frames = queue.Queue(max_queued)
+        self.stop_event = threading.Event()
+        self.decode_time = 0.0
+        self.threads = [threading.Thread(target=self.run, name=f"ChunkDecoder-{i}", daemon=True)
+                        for i in range(decoders)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                chunk_id, start, end = self.chunks.get_nowait()
+            except queue.Empty:
+                return
+            self.decode(chunk_id, start, end)
+
+    def decode(self, chunk_id, start, end):
+        cap = open_source(self.path, width=None, height=None, fps=None)
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+                # The seek didn't land on the chunk's first frame: decode up to it instead
+                logger.warning(f"{self.path}: inexact seek to frame {start}, decoding sequentially")
+                cap.release()
+                cap = open_source(self.path, width=None, height=None, fps=None)
+                for _ in range(start):
+                    if not cap.grab():
+                        break
+        index = start
+        try:
+            while (end is None or index < end) and not self.stop_event.is_set():
+                started = time.perf_counter()
+                ret, frame = cap.read()
+                self.decode_time += time.perf_counter() - started
+                if not ret:
+                    break
+                self.put(('frame', chunk_id, index, frame))
+                index += 1
+        finally:
+            cap.release()
+            # Tells the consumer how many frames this chunk really had
+            self.put(('done', chunk_id, index - start, None))
+
+    def put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+
+class OfflineJob:
+    """Process a list of inputs with one engine, writing ordered, resumable results"""
+
+    def __init__(self, engine, output_dir, chunk_frames=300, decoders=4, batch_size=8, resume=False):
+        self.engine = engine
+        self.output_dir = output_dir
+        self.chunk_frames = chunk_frames
+        self.decoders = decoders
+        self.batch_size = batch_size
+        self.resume = resume
+        os.makedirs(output_dir, exist_ok=True)
+        self.checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_NAME))
+        self.reports = []
+
+    def run(self, inputs):
+        for path in inputs:
+            try:
+                report = self.process(path)
+            except (OSError, RuntimeError) as e:
+                # Failed, not done: --resume retries it from its last finished chunk
+                logger.error(f"{path}: {e}")
+                self.checkpoint.update(os.path.abspath(path), done=False, error=str(e))
+                self.reports.append({'input': path, 'frames': 0, 'elapsed': 0.0, 'fps': 0.0, 'error': str(e)})
+                continue
+            self.reports.append(report)
+            logger.info(f"{path}: {report['frames']} frames in {report['elapsed']:.1f}s "
+                        f"({report['fps']:.1f} FPS){' (resumed)' if report['resumed'] else ''}")
+        return self.reports
+
+    def process(self, path):
+        key = os.path.abspath(path)
+        output_path = os.path.join(self.output_dir, output_name(path) + ".jsonl")
+        progress = self.checkpoint.get(key) if self.resume else dict(Checkpoint.EMPTY)
+        if progress['done']:
+            return {'input': path, 'output': output_path, 'frames': 0, 'elapsed': 0.0, 'fps': 0.0,
+                    'resumed': True, 'skipped': True}
+
+        chunks, total_frames = plan_chunks(path, self.chunk_frames)
+        first_chunk = progress['chunks']
+        output = open(output_path, "r+" if first_chunk and os.path.exists(output_path) else "w",
+                      encoding="utf-8")
+        output.seek(progress['offset'] if first_chunk else 0)
+        output.truncate()
+
+        decoder = ChunkDecoder(path, list(enumerate(chunks))[first_chunk:], self.decoders,
+                               max_queued=self.batch_size * 8).start()
+        pending = {}      # chunk id -> {frame index: DetectionResult}
+        expected = {}     # chunk id -> decoded frame count, once known
+        next_chunk = first_chunk
+        frames_done = progress['frames']
+        processed = 0
+        started = time.perf_counter()
+        remaining = len(chunks) - first_chunk
+        batch = []
+
+        try:
+            while next_chunk < len(chunks):
+                if remaining:
+                    kind, chunk_id, index, frame = decoder.frames.get()
+                    if kind == 'done':
+                        start, end = chunks[chunk_id]
+                        # Bounded chunks must decode in full; the input must have at least one frame
+                        wanted = end - start if end is not None else int(start == 0)
+                        if index < wanted:
+                            raise RuntimeError(f"chunk {chunk_id} decoded {index} of {wanted} frames "
+                                               f"from frame {start}")
+                        expected[chunk_id] = index
+                        remaining -= 1
+                    else:
+                        batch.append((chunk_id, index, frame))
+                elif not batch:
+                    raise RuntimeError(f"Decoding stopped before chunk {next_chunk} finished")
+                # Run a batch when it's full, or with what's left once decoding has finished
+                if len(batch) >= self.batch_size or (batch and not remaining):
+                    detections = self.engine.process_batch(
+                        [frame for _, _, frame in batch], [index for _, index, _ in batch])
+                    for (chunk_id, index, _), detection in zip(batch, detections):
+                        detection.frame = detection.results = None  # keep only the arrays
+                        pending.setdefault(chunk_id, {})[index] = detection
+                    processed += len(batch)
+                    batch = []
+
+                # Ordered merge: write every finished chunk that is next in line
+                while next_chunk in expected and len(pending.get(next_chunk, {})) == expected[next_chunk]:
+                    chunk = pending.pop(next_chunk, {})
+                    output.write("".join(json.dumps(chunk[index].to_dict()) + "\n" for index in sorted(chunk)))
+                    output.flush()
+                    frames_done += len(chunk)
+                    next_chunk += 1
+                    self.checkpoint.update(key, chunks=next_chunk, frames=frames_done, offset=output.tell(),
+                                           done=next_chunk == len(chunks), error=None)
+        finally:
+            decoder.stop()
+            output.close()
+
+        if total_frames and frames_done != total_frames:
+            logger.warning(f"{path}: decoded {frames_done} frames, the container reported {total_frames}")
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        return {
+            'input': path,
+            'output': output_path,
+            'frames': processed,
+            'total_frames': total_frames,
+            'chunks': len(chunks),
+            'elapsed': elapsed,
+            'fps': processed / elapsed,
+            'decode_s': decoder.decode_time,
+            'resumed': first_chunk > 0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline detection over recorded videos and image folders")
+    parser.add_argument("inputs", nargs="+", help="video files, image folders or directories to scan")
+    parser.add_argument("--output-dir", default="results")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None, help="cpu or cuda (default: auto)")
+    parser.add_argument("--backend", default="auto", choices=["auto"] + list(BACKENDS))
+    parser.add_argument("--imgsz", type=int, default=640)
+    # Same detection settings as the GUI sliders
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-det", type=int, default=100)
+    parser.add_argument("--chunk-frames", type=int, default=300)
+    parser.add_argument("--decoders", type=int, default=4, help="parallel decoder threads")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--resume", action="store_true", help="continue from the output directory's checkpoint")
+    parser.add_argument("--json", default=None, help="write the throughput report to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        parser.error("no videos or image folders found")
+
+    engine = DetectionEngine(
+        model_path=args.model, device=args.device, confidence_threshold=args.conf,
+        iou_threshold=args.iou, max_detections=args.max_det, backend=args.backend, imgsz=args.imgsz
+    )
+    engine.load()
+
+    job = OfflineJob(engine, args.output_dir, args.chunk_frames, args.decoders, args.batch_size, args.resume)
+    started = time.perf_counter()
+    try:
+        reports = job.run(inputs)
+    except KeyboardInterrupt:
+        logger.info("Interrupted; rerun with --resume to continue")
+        return 1
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    frames = sum(report['frames'] for report in reports)
+    logger.info(f"Total: {frames} frames from {len(reports)} inputs in {elapsed:.1f}s ({frames / elapsed:.1f} FPS)")
+    failed = [report['input'] for report in reports if report.get('error')]
+    if failed:
+        logger.error(f"{len(failed)} input(s) failed, rerun with --resume to retry: {', '.join(failed)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'fps': frames / elapsed, 'frames': frames, 'elapsed': elapsed, 'inputs': reports},
+                      f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
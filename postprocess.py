@@ -0,0 +1,225 @@
+"""Numpy pre/post-processing for raw YOLOv8 outputs.
+
+Exported models (ONNX, OpenVINO, TorchScript) return the bare network output:
+one (4 + num_classes, num_anchors) tensor per image, with boxes as
+(cx, cy, w, h) in letterboxed input pixels. The helpers here letterbox frames
+into a batch, then decode, threshold and NMS that output back into frame
+coordinates, so every backend produces the same boxes/scores/class_ids arrays.
+
+decode_batch() does that for a whole batch at once: best class, per-class
+confidence test and box conversion are single numpy passes over (N, 4 + C, A),
+and each image's NMS sees at most MAX_NMS candidates and stops at max_det.
+Classes outside an allowlist never become candidates, so they cost no NMS work.
+"""
+import cv2
+import numpy as np
+
+
+# Candidates per image that go into NMS, highest scores first. Ultralytics'
+# max_nms is 30000 for torchvision's C++ NMS; this one is a numpy loop, and at
+# low confidence thresholds a dense 640x640 output has up to 8400 candidates
+MAX_NMS = 3000
+
+
+def letterbox(frame, size=640, color=114, shape=None):
+    """Resize keeping aspect ratio and pad to shape (height, width), size x size by default.
+
+    Returns (image, ratio, (pad_x, pad_y)).
+    """
+    height, width = frame.shape[:2]
+    out_height, out_width = shape or (size, size)
+    ratio = min(size / height, size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (out_width - new_width) / 2, (out_height - new_height) / 2
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                               value=(color, color, color))
+    return image, ratio, (left, top)
+
+
+def batch_shape(frames, size=640, stride=None):
+    """Input (height, width) for a batch: size x size, or with stride the smallest
+    multiple of stride that fits every frame's resized shape (less padding to run)"""
+    if not stride:
+        return size, size
+    height = width = 0
+    for frame in frames:
+        ratio = min(size / frame.shape[0], size / frame.shape[1])
+        height = max(height, int(round(frame.shape[0] * ratio)))
+        width = max(width, int(round(frame.shape[1] * ratio)))
+    return -(-height // stride) * stride, -(-width // stride) * stride
+
+
+def make_batch(frames, size=640, stride=None):
+    """Letterbox BGR frames into a float32 NCHW RGB batch in [0, 1]"""
+    shape = batch_shape(frames, size, stride)
+    batch = np.empty((len(frames), 3) + shape, dtype=np.float32)
+    transforms = []
+    for i, frame in enumerate(frames):
+        image, ratio, pad = letterbox(frame, size, shape=shape)
+        # BGR HWC uint8 -> RGB CHW float32
+        batch[i] = image[:, :, ::-1].transpose(2, 0, 1)
+        transforms.append((ratio, pad, frame.shape[:2]))
+    batch *= 1 / 255.0
+    return batch, transforms
+
+
+def xywh_to_xyxy(boxes):
+    xyxy = np.empty_like(boxes)
+    half_w, half_h = boxes[:, 2] / 2, boxes[:, 3] / 2
+    xyxy[:, 0] = boxes[:, 0] - half_w
+    xyxy[:, 1] = boxes[:, 1] - half_h
+    xyxy[:, 2] = boxes[:, 0] + half_w
+    xyxy[:, 3] = boxes[:, 1] + half_h
+    return xyxy
+
+
+def box_iou(box, boxes):
+    """IoU of one xyxy box against many"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def non_max_suppression(boxes, scores, class_ids, iou_threshold=0.45, max_det=None):
+    """Class-aware greedy NMS; returns kept indices sorted by score.
+
+    Boxes of different classes are shifted apart by a per-class offset so a
+    single pass never suppresses across classes.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = class_ids.astype(np.float32)[:, None] * (float(boxes.max()) + 1)
+    shifted = boxes + offsets
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if max_det and len(keep) >= max_det:
+            break
+        rest = order[1:]
+        order = rest[box_iou(shifted[best], shifted[rest]) <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def pairwise_overlap(boxes, metric="iou"):
+    """(N, N) IoU, or intersection over the smaller box ("ios")"""
+    top_left = np.maximum(boxes[:, None, :2], boxes[None, :, :2])
+    bottom_right = np.minimum(boxes[:, None, 2:], boxes[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    if metric == "ios":
+        denominator = np.minimum(areas[:, None], areas[None, :])
+    else:
+        denominator = areas[:, None] + areas[None, :] - intersection
+    return intersection / np.maximum(denominator, 1e-9)
+
+
+def fast_nms(boxes, scores, class_ids, iou_threshold=0.5, metric="iou"):
+    """Matrix ("Fast") NMS with no Python loop; returns kept indices sorted by score.
+
+    A box is dropped if any higher-scoring box of its class overlaps it by
+    more than iou_threshold, even if that box was itself dropped, so it can
+    suppress slightly more than greedy NMS. With metric="ios" a partial box
+    cut off at a tile seam is removed by the full box that contains it.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-scores, kind="stable")
+    overlap = pairwise_overlap(boxes[order], metric)
+    overlap[class_ids[order][:, None] != class_ids[order][None, :]] = 0
+    # Only higher-scoring boxes (earlier rows) may suppress
+    suppressed = np.triu(overlap, k=1).max(axis=0) > iou_threshold
+    return order[~suppressed]
+
+
+def scale_boxes(boxes, ratio, pad, shape):
+    """Map letterboxed xyxy boxes back to the original frame and clip"""
+    xs, ys = boxes[:, 0::2], boxes[:, 1::2]  # views on x1/x2 and y1/y2
+    xs -= pad[0]
+    ys -= pad[1]
+    boxes /= ratio
+    height, width = shape
+    np.clip(xs, 0, width, out=xs)
+    np.clip(ys, 0, height, out=ys)
+    return boxes
+
+
+def class_thresholds(num_classes, conf=0.25, class_conf=None, classes=None):
+    """(num_classes,) float32 confidence threshold per class.
+
+    class_conf maps class id -> threshold and overrides conf for that class;
+    classes outside the classes allowlist get an infinite threshold.
+    """
+    thresholds = np.full(num_classes, conf, dtype=np.float32)
+    for class_id, threshold in (class_conf or {}).items():
+        if 0 <= int(class_id) < num_classes:
+            thresholds[int(class_id)] = threshold
+    if classes is not None:
+        allowed = np.zeros(num_classes, dtype=bool)
+        allowed[[int(c) for c in classes if 0 <= int(c) < num_classes]] = True
+        thresholds[~allowed] = np.inf
+    return thresholds
+
+
+def empty_detections():
+    return (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.int32))
+
+
+def decode_batch(outputs, transforms, conf=0.25, iou=0.45, max_det=300, classes=None, class_conf=None,
+                 max_nms=MAX_NMS):
+    """Turn an (N, 4 + C, A) YOLOv8 output into N (boxes, scores, class_ids) tuples.
+
+    Like Ultralytics, each anchor takes its best class and is kept if that
+    score passes the class's threshold (see class_thresholds); at most max_nms
+    of an image's best candidates go into its NMS, which stops at max_det.
+    """
+    outputs = np.asarray(outputs)
+    num_classes = outputs.shape[1] - 4
+    class_scores = outputs[:, 4:]                        # (N, C, A) view
+    class_ids = class_scores.argmax(axis=1)              # (N, A)
+    scores = np.take_along_axis(class_scores, class_ids[:, None], axis=1)[:, 0]
+    candidates = scores > class_thresholds(num_classes, conf, class_conf, classes)[class_ids]
+
+    # nonzero() walks images in order, so each image's candidates are one slice
+    image_index, anchor_index = np.nonzero(candidates)
+    bounds = np.searchsorted(image_index, np.arange(len(outputs) + 1))
+
+    detections = []
+    for i, (ratio, pad, shape) in enumerate(transforms):
+        anchors = anchor_index[bounds[i]:bounds[i + 1]]
+        if not len(anchors):
+            detections.append(empty_detections())
+            continue
+        image_scores = scores[i, anchors]
+        if len(anchors) > max_nms:
+            top = np.argpartition(-image_scores, max_nms)[:max_nms]
+            anchors, image_scores = anchors[top], image_scores[top]
+        boxes = xywh_to_xyxy(outputs[i][:4, anchors].T)  # (K, 4)
+        image_classes = class_ids[i, anchors]
+
+        keep = non_max_suppression(boxes, image_scores, image_classes, iou, max_det)
+        detections.append((
+            scale_boxes(boxes[keep], ratio, pad, shape).astype(np.float32, copy=False),
+            image_scores[keep].astype(np.float32, copy=False),
+            image_classes[keep].astype(np.int32),
+        ))
+    return detections
+
+
+def decode_predictions(prediction, transform, conf=0.25, iou=0.45, max_det=300, classes=None,
+                       class_conf=None):
+    """Turn one (4 + C, A) YOLOv8 output into (boxes, scores, class_ids)"""
+    return decode_batch(prediction[None], [transform], conf, iou, max_det, classes, class_conf)[0]
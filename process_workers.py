@@ -0,0 +1,270 @@
+"""Inference worker processes fed through shared memory.
+
+Threads in one process share the GIL, so YOLO's Python-side pre/post
+processing, plot() and the Tk mainloop all contend with each other. This
+module runs N worker processes that each hold their own model. Frames live in
+a SharedFramePool and detections come back as packed float32 rows in a second
+shared-memory block; the queues between the processes only carry a block
+name, byte offsets and a few scalars, never pickled arrays.
+
+    pool = ProcessInferencePool(DetectionEngine(device="cpu"), workers=4).start()
+    detection = pool.submit(frame).result()
+
+When the capture thread reads straight into pool.frame_pool, submitting a
+frame costs no copy at all. The pool plugs into
+DetectionPipeline(executor=pool, max_in_flight=workers).
+
+Workers run inference_worker.inference_worker(). Spawn still re-imports the
+parent's script as __mp_main__, so its module-level imports load in each
+worker, but its `if __name__ == "__main__"` guard keeps it from starting a
+window or a pipeline there.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backends import prepare_backend
+from detection_engine import DetectionResult, detect_device
+from frame_pool import SharedFramePool
+from inference_worker import MAX_RESULT_ROWS, RESULT_COLUMNS, inference_worker
+
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightFrame:
+    __slots__ = ('future', 'frame', 'lease', 'source_id', 'frame_index', 'timestamp')
+
+    def __init__(self, frame, lease, source_id, frame_index):
+        self.future = Future()
+        self.frame = frame
+        self.lease = lease  # our own copy of the frame, when it wasn't in shared memory
+        self.source_id = source_id
+        self.frame_index = frame_index
+        self.timestamp = time.time()
+
+
+class ProcessInferencePool:
+    """N model-holding worker processes behind a submit() -> Future API.
+
+    The engine passed in is only used for its settings (model path, device,
+    thresholds) and is never loaded in this process, so the UI process does
+    not pay for a model of its own. Frames must already be preprocessed.
+    """
+
+    def __init__(self, engine, workers=None, max_width=1920, max_height=1080, slots_per_worker=2,
+                 frame_slots=None):
+        self.engine = engine
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.slots = self.workers * slots_per_worker
+
+        # Capture, flip and the in-flight frames all lease from this pool
+        self.frame_pool = SharedFramePool(
+            capacity=frame_slots or self.slots + 8, max_width=max_width, max_height=max_height
+        )
+
+        self.context = multiprocessing.get_context("spawn")
+        self.result_shm = None
+        self.task_queue = None
+        self.result_queue = None
+        self.processes = []
+        self.collector_thread = None
+
+        self.free_slots = queue.Queue()
+        self.in_flight = {}
+        self.names = {}
+        self.ready_workers = 0
+        self.error = None  # why the workers can't serve (load failure, a worker died)
+        self.running = False
+        self.warned_max_det = False
+
+        # Counters
+        self.completed_frames = 0
+        self.copied_frames = 0
+        self.worker_time = 0.0
+
+    def start(self):
+        self.result_shm = shared_memory.SharedMemory(
+            create=True, size=self.slots * MAX_RESULT_ROWS * RESULT_COLUMNS * 4
+        )
+        self.result_rows = np.ndarray((self.slots, MAX_RESULT_ROWS, RESULT_COLUMNS), dtype=np.float32,
+                                      buffer=self.result_shm.buf)
+        for slot in range(self.slots):
+            self.free_slots.put(slot)
+
+        if self.engine.device is None:
+            self.engine.device = detect_device()
+        # Export (and quantize) once here rather than racing in every worker
+        backend = prepare_backend(self.engine.model_path, self.engine.backend_name,
+                                  self.engine.imgsz, self.engine.device,
+                                  self.engine.precision, self.engine.calibration_dir)
+
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        for _ in range(self.workers):
+            process = self.context.Process(
+                target=inference_worker,
+                args=(self.engine.model_path, self.engine.device, backend,
+                      self.engine.imgsz, self.engine.precision, threads, self.result_shm.name,
+                      self.task_queue, self.result_queue),
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+        self.running = True
+        self.collector_thread = threading.Thread(target=self.collect_loop, daemon=True)
+        self.collector_thread.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded its model; raises if one failed"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.ready_workers < self.workers:
+            if self.error is not None:
+                raise RuntimeError(self.error)
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def submit(self, frame, source_id=0, frame_index=0, timeout=None):
+        """Queue a frame for the workers; blocks while all result slots are busy.
+
+        Frames already inside frame_pool are passed by offset; anything else
+        is copied into a leased shared-memory buffer first.
+        """
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        if not self.running:
+            raise RuntimeError("ProcessInferencePool is not running")
+        if self.engine.max_detections > MAX_RESULT_ROWS and not self.warned_max_det:
+            self.warned_max_det = True
+            logger.warning(f"max_detections {self.engine.max_detections} is capped at {MAX_RESULT_ROWS} "
+                           f"result rows per frame in worker processes")
+        height, width = frame.shape[:2]
+
+        slot = self.free_slots.get(timeout=timeout)
+        lease = None
+        offset = self.frame_pool.locate(frame)
+        if offset is None:
+            lease = self.frame_pool.adopt(np.ascontiguousarray(frame))
+            offset = lease.location[1]
+            self.copied_frames += 1
+
+        pending = InFlightFrame(frame, lease, source_id, frame_index)
+        self.in_flight[slot] = pending
+        class_filter = self.engine.class_filter
+        self.task_queue.put((
+            slot, self.frame_pool.name, offset, height, width,
+            self.engine.confidence_threshold,
+            self.engine.iou_threshold,
+            min(self.engine.max_detections, MAX_RESULT_ROWS),
+            self.engine.imgsz,
+            class_filter.key() if class_filter is not None else None
+        ))
+        return pending.future
+
+    def collect_loop(self):
+        """Turn worker replies into DetectionResults (runs in separate thread)"""
+        while True:
+            try:
+                message = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                dead = [process for process in self.processes if not process.is_alive()]
+                if self.error is not None:
+                    self.fail(self.error)  # frames submitted while the pool was failing
+                elif dead and self.running:
+                    self.fail(f"Inference worker {dead[0].pid} exited (code {dead[0].exitcode})")
+                continue
+            if message is None:
+                break
+            kind = message[0]
+            if kind == 'failed':
+                self.fail(f"Inference worker {message[1]} failed to load the model: {message[2]}")
+                continue
+            if kind == 'ready':
+                self.names = message[2]
+                self.ready_workers += 1
+                logger.info(f"Inference worker {message[1]} ready")
+                continue
+
+            _, slot, payload, elapsed = message
+            pending = self.in_flight.pop(slot, None)
+            if pending is None:
+                continue  # already failed by fail()
+            if pending.lease is not None:
+                pending.lease.release()
+            if kind == 'error':
+                self.free_slots.put(slot)
+                pending.future.set_exception(RuntimeError(payload))
+                continue
+
+            rows = self.result_rows[slot, :payload].copy()
+            self.free_slots.put(slot)
+            self.completed_frames += 1
+            self.worker_time += elapsed
+            detection = DetectionResult(
+                rows[:, :4], rows[:, 4], rows[:, 5].astype(np.int32), self.names,
+                frame=pending.frame, timestamp=pending.timestamp,
+                frame_index=pending.frame_index, source_id=pending.source_id
+            )
+            detection.inference_time = elapsed
+            pending.future.set_result(detection)
+
+    def fail(self, error):
+        """Stop accepting frames and fail every in-flight future (collector thread)"""
+        if self.error is None:
+            logger.error(error)
+            self.error = error
+        for slot, pending in list(self.in_flight.items()):
+            self.in_flight.pop(slot, None)
+            if pending.lease is not None:
+                pending.lease.release()
+            self.free_slots.put(slot)
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError(error))
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'ready': self.ready_workers,
+            'error': self.error,
+            'in_flight': len(self.in_flight),
+            'completed': self.completed_frames,
+            'copied': self.copied_frames,
+            'avg_infer_ms': 1000 * self.worker_time / max(self.completed_frames, 1),
+            'frame_pool': self.frame_pool.stats(),
+        }
+
+    def stop(self, timeout=2.0):
+        if not self.running:
+            return
+        self.running = False
+        for _ in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+        self.result_queue.put(None)
+        self.collector_thread.join(timeout)
+        for pending in self.in_flight.values():
+            pending.future.set_exception(RuntimeError("ProcessInferencePool stopped"))
+        self.in_flight.clear()
+
+        # Views must go before the shared memory can be closed
+        self.result_rows = None
+        self.result_shm.close()
+        self.result_shm.unlink()
+        self.frame_pool.close()
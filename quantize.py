@@ -0,0 +1,271 @@
+"""FP16 / INT8 variants of the exported ONNX model, plus an accuracy-vs-speed report.
+
+    fp32          the plain ONNX export (backends.export_model)
+    fp16          weights stored and computed in half precision (onnxconverter-common)
+    int8-dynamic  INT8 weights, activations quantized on the fly; no calibration needed
+    int8-static   INT8 weights and activations, ranges calibrated on a folder of images
+
+Quantized artifacts are cached next to the FP32 export under models/. The
+report runs every precision over a labeled dataset (see evaluate.py) and
+compares latency, throughput, memory and mAP with the FP32 ONNX export, so
+every row shares the same runtime and letterbox and the deltas are down to
+precision alone. Each precision is measured in a fresh process, so its load
+memory doesn't include what earlier ones left behind:
+
+    python quantize.py --calibration images/ --precision int8-static
+    python quantize.py --report dataset/ --calibration images/
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from backends import export_model
+from postprocess import make_batch
+
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "fp16", "int8-dynamic", "int8-static")
+
+# Images used for static calibration; more rarely changes the ranges much
+CALIBRATION_IMAGES = 100
+
+
+def quantized_path(onnx_path, precision):
+    stem, extension = os.path.splitext(onnx_path)
+    return f"{stem}-{precision}{extension}"
+
+
+def is_fresh(target, source):
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source)
+
+
+def calibration_images(image_dir, limit=CALIBRATION_IMAGES):
+    from detection_engine import IMAGE_EXTENSIONS
+
+    names = sorted(name for name in os.listdir(image_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+    for name in names[:limit]:
+        frame = cv2.imread(os.path.join(image_dir, name))
+        if frame is not None:
+            yield frame
+
+
+def make_calibration_reader(input_name, image_dir, imgsz):
+    """ONNX Runtime CalibrationDataReader feeding letterboxed images one at a time"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FolderCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = calibration_images(image_dir)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            batch, _ = make_batch([frame], imgsz)
+            return {input_name: batch}
+
+    return FolderCalibrationReader()
+
+
+def quantize_model(onnx_path, precision, calibration_dir=None, imgsz=640, force=False):
+    """Build (or reuse) the precision variant of an FP32 ONNX model and return its path"""
+    if precision == "fp32":
+        return onnx_path
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    target = quantized_path(onnx_path, precision)
+    if is_fresh(target, onnx_path) and not force:
+        return target
+
+    logger.info(f"Building {precision} model from {onnx_path}...")
+    started = time.time()
+    if precision == "fp16":
+        import onnx
+        from onnxconverter_common import float16
+        # Keep float32 inputs/outputs so the pre/post-processing is unchanged
+        model = float16.convert_float_to_float16(onnx.load(onnx_path), keep_io_types=True)
+        onnx.save(model, target)
+    elif precision == "int8-dynamic":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+    else:
+        if not calibration_dir:
+            raise ValueError("int8-static needs a calibration image folder")
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+
+        prepared = quantized_path(onnx_path, "prepared")
+        quant_pre_process(onnx_path, prepared)
+        input_name = ort.InferenceSession(prepared, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        quantize_static(
+            prepared, target, make_calibration_reader(input_name, calibration_dir, imgsz),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        )
+        os.remove(prepared)
+    logger.info(f"Built {target} in {time.time() - started:.1f}s")
+    return target
+
+
+def prepare_precision(model_path, precision, calibration_dir=None, imgsz=640):
+    """Export the FP32 ONNX model if needed, then build the precision variant"""
+    return quantize_model(export_model(model_path, "onnxruntime", imgsz), precision, calibration_dir, imgsz)
+
+
+def resident_memory_mb():
+    """Current RSS of this process in MB, or None where it can't be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def artifact_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2**20
+    return os.path.getsize(path) / 2**20
+
+
+def measure_speed(engine, frames, batch_size=8, repeats=3):
+    """Per-frame latency at batch 1 and frames/s at batch_size"""
+    engine.process(frames[0])  # warmup
+    latencies = []
+    for _ in range(repeats):
+        for frame in frames:
+            started = time.perf_counter()
+            engine.process(frame)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    count = 0
+    for _ in range(repeats):
+        for i in range(0, len(frames), batch_size):
+            chunk = frames[i:i + batch_size]
+            engine.process_batch(chunk)
+            count += len(chunk)
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    return {
+        'latency_ms': float(latencies.mean()),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'throughput_fps': count / elapsed,
+    }
+
+
+def measure_precision(model_path, dataset, precision, calibration_dir=None, imgsz=640, conf=0.001, iou=0.6,
+                      batch_size=8, max_images=None):
+    """One report row; runs in its own process (see precision_report)"""
+    from detection_engine import DetectionEngine
+    from evaluate import evaluate_engine, load_dataset
+
+    frames = []
+    for image_path, _ in load_dataset(dataset):
+        frame = cv2.imread(image_path)
+        if frame is not None:
+            frames.append(frame)
+        if len(frames) >= 32:
+            break
+    if not frames:
+        raise ValueError(f"No images found in {dataset}")
+
+    before = resident_memory_mb()
+    engine = DetectionEngine(model_path, "cpu", conf, iou, max_detections=300, backend="onnxruntime",
+                             imgsz=imgsz, precision=precision, calibration_dir=calibration_dir)
+    engine.load()
+    after = resident_memory_mb()
+
+    row = {'precision': precision}
+    if before is not None and after is not None:
+        row['load_rss_mb'] = after - before
+    row.update(measure_speed(engine, frames, batch_size))
+    row.update(evaluate_engine(engine, dataset, max_images))
+    return row
+
+
+def precision_report(model_path, dataset, precisions=PRECISIONS, calibration_dir=None, imgsz=640,
+                     conf=0.001, iou=0.6, batch_size=8, max_images=None):
+    """Compare every precision with the FP32 ONNX export on a labeled dataset"""
+    precisions = ["fp32"] + [precision for precision in precisions if precision != "fp32"]
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for precision in precisions:
+        # Build in this process, so the measured process only loads the artifact
+        artifact = prepare_precision(model_path, precision, calibration_dir, imgsz)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            row = executor.submit(measure_precision, model_path, dataset, precision, calibration_dir, imgsz,
+                                  conf, iou, batch_size, max_images).result()
+        row['model_mb'] = artifact_size_mb(artifact)
+        rows.append(row)
+
+    baseline = rows[0]
+    for row in rows:
+        row['map50_delta'] = row['map50'] - baseline['map50']
+        row['map50_95_delta'] = row['map50_95'] - baseline['map50_95']
+        row['speedup'] = baseline['latency_ms'] / row['latency_ms']
+    return rows
+
+
+def format_report(rows):
+    header = (f"{'precision':<14}{'model MB':>9}{'load MB':>9}{'ms/frame':>10}{'fps@batch':>11}"
+              f"{'mAP50':>8}{'Δ':>8}{'mAP50-95':>10}{'Δ':>8}{'speedup':>9}")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        load = f"{row['load_rss_mb']:.0f}" if 'load_rss_mb' in row else "-"
+        lines.append(
+            f"{row['precision']:<14}{row['model_mb']:>9.1f}{load:>9}{row['latency_ms']:>10.1f}"
+            f"{row['throughput_fps']:>11.1f}{row['map50']:>8.3f}{row['map50_delta']:>+8.3f}"
+            f"{row['map50_95']:>10.3f}{row['map50_95_delta']:>+8.3f}{row['speedup']:>8.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build FP16/INT8 models and compare them with FP32")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--precision", choices=PRECISIONS[1:], default=None,
+                        help="build and cache this precision")
+    parser.add_argument("--calibration", default=None, metavar="IMAGE_DIR",
+                        help="images for int8-static calibration")
+    parser.add_argument("--report", default=None, metavar="DATASET",
+                        help="labeled YOLO dataset (images/ + labels/) to compare precisions on")
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-images", type=int, default=None)
+    parser.add_argument("--json", default=None, help="also write the report here")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.precision:
+        print(prepare_precision(args.model, args.precision, args.calibration, args.imgsz))
+    if args.report:
+        precisions = args.precisions or [
+            p for p in PRECISIONS if p != "int8-static" or args.calibration
+        ]
+        rows = precision_report(args.model, args.report, precisions, args.calibration, args.imgsz,
+                                batch_size=args.batch_size, max_images=args.max_images)
+        print(format_report(rows))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""Asynchronous recording of annotated (or raw + sidecar) video, and screenshots.
+
+All disk work happens on one MediaWriter thread fed through a bounded queue.
+The pipeline thread only copies the frame into a pooled buffer at output
+size and enqueues it; when the queue is full the frame is dropped and
+counted, so a slow disk never holds up capture or inference. Drawing,
+encoding, segment rotation and sidecar JSON all run on the writer thread.
+
+Recording is either manual (start_recording / stop_recording) or triggered
+by detections of chosen classes. While idle the writer keeps the last
+pre_event_seconds as JPEGs, so a triggered clip starts before the event, and
+it keeps recording post_event_seconds after the last trigger. Segments are
+rotated by duration and/or file size. The codec is the first of `codecs`
+that the local OpenCV build can open (H.264 where available, else MPEG-4,
+else MJPEG).
+
+    writer = MediaWriter()
+    recorder = VideoRecorder(writer, trigger_classes={"person"}, pre_event_seconds=5)
+    pipeline.sinks.append(recorder)
+    writer.save_image("shot.png", image)   # screenshots use the same thread
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from events import DetectionRecord
+from frame_pool import FramePool
+from renderer import DetectionRenderer, fit_size
+
+
+logger = logging.getLogger(__name__)
+
+CLOSE = object()
+CODEC_EXTENSIONS = {'avc1': '.mp4', 'mp4v': '.mp4', 'XVID': '.avi', 'MJPG': '.avi'}
+
+
+def parse_classes(text):
+    """'person,car,2' -> ['person', 'car', 2] (labels or class ids), None for empty"""
+    if not text:
+        return None
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    return [int(name) if name.isdigit() else name for name in names] or None
+
+
+class MediaWriter:
+    """One background thread running write jobs from a bounded queue"""
+
+    def __init__(self, max_queue=64):
+        self.queue = queue.Queue(max_queue)
+        self.submitted_jobs = 0
+        self.completed_jobs = 0
+        self.dropped_jobs = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.thread = threading.Thread(target=self.run, name="MediaWriter", daemon=True)
+        self.thread.start()
+
+    def submit(self, job, *args, block=False):
+        """Queue job(*args); returns False (and counts a drop) when the queue is full"""
+        try:
+            self.queue.put((job, args), block=block)
+        except queue.Full:
+            self.dropped_jobs += 1
+            return False
+        self.submitted_jobs += 1
+        return True
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is CLOSE:
+                return
+            job, args = item
+            started = time.perf_counter()
+            try:
+                job(*args)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Media writer job failed: {e}")
+            self.busy_time += time.perf_counter() - started
+            self.completed_jobs += 1
+
+    def save_image(self, path, image, on_done=None):
+        """Write an image without blocking; on_done(path, ok) runs on the writer thread"""
+        return self.submit(self.write_image, path, image, on_done)
+
+    def write_image(self, path, image, on_done=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        ok = cv2.imwrite(path, image)
+        if on_done:
+            on_done(path, ok)
+
+    def close(self, timeout=10.0):
+        if self.thread.is_alive():
+            self.queue.put(CLOSE)
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'submitted': self.submitted_jobs,
+            'completed': self.completed_jobs,
+            'dropped': self.dropped_jobs,
+            'pending': self.queue.qsize(),
+            'errors': self.errors,
+            'busy_s': self.busy_time,
+        }
+
+
+class VideoRecorder:
+    """Pipeline sink recording segments through a MediaWriter"""
+
+    def __init__(self, writer=None, directory="recordings", prefix="detections", annotate=True,
+                 sidecar=False, fps=15.0, max_size=(960, 540), codecs=("avc1", "mp4v", "MJPG"),
+                 segment_seconds=300.0, segment_mb=None, pre_event_seconds=5.0,
+                 post_event_seconds=10.0, trigger_classes=None, pre_event_quality=85):
+        self.own_writer = writer is None
+        self.writer = writer or MediaWriter()
+        self.directory = directory
+        self.prefix = prefix
+        self.annotate = annotate      # draw boxes into the video; False keeps raw frames
+        self.sidecar = sidecar        # JSON lines of detections next to each segment
+        self.fps = fps
+        self.max_size = max_size
+        self.codecs = codecs
+        self.segment_seconds = segment_seconds
+        self.segment_mb = segment_mb
+        self.pre_event_seconds = pre_event_seconds
+        self.post_event_seconds = post_event_seconds
+        self.trigger_classes = set(trigger_classes) if trigger_classes else None  # ids or labels
+        self.pre_event_quality = pre_event_quality
+        self.armed = False            # manual recording; read by the writer thread
+        self.last_queued = 0.0
+
+        # Writer-thread state
+        self.pool = FramePool(capacity=self.writer.queue.maxsize + 2)
+        self.renderer = DetectionRenderer()
+        self.trigger_ids = None
+        self.event_until = 0.0
+        self.pre_event = deque()      # (timestamp, jpeg bytes, record, scale)
+        self.video = None
+        self.sidecar_file = None
+        self.segment_path = None
+        self.segment_start = 0.0
+        self.segment_frames = 0
+        self.segment_index = 0
+        self.last_written = None
+        self.segments = []
+
+        # Counters
+        self.queued_frames = 0
+        self.dropped_frames = 0
+        self.written_frames = 0
+        self.events = 0
+
+    @property
+    def recording(self):
+        return self.video is not None
+
+    @property
+    def listening(self):
+        return self.armed or self.trigger_classes is not None
+
+    def start_recording(self):
+        self.armed = True
+
+    def stop_recording(self):
+        self.armed = False
+        self.writer.submit(self.close_segment)
+
+    def write(self, detection):
+        """Sink interface (pipeline thread): copy the frame at output size and enqueue it"""
+        frame = detection.frame
+        if frame is None or not self.listening:
+            return
+        if detection.timestamp - self.last_queued < 0.9 / self.fps:
+            return  # faster than the output frame rate
+        self.last_queued = detection.timestamp
+
+        width, height = fit_size(frame.shape, *self.max_size)
+        lease = self.pool.acquire((height, width, 3))
+        if (width, height) == (frame.shape[1], frame.shape[0]):
+            np.copyto(lease.array, frame)
+        else:
+            cv2.resize(frame, (width, height), dst=lease.array, interpolation=cv2.INTER_AREA)
+        record = DetectionRecord.from_detection(detection)
+        if self.writer.submit(self.encode, lease, record, width / frame.shape[1]):
+            self.queued_frames += 1
+        else:
+            lease.release()
+            self.dropped_frames += 1
+
+    def triggered(self, record):
+        if self.trigger_classes is None or not record.count:
+            return False
+        if self.trigger_ids is None:
+            names = record.names or {}
+            self.trigger_ids = np.array([class_id for class_id, label in names.items()
+                                         if class_id in self.trigger_classes or label in self.trigger_classes]
+                                        + [c for c in self.trigger_classes if isinstance(c, int)])
+        return bool(np.isin(record.class_ids, self.trigger_ids).any())
+
+    def encode(self, lease, record, scale):
+        """Writer thread: draw, then write or keep as pre-event footage"""
+        try:
+            image = lease.array
+            if self.annotate:
+                self.renderer.draw(image, record.boxes, record.scores, record.class_ids, record.names,
+                                   scale, track_ids=record.track_ids)
+            if self.triggered(record):
+                if record.timestamp > self.event_until:
+                    self.events += 1
+                self.event_until = record.timestamp + self.post_event_seconds
+
+            if self.armed or record.timestamp <= self.event_until:
+                if self.video is None:
+                    self.open_segment(image.shape, record.timestamp)
+                    self.flush_pre_event()
+                elif self.segment_due(record.timestamp):
+                    self.close_segment()
+                    self.open_segment(image.shape, record.timestamp)
+                self.write_frame(image, record, scale)
+            else:
+                self.close_segment()
+                if self.pre_event_seconds:
+                    self.keep_pre_event(image, record, scale)
+        finally:
+            lease.release()
+
+    def keep_pre_event(self, image, record, scale):
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.pre_event_quality])
+        if ok:
+            self.pre_event.append((record.timestamp, encoded.tobytes(), record, scale))
+        while self.pre_event and self.pre_event[0][0] < record.timestamp - self.pre_event_seconds:
+            self.pre_event.popleft()
+
+    def flush_pre_event(self):
+        while self.pre_event:
+            _, data, record, scale = self.pre_event.popleft()
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is not None and image.shape[:2] == self.frame_size[::-1]:
+                self.write_frame(image, record, scale)
+
+    def open_segment(self, shape, timestamp):
+        os.makedirs(self.directory, exist_ok=True)
+        height, width = shape[:2]
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(timestamp))
+        for codec in self.codecs:
+            path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{self.segment_index:03d}"
+                                                f"{CODEC_EXTENSIONS.get(codec, '.avi')}")
+            video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), self.fps, (width, height))
+            if video.isOpened():
+                break
+            video.release()
+        else:
+            raise RuntimeError(f"No working video codec among {self.codecs}")
+
+        self.video = video
+        self.segment_path = path
+        self.segment_start = timestamp
+        self.segment_frames = 0
+        self.segment_index += 1
+        self.frame_size = (width, height)
+        self.last_written = None
+        if self.sidecar:
+            self.sidecar_file = open(os.path.splitext(path)[0] + ".jsonl", "w", encoding="utf-8")
+        logger.info(f"Recording segment {path} ({codec})")
+
+    def segment_due(self, timestamp):
+        if self.segment_seconds and timestamp - self.segment_start >= self.segment_seconds:
+            return True
+        if self.segment_mb and self.segment_frames % 30 == 0:
+            return os.path.getsize(self.segment_path) >= self.segment_mb * 1024 * 1024
+        return False
+
+    def write_frame(self, image, record, scale):
+        # Repeat the previous frame across gaps so playback keeps real time
+        repeats = 1
+        if self.last_written is not None:
+            gap = record.timestamp - self.last_written
+            repeats = int(min(max(round(gap * self.fps), 1), self.fps))
+        self.last_written = record.timestamp
+        for _ in range(repeats):
+            self.video.write(image)
+        if self.sidecar_file:
+            entry = record.to_dict()
+            entry['segment_frame'] = self.segment_frames
+            entry['scale'] = scale
+            self.sidecar_file.write(json.dumps(entry) + "\n")
+        self.segment_frames += repeats
+        self.written_frames += 1
+
+    def close_segment(self):
+        if self.video is None:
+            return
+        self.video.release()
+        self.video = None
+        if self.sidecar_file:
+            self.sidecar_file.close()
+            self.sidecar_file = None
+        self.segments.append(self.segment_path)
+        logger.info(f"Closed segment {self.segment_path} ({self.segment_frames} frames)")
+
+    def close(self):
+        """Finish the current segment; waits for queued frames"""
+        self.armed = False
+        self.trigger_classes = None
+        self.writer.submit(self.close_segment, block=True)
+        if self.own_writer:
+            self.writer.close()
+
+    def stats(self):
+        return {
+            'recording': self.recording,
+            'queued': self.queued_frames,
+            'dropped': self.dropped_frames,
+            'written': self.written_frames,
+            'events': self.events,
+            'segments': len(self.segments) + (1 if self.recording else 0),
+            'pre_event_frames': len(self.pre_event),
+        }
@@ -0,0 +1,187 @@
+"""Region-of-interest and tiled (SAHI-style) inference for high-resolution frames.
+
+Downscaling a 1080p/4K frame to 640 pixels makes small objects vanish. A
+RegionPlan instead cuts each frame into windows the model sees at (close to)
+native resolution:
+
+- ROIs: only the given rectangles are inspected (normalized 0-1 or pixels);
+- tiles: the frame (or each ROI) is covered by overlapping tile_size tiles,
+  plus one downscaled full-frame pass so large objects are still found.
+
+All windows of all frames go through the model as one batch, the boxes are
+shifted back into frame coordinates and duplicates across tile seams are
+merged with a vectorized NMS.
+
+    engine.regions = RegionPlan(tile_size=640, overlap=0.2)      # tiled
+    engine.regions = RegionPlan(rois=[(0.5, 0.0, 1.0, 0.5)])     # top-right quarter only
+"""
+import json
+import time
+
+import cv2
+import numpy as np
+
+from postprocess import fast_nms
+
+
+ROI_COLOR = (200, 200, 200)
+
+
+def axis_starts(start, end, tile, stride):
+    """Tile start positions covering [start, end), the last one flush with end"""
+    if end - start <= tile:
+        return [start]
+    starts = list(range(start, end - tile, stride))
+    starts.append(end - tile)
+    return starts
+
+
+def tile_windows(area, tile_size, overlap):
+    x1, y1, x2, y2 = area
+    stride = max(int(tile_size * (1 - overlap)), 1)
+    return [
+        (x, y, min(x + tile_size, x2), min(y + tile_size, y2))
+        for y in axis_starts(y1, y2, tile_size, stride)
+        for x in axis_starts(x1, x2, tile_size, stride)
+    ]
+
+
+def parse_roi(text):
+    """'x1,y1,x2,y2' -> tuple of floats (normalized 0-1 or pixels)"""
+    values = tuple(float(v) for v in text.split(","))
+    if len(values) != 4:
+        raise ValueError(f"ROI needs 4 comma-separated values, got {text!r}")
+    return values
+
+
+class RegionPlan:
+    """Which windows of a frame the model runs on, and how their boxes are merged"""
+
+    def __init__(self, rois=(), tile_size=None, overlap=0.2, full_frame=None, merge_iou=0.5,
+                 merge_metric="ios", max_batch=32):
+        self.rois = [tuple(roi) for roi in rois]
+        self.tile_size = tile_size
+        self.overlap = overlap
+        # The extra whole-frame pass catches objects bigger than a tile; with
+        # ROIs the point is to ignore everything outside them (None: decide
+        # from whether ROIs are set)
+        self.full_frame = full_frame
+        self.merge_iou = merge_iou
+        self.merge_metric = merge_metric
+        self.max_batch = max_batch
+
+        # Counters
+        self.frames = 0
+        self.windows_run = 0
+        self.region_time = 0.0
+
+    @classmethod
+    def from_config(cls, path):
+        """Load {"rois": [[x1, y1, x2, y2], ...], "tile_size": 640, "overlap": 0.2, ...}"""
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def add_roi(self, roi):
+        # Replace rather than mutate: the pipeline thread may be iterating
+        self.rois = self.rois + [tuple(roi)]
+
+    def clear_rois(self):
+        self.rois = []
+
+    @property
+    def active(self):
+        return bool(self.rois or self.tile_size)
+
+    def resolve(self, roi, shape):
+        """ROI in frame pixels; all values <= 1 means normalized coordinates"""
+        height, width = shape[:2]
+        x1, y1, x2, y2 = roi
+        if max(roi) <= 1.0:
+            x1, x2, y1, y2 = x1 * width, x2 * width, y1 * height, y2 * height
+        x1, x2 = sorted((int(np.clip(x1, 0, width)), int(np.clip(x2, 0, width))))
+        y1, y2 = sorted((int(np.clip(y1, 0, height)), int(np.clip(y2, 0, height))))
+        return x1, y1, x2, y2
+
+    def windows(self, shape):
+        height, width = shape[:2]
+        areas = [self.resolve(roi, shape) for roi in self.rois] or [(0, 0, width, height)]
+        areas = [a for a in areas if a[2] - a[0] >= 8 and a[3] - a[1] >= 8]
+        windows = []
+        for area in areas:
+            windows.extend(tile_windows(area, self.tile_size, self.overlap) if self.tile_size else [area])
+        full_frame = (not self.rois) if self.full_frame is None else self.full_frame
+        if full_frame and (0, 0, width, height) not in windows:
+            windows.append((0, 0, width, height))
+        return windows
+
+    def process(self, engine, frames, frame_indices=None, source_ids=None):
+        """Run every window of every frame in batched passes; one DetectionResult per frame"""
+        from detection_engine import DetectionResult
+
+        frame_indices = frame_indices or [0] * len(frames)
+        source_ids = source_ids or [0] * len(frames)
+        started = time.perf_counter()
+
+        crops, owners = [], []
+        for i, frame in enumerate(frames):
+            for x1, y1, x2, y2 in self.windows(frame.shape):
+                crops.append(frame[y1:y2, x1:x2])
+                owners.append((i, x1, y1))
+
+        per_frame = [([], [], []) for _ in frames]
+        for start in range(0, len(crops), self.max_batch):
+            chunk = crops[start:start + self.max_batch]
+            results = engine.infer_batch(chunk) if chunk else []
+            for j, crop in enumerate(chunk):
+                detection = engine.postprocess(results[j:j + 1], crop)
+                i, x1, y1 = owners[start + j]
+                boxes, scores, class_ids = per_frame[i]
+                boxes.append(detection.boxes + np.array([x1, y1, x1, y1], dtype=np.float32))
+                scores.append(detection.scores)
+                class_ids.append(detection.class_ids)
+
+        elapsed = time.perf_counter() - started
+        self.frames += len(frames)
+        self.windows_run += len(crops)
+        self.region_time += elapsed
+
+        detections = []
+        for i, frame in enumerate(frames):
+            boxes, scores, class_ids = per_frame[i]
+            boxes, scores, class_ids = self.merge(
+                np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32),
+                np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32),
+                np.concatenate(class_ids) if class_ids else np.zeros(0, dtype=np.int32),
+                engine.max_detections
+            )
+            detection = DetectionResult(boxes, scores, class_ids, engine.names, frame=frame,
+                                        frame_index=frame_indices[i], source_id=source_ids[i])
+            detection.inference_time = elapsed / len(frames)
+            detections.append(detection)
+        return detections
+
+    def merge(self, boxes, scores, class_ids, max_detections=None):
+        """Drop duplicates from overlapping windows; highest score first"""
+        keep = fast_nms(boxes, scores, class_ids, self.merge_iou, self.merge_metric)
+        if max_detections:
+            keep = keep[:max_detections]
+        return boxes[keep], scores[keep], class_ids[keep]
+
+    def draw(self, image, frame_shape):
+        """Outline the ROIs on a (possibly resized) display image of the frame"""
+        scale_x = image.shape[1] / frame_shape[1]
+        scale_y = image.shape[0] / frame_shape[0]
+        for roi in self.rois:
+            x1, y1, x2, y2 = self.resolve(roi, frame_shape)
+            cv2.rectangle(image, (int(x1 * scale_x), int(y1 * scale_y)),
+                          (int(x2 * scale_x) - 1, int(y2 * scale_y) - 1), ROI_COLOR, 1)
+        return image
+
+    def stats(self):
+        return {
+            'rois': len(self.rois),
+            'tile_size': self.tile_size,
+            'frames': self.frames,
+            'windows_per_frame': self.windows_run / max(self.frames, 1),
+            'avg_ms': 1000 * self.region_time / max(self.frames, 1),
+        }
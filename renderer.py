@@ -0,0 +1,141 @@
+"""Fast detection overlay renderer.
+
+Ultralytics' Results.plot() copies the full-resolution frame and draws every
+box and label through its general-purpose Annotator. This renderer:
+
+- resizes the frame into a reused display-size buffer first and scales the
+  boxes instead, so drawing happens at the size that is actually shown;
+- draws all boxes of one class with a single cv2.polylines call;
+- renders each label string ("#12 ", "person", " 0.87") once with cv2.putText into a
+  cached mask, then stamps it with numpy slice assignment.
+
+    renderer = DetectionRenderer()
+    display = renderer.render(detection, size=(900, 600), pool=display_pool)
+"""
+import cv2
+import numpy as np
+
+from frame_pool import resize_into
+
+
+# Ultralytics-style class palette (BGR)
+PALETTE = np.array([
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255),
+], dtype=np.uint8)
+
+TEXT_COLOR = (255, 255, 255)
+
+
+class DetectionRenderer:
+    """Draw boxes, class names and scores with cached label glyphs"""
+
+    def __init__(self, font_scale=0.5, font_thickness=1, box_thickness=2, padding=3):
+        self.font = cv2.FONT_HERSHEY_SIMPLEX
+        self.font_scale = font_scale
+        self.font_thickness = font_thickness
+        self.box_thickness = box_thickness
+        self.padding = padding
+        self.glyphs = {}  # text -> boolean mask
+        self.max_glyphs = 2048  # track ids keep adding strings on long runs
+
+    def color(self, class_id):
+        return tuple(int(c) for c in PALETTE[int(class_id) % len(PALETTE)])
+
+    def glyph(self, text):
+        """Mask of the rendered text, padded to the label height; built once per string"""
+        mask = self.glyphs.get(text)
+        if mask is None:
+            if len(self.glyphs) >= self.max_glyphs:
+                self.glyphs.clear()
+            (width, height), baseline = cv2.getTextSize(text, self.font, self.font_scale,
+                                                        self.font_thickness)
+            canvas = np.zeros((height + baseline + 2 * self.padding, width + 2 * self.padding),
+                              dtype=np.uint8)
+            cv2.putText(canvas, text, (self.padding, self.padding + height), self.font,
+                        self.font_scale, 255, self.font_thickness, cv2.LINE_AA)
+            mask = canvas > 96
+            self.glyphs[text] = mask
+        return mask
+
+    def draw_boxes(self, image, boxes, class_ids):
+        """One polylines call per class"""
+        if len(boxes) == 0:
+            return
+        x1, y1, x2, y2 = boxes.T
+        corners = np.stack([
+            np.stack([x1, y1], axis=1), np.stack([x2, y1], axis=1),
+            np.stack([x2, y2], axis=1), np.stack([x1, y2], axis=1),
+        ], axis=1)  # (N, 4, 2)
+        for class_id in np.unique(class_ids):
+            cv2.polylines(image, list(corners[class_ids == class_id]), True, self.color(class_id),
+                          self.box_thickness)
+
+    def draw_label(self, image, x, y, masks, color):
+        """Stamp the glyph masks side by side on a filled label box"""
+        height = masks[0].shape[0]
+        width = sum(mask.shape[1] for mask in masks)
+        image_height, image_width = image.shape[:2]
+        # Above the box, or just inside it when the box touches the top edge
+        top = y - height if y >= height else min(y, image_height - height)
+        left = min(max(x, 0), max(image_width - width, 0))
+        roi = image[max(top, 0):top + height, left:left + width]
+        rows, cols = roi.shape[:2]
+        if rows == 0 or cols == 0:
+            return
+
+        roi[:] = color
+        offset = 0
+        for mask in masks:
+            end = min(offset + mask.shape[1], cols)
+            if end <= offset:
+                break
+            roi[:, offset:end][mask[:rows, :end - offset]] = TEXT_COLOR
+            offset = end
+
+    def draw(self, image, boxes, scores, class_ids, names, scale=(1.0, 1.0), track_ids=None):
+        """Draw onto image in place; boxes are scaled by (sx, sy) first"""
+        if len(boxes) == 0:
+            return image
+        scaled = (boxes * np.array([scale[0], scale[1], scale[0], scale[1]], dtype=np.float32))
+        scaled = scaled.round().astype(np.int32)
+        self.draw_boxes(image, scaled, class_ids)
+        for i, ((x1, y1, _, _), score, class_id) in enumerate(zip(scaled, scores, class_ids)):
+            masks = [self.glyph(names.get(int(class_id), str(int(class_id)))), self.glyph(f" {score:.2f}")]
+            if track_ids is not None:
+                masks.insert(0, self.glyph(f"#{track_ids[i]} "))
+            self.draw_label(image, x1, y1, masks, self.color(class_id))
+        return image
+
+    def render(self, detection, size=None, pool=None, name="annotated"):
+        """Annotated BGR image of detection.frame at size (width, height).
+
+        With a pool the frame is resized (or copied) into the pool's
+        persistent buffer for this name, so the result is only valid until
+        the next render with the same pool and name.
+        """
+        frame = detection.frame
+        height, width = frame.shape[:2]
+        target_width, target_height = size or (width, height)
+        if (target_width, target_height) != (width, height):
+            if pool is not None:
+                canvas = resize_into(frame, (target_width, target_height), pool, name)
+            else:
+                canvas = cv2.resize(frame, (target_width, target_height))
+        elif pool is not None:
+            canvas = pool.scratch(name, frame.shape)
+            np.copyto(canvas, frame)
+        else:
+            canvas = frame.copy()
+
+        return self.draw(canvas, detection.boxes, detection.scores, detection.class_ids, detection.names,
+                         (target_width / width, target_height / height), detection.track_ids)
+
+
+def fit_size(shape, max_width, max_height):
+    """Largest (width, height) with the frame's aspect ratio inside the bounds (never upscales)"""
+    height, width = shape[:2]
+    scale = min(max_width / width, max_height / height, 1.0)
+    return int(width * scale), int(height * scale)
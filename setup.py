@@ -35,7 +35,7 @@ def run_application():
     print("Starting Real-Time Object Detection application...")
     try:
         import enhanced_app
-        enhanced_app.main()
+        enhanced_app.main([])
     except ImportError as e:
         print(f"Error importing application: {e}")
         print("Make sure all dependencies are installed.")
@@ -0,0 +1,154 @@
+"""Cold start: a startup-time breakdown and background model loading.
+
+torch and ultralytics take seconds to import and the model takes more to
+load, so nothing imports them at module level any more: DetectionEngine.load()
+does, and the GUI apps call it through load_in_background() once their
+window is up. The window paints immediately, Start is enabled when the model
+is ready, and an optional warmup inference runs on the same thread so the
+first real frame doesn't pay for lazy runtime initialization.
+
+    profile = StartupProfile()            # import this module first
+    ...imports...
+    profile.mark("imports")
+    load_in_background(root, engine.load, on_ready, on_error, profile=profile)
+    pipeline.sinks.append(FirstFrameSink(profile))   # logs the breakdown once
+
+`python startup.py --check` imports each headless module in a fresh
+interpreter and reports its import time and whether any GUI module, torch or
+ultralytics came along.
+"""
+import argparse
+import logging
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+# Taken when the first app module imports this one, i.e. before its heavy imports
+IMPORTED_AT = time.perf_counter()
+
+GUI_MODULES = ("tkinter", "customtkinter", "PIL")
+HEAVY_MODULES = ("torch", "ultralytics")
+HEADLESS_MODULES = ("detection_engine", "process_workers", "multi_stream", "offline", "events",
+                    "history", "recorder", "metrics", "batch_scheduler", "class_filter", "model_server",
+                    "async_pipeline", "inference_worker")
+
+
+class StartupProfile:
+    """Milestones (seconds since start) and phase durations, from any thread"""
+
+    def __init__(self, start=None):
+        self.start = IMPORTED_AT if start is None else start
+        self.marks = []       # (name, seconds since start)
+        self.phases = []      # (name, seconds)
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        elapsed = time.perf_counter() - self.start
+        with self.lock:
+            self.marks.append((name, elapsed))
+        return elapsed
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append((name, time.perf_counter() - started))
+
+    def report(self):
+        with self.lock:
+            marks = ", ".join(f"{name} at {seconds:.2f}s" for name, seconds in self.marks)
+            phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        return f"Startup: {marks}" + (f" ({phases})" if phases else "")
+
+    def to_dict(self):
+        with self.lock:
+            return {'marks': dict(self.marks), 'phases': dict(self.phases)}
+
+
+class FirstFrameSink:
+    """Pipeline sink that marks the first processed frame and logs the breakdown once"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.done = False
+
+    def write(self, detection):
+        if not self.done:
+            self.done = True
+            self.profile.mark("first frame")
+            logger.info(self.profile.report())
+
+    def close(self):
+        pass
+
+
+def load_in_background(master, load, on_ready, on_error, profile=None):
+    """Run load() on a daemon thread; on_ready(result) / on_error(exc) run on the Tk thread"""
+    def run():
+        try:
+            if profile is not None:
+                with profile.phase("model"):
+                    result = load()
+                profile.mark("model ready")
+            else:
+                result = load()
+        except Exception as e:
+            master.after(0, lambda error=e: on_error(error))
+            return
+        master.after(0, lambda: on_ready(result))
+
+    thread = threading.Thread(target=run, name="ModelLoader", daemon=True)
+    thread.start()
+    return thread
+
+
+def check_imports(modules=HEADLESS_MODULES):
+    """{module: (seconds, [unwanted modules it imported]) or error text}, each in a fresh interpreter"""
+    probe = ("import sys, time; t = time.perf_counter(); import {name}; "
+             "print(time.perf_counter() - t); print(' '.join(m for m in {unwanted!r} if m in sys.modules))")
+    results = {}
+    for name in modules:
+        completed = subprocess.run(
+            [sys.executable, "-c", probe.format(name=name, unwanted=GUI_MODULES + HEAVY_MODULES)],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            results[name] = completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"
+            continue
+        seconds, unwanted = (completed.stdout.splitlines() + ["", ""])[:2]
+        results[name] = (float(seconds), unwanted.split())
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup and import checks")
+    parser.add_argument("--check", action="store_true",
+                        help="verify headless modules import no GUI toolkit, torch or ultralytics")
+    args = parser.parse_args(argv)
+    if not args.check:
+        parser.print_help()
+        return 0
+
+    failed = False
+    for name, result in check_imports().items():
+        if isinstance(result, str):
+            print(f"{name:<18} import failed: {result}")
+            failed = True
+            continue
+        seconds, unwanted = result
+        status = "ok" if not unwanted else "imports " + ", ".join(unwanted)
+        failed = failed or bool(unwanted)
+        print(f"{name:<18} {seconds * 1000:7.0f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+from adaptive import AdaptiveController
+
+
+class Engine:
+    imgsz = 640
+    dynamic_imgsz = False
+
+
+class Pipeline:
+    def __init__(self):
+        self.engine = Engine()
+        self.source = None
+        self.frame_skip = 1
+
+
+class Detection:
+    def __init__(self, inference_time):
+        self.inference_time = inference_time
+        self.latency = None
+
+
+def run(controller, inference_time, rounds=20):
+    for _ in range(rounds):
+        controller.write(Detection(inference_time))
+    return controller.pipeline.frame_skip
+
+
+def controller(**kwargs):
+    return AdaptiveController(Pipeline(), interval=0, cooldown=0, min_samples=1, **kwargs)
+
+
+def test_frame_skip_settles_once_the_skipped_load_fits():
+    adaptive = controller(target_fps=15, max_frame_skip=4)
+    # 100 ms per inference at 15 fps is 1.5x the budget; skipping every other frame halves it
+    assert run(adaptive, 0.1) == 2
+    assert adaptive.load < 1
+
+
+def test_frame_skip_recovers_when_inference_gets_faster():
+    adaptive = controller(target_fps=15, max_frame_skip=4)
+    run(adaptive, 0.25)
+    assert adaptive.pipeline.frame_skip == 4
+    assert run(adaptive, 0.02) == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from backends import check_parity, match_boxes
+
+
+def detections(boxes, class_ids):
+    return (np.array(boxes, dtype=np.float32).reshape(-1, 4), np.ones(len(class_ids), dtype=np.float32),
+            np.array(class_ids, dtype=np.int32))
+
+
+def test_match_boxes_within_tolerance():
+    reference = detections([[0, 0, 10, 10], [20, 20, 40, 40]], [0, 1])
+    candidate = detections([[1, 0, 11, 10], [20, 20, 40, 40]], [0, 1])
+    assert match_boxes(reference, candidate, tolerance=2.0) == 1.0
+    assert match_boxes(reference, candidate, tolerance=0.5) == 0.5
+
+
+def test_match_boxes_requires_the_same_class():
+    reference = detections([[0, 0, 10, 10]], [0])
+    assert match_boxes(reference, detections([[0, 0, 10, 10]], [1]), tolerance=2.0) == 0.0
+
+
+def test_match_boxes_with_no_reference_boxes():
+    empty = detections([], [])
+    assert match_boxes(empty, empty, tolerance=2.0) == 1.0
+    assert match_boxes(empty, detections([[0, 0, 1, 1]], [0]), tolerance=2.0) == 0.0
+
+
+def test_onnxruntime_parity_with_eager_pytorch():
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    from ultralytics.utils import ASSETS
+
+    name, scores = check_parity("yolov8n.pt", str(ASSETS), "onnxruntime")
+    assert name == "onnxruntime"
+    assert scores
+    for image, score in scores.items():
+        assert score >= 0.95, f"{image}: only {score:.0%} of boxes match"
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from class_filter import ClassFilter, ConfigWatcher, parse_class_filter
+
+
+NAMES = {0: "person", 1: "car", 2: "dog"}
+
+
+def test_resolve_names_and_ids():
+    class_filter = ClassFilter(["person", "2", 1, "unicorn"], thresholds={"car": 0.6, "0": 0.3, "yeti": 0.9})
+    classes, thresholds = class_filter.resolve(NAMES)
+    assert classes == [0, 1, 2]
+    assert thresholds == {1: 0.6, 0: 0.3}
+    assert class_filter.unknown(NAMES) == ["unicorn", "yeti"]
+
+
+def test_resolve_is_cached_per_names_dict():
+    class_filter = ClassFilter(["dog"])
+    assert class_filter.resolve(NAMES) is class_filter.resolve(NAMES)
+    assert class_filter.resolve({0: "dog"}) == ([0], {})
+
+
+def test_min_threshold():
+    assert ClassFilter(["car"], {"car": 0.6}).min_threshold(NAMES, 0.5) == pytest.approx(0.6)
+    assert ClassFilter(["car", "dog"], {"car": 0.6}).min_threshold(NAMES, 0.5) == pytest.approx(0.5)
+    assert ClassFilter(None, {"car": 0.2}).min_threshold(NAMES, 0.5) == pytest.approx(0.2)
+
+
+def test_mask_applies_allowlist_and_thresholds():
+    class_filter = ClassFilter(["person", "car"], {"car": 0.6})
+    scores = np.array([0.5, 0.5, 0.7, 0.9], dtype=np.float32)
+    class_ids = np.array([0, 1, 1, 2])
+    assert class_filter.mask(scores, class_ids, NAMES, 0.4).tolist() == [True, False, True, False]
+
+
+def test_parse_class_filter_merges_config_and_cli(tmp_path):
+    assert parse_class_filter() is None
+    config = tmp_path / "classes.json"
+    ClassFilter(["person", "car"], {"person": 0.35}).save(config)
+
+    class_filter = parse_class_filter(thresholds="car=0.6", config=str(config))
+    assert class_filter.classes == ("person", "car")
+    assert class_filter.thresholds == {"person": 0.35, "car": 0.6}
+
+    class_filter = parse_class_filter(classes="dog, car", config=str(config))
+    assert class_filter.classes == ("dog", "car")
+
+
+def test_config_watcher_installs_a_changed_filter(tmp_path):
+    class Engine:
+        class_filter = None
+
+    path = tmp_path / "classes.json"
+    engine = Engine()
+    watcher = ConfigWatcher(engine, str(path))
+    assert watcher.poll() is None  # no file yet
+
+    ClassFilter(["dog"]).save(path)
+    assert watcher.poll().classes == ("dog",)
+    assert engine.class_filter.classes == ("dog",)
+    assert watcher.poll() is None  # unchanged
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from evaluate import IOU_THRESHOLDS, average_precision, load_dataset
+
+
+def test_perfect_predictions_score_one():
+    tp = np.ones((3, len(IOU_THRESHOLDS)), dtype=bool)
+    ap = average_precision(tp, np.array([0.9, 0.8, 0.7]), num_gt=3)
+    np.testing.assert_allclose(ap, 1.0)
+
+
+def test_no_ground_truth_is_nan_and_no_predictions_is_zero():
+    assert np.isnan(average_precision(np.zeros((2, 1), bool), np.array([0.9, 0.8]), 0)).all()
+    assert (average_precision(np.zeros((0, 1), bool), np.zeros(0), 2) == 0).all()
+
+
+def test_false_positive_ranked_first_lowers_ap():
+    tp = np.array([[False], [True]])
+    ap = average_precision(tp, np.array([0.9, 0.8]), num_gt=1)
+    assert ap[0] == pytest.approx(0.5)
+    # The same detections with the hit ranked first are perfect
+    assert average_precision(tp, np.array([0.8, 0.9]), num_gt=1)[0] == pytest.approx(1.0)
+
+
+def test_missed_ground_truth_caps_recall():
+    tp = np.array([[True]])
+    ap = average_precision(tp, np.array([0.9]), num_gt=2)
+    assert ap[0] == pytest.approx(51 / 101)  # precision 1 up to recall 0.5, then nothing
+
+
+def test_load_dataset_yields_normalized_label_rows(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "labels").mkdir()
+    (tmp_path / "images" / "a.jpg").write_bytes(b"")
+    (tmp_path / "images" / "b.png").write_bytes(b"")
+    (tmp_path / "labels" / "a.txt").write_text("2 0.5 0.5 0.25 0.1\n0 0.1 0.2 0.05 0.05\n")
+
+    items = list(load_dataset(str(tmp_path)))
+    assert [path.rsplit("/", 1)[-1] for path, _ in items] == ["a.jpg", "b.png"]
+    np.testing.assert_allclose(items[0][1], [[2, 0.5, 0.5, 0.25, 0.1], [0, 0.1, 0.2, 0.05, 0.05]])
+    assert items[1][1].shape == (0, 5)
@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+import pytest
+
+from frame_capture import CaptureThread, FrameRing
+from frame_pool import FramePool, SharedFramePool
+
+
+def test_released_buffers_are_reused():
+    pool = FramePool()
+    first = pool.acquire((4, 4, 3))
+    array = first.array
+    assert first.release()
+    second = pool.acquire((4, 4, 3))
+    assert second.array is array
+    assert pool.stats()['allocations'] == 1
+
+
+def test_buffers_are_bucketed_by_shape():
+    pool = FramePool()
+    pool.acquire((4, 4, 3)).release()
+    lease = pool.acquire((8, 8, 3))
+    assert lease.array.shape == (8, 8, 3)
+    assert pool.stats()['allocations'] == 2
+
+
+def test_lease_goes_back_after_the_last_release():
+    pool = FramePool()
+    lease = pool.acquire((2, 2, 3)).retain()
+    assert not lease.release()
+    assert pool.stats()['in_use'] == 1
+    assert lease.release()
+    assert pool.stats()['in_use'] == 0
+
+
+def test_over_release_and_late_retain_raise():
+    pool = FramePool()
+    lease = pool.acquire((2, 2, 3))
+    lease.release()
+    with pytest.raises(RuntimeError):
+        lease.retain()
+    with pytest.raises(RuntimeError):
+        lease.release()
+
+
+def test_shared_pool_rejects_oversized_frames_without_losing_a_slot():
+    pool = SharedFramePool(capacity=1, max_width=4, max_height=4, timeout=0.1)
+    try:
+        with pytest.raises(ValueError):
+            pool.acquire((8, 8, 3))
+        lease = pool.acquire((4, 4, 3))
+        assert pool.locate(lease.array) == 0
+        lease.release()
+    finally:
+        pool.close()
+
+
+def test_ring_drops_unread_frames_and_recycles_them():
+    pool = FramePool()
+    ring = FrameRing()
+    first, second = pool.acquire((2, 2, 3)), pool.acquire((2, 2, 3))
+    ring.publish(first)
+    ring.publish(second)
+    assert ring.stats() == {'captured': 2, 'dropped': 1, 'consumed': 0}
+    assert pool.stats()['in_use'] == 1  # the dropped frame went back to the pool
+
+    assert ring.take(timeout=0) is second
+    assert ring.take(timeout=0) is None
+    assert ring.stats()['consumed'] == 1
+
+
+def test_ring_close_releases_the_pending_frame():
+    pool = FramePool()
+    ring = FrameRing()
+    ring.publish(pool.acquire((2, 2, 3)))
+    ring.close()
+    assert pool.stats()['in_use'] == 0
+    assert ring.take(timeout=0) is None
+
+
+class FreshArraySource:
+    """Ignores the buffer passed to read(), like ImageFolderSource"""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        if not self.frames:
+            return False, None
+        time.sleep(0.002)  # like a camera, so the reader keeps up
+        return True, self.frames.pop(0)
+
+    def release(self):
+        pass
+
+
+def test_capture_thread_keeps_its_pool_small_for_sources_that_ignore_the_buffer():
+    frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(50)]
+    capture = CaptureThread(FreshArraySource(frames))
+    values = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        values.append(int(frame[0, 0, 0]))
+    capture.release()
+    assert values and values == sorted(values)
+    assert capture.pool.stats()['buffers'] <= 4
@@ -0,0 +1,59 @@
+import numpy as np
+
+from detection_engine import DetectionResult
+from history import DetectionHistory
+
+
+NAMES = {0: "person", 1: "car", 2: "dog"}
+
+
+def detection(class_ids, timestamp, frame_index=0):
+    count = len(class_ids)
+    boxes = np.tile(np.array([0, 0, 10, 10], dtype=np.float32), (count, 1))
+    return DetectionResult(boxes, np.full(count, 0.5, dtype=np.float32), np.array(class_ids, dtype=np.int32),
+                           NAMES, timestamp=timestamp, frame_index=frame_index)
+
+
+def filled_history(**kwargs):
+    history = DetectionHistory(**kwargs)
+    for i, class_ids in enumerate([[0], [0, 1], [], [2, 2], [1]]):
+        history.write(detection(class_ids, 1000.0 + i, frame_index=i))
+    return history
+
+
+def test_entries_round_trip():
+    history = filled_history()
+    assert len(history) == 5
+    entry = history.entry(3)
+    assert entry.frame_index == 3
+    assert entry.class_ids.tolist() == [2, 2]
+    assert entry.track_ids.tolist() == [-1, -1]
+    assert history.latest().class_ids.tolist() == [1]
+
+
+def test_class_counts_over_a_time_range():
+    history = filled_history()
+    assert history.class_counts(since=1000.0, until=1004.0) == {0: 2, 1: 2, 2: 2}
+    assert history.class_counts(since=1003.0, until=1004.0) == {1: 1, 2: 2}
+    assert history.label_counts(since=1004.0, until=1004.0) == {"car": 1}
+
+
+def test_frames_with_class():
+    history = filled_history()
+    assert history.frames_with_class(1, since=1000.0, until=1004.0) == [1, 4]
+    assert history.frames_with_class(1, since=1002.0, until=1004.0) == [4]
+    assert history.frames_with_class(0, since=1000.0, until=1004.0, limit=1) == [0]
+    assert history.frames_with_class(7, since=1000.0, until=1004.0) == []
+
+
+def test_old_frames_are_evicted_from_both_rings():
+    history = filled_history(max_frames=3)
+    assert len(history) == 3
+    assert history.entry(1) is None
+    assert history.entry(2).frame_index == 2
+
+    # Six detections in a ring of five: the last one overwrites frame 0's
+    history = filled_history(max_detections=5)
+    assert history.entry(0) is None
+    assert history.entry(1).class_ids.tolist() == [0, 1]
+    assert history.latest().class_ids.tolist() == [1]
@@ -0,0 +1,68 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from detection_engine import DetectionResult
+from offline import Checkpoint, OfflineJob, find_inputs
+
+
+class CountingEngine:
+    """Stands in for DetectionEngine: one empty detection per frame, no model"""
+
+    def process_batch(self, frames, frame_indices, source_ids=None):
+        empty = np.zeros((0, 4), dtype=np.float32)
+        return [DetectionResult(empty, np.zeros(0, np.float32), np.zeros(0, np.int32), {}, frame_index=index)
+                for index in frame_indices]
+
+
+def write_images(folder, count):
+    folder.mkdir()
+    for i in range(count):
+        cv2.imwrite(str(folder / f"{i:03d}.png"), np.full((8, 8, 3), i, dtype=np.uint8))
+    return str(folder)
+
+
+def frame_indices(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)['frame'] for line in f]
+
+
+def test_find_inputs_skips_missing_paths(tmp_path):
+    folder = write_images(tmp_path / "images", 2)
+    assert find_inputs([folder, str(tmp_path / "missing.mp4")]) == [folder]
+
+
+def test_chunks_are_merged_in_frame_order(tmp_path):
+    folder = write_images(tmp_path / "images", 23)
+    job = OfflineJob(CountingEngine(), str(tmp_path / "out"), chunk_frames=5, decoders=3, batch_size=4)
+    report, = job.run([folder])
+    assert report['frames'] == 23 and report['chunks'] == 5
+    assert frame_indices(report['output']) == list(range(23))
+    assert job.checkpoint.get(str(tmp_path / "images"))['done']
+
+
+def test_unreadable_input_is_marked_failed_not_done(tmp_path):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+    job = OfflineJob(CountingEngine(), str(tmp_path / "out"))
+    report, = job.run([str(broken)])
+    assert report['error']
+
+    progress = Checkpoint(str(tmp_path / "out" / "checkpoint.json")).get(str(broken))
+    assert not progress['done'] and progress['error']
+
+
+def test_video_chunks_cover_every_frame(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("OpenCV was built without an AVI/MJPG writer")
+    for i in range(37):
+        writer.write(np.full((24, 32, 3), i * 6, dtype=np.uint8))
+    writer.release()
+
+    job = OfflineJob(CountingEngine(), str(tmp_path / "out"), chunk_frames=10, decoders=2, batch_size=3)
+    report, = job.run([path])
+    assert frame_indices(report['output']) == list(range(37))
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from postprocess import class_thresholds, decode_batch, decode_predictions, non_max_suppression
+
+
+def raw_output(anchors, num_classes=3, size=64):
+    """(1, 4 + C, A) output from [(cx, cy, w, h, class_id, score), ...] plus empty anchors"""
+    output = np.zeros((1, 4 + num_classes, size), dtype=np.float32)
+    for i, (cx, cy, w, h, class_id, score) in enumerate(anchors):
+        output[0, :4, i] = (cx, cy, w, h)
+        output[0, 4 + class_id, i] = score
+    return output
+
+
+IDENTITY = (1.0, (0, 0), (640, 640))  # ratio, pad, frame shape
+
+
+def test_nms_suppresses_overlapping_boxes_of_the_same_class():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    keep = non_max_suppression(boxes, scores, np.zeros(3, dtype=np.int64), 0.45)
+    assert keep.tolist() == [0, 2]
+
+
+def test_nms_keeps_overlapping_boxes_of_different_classes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+    keep = non_max_suppression(boxes, scores, np.array([0, 1]), 0.45)
+    assert keep.tolist() == [0, 1]
+
+
+def test_nms_stops_at_max_det():
+    boxes = np.array([[i * 20, 0, i * 20 + 10, 10] for i in range(5)], dtype=np.float32)
+    scores = np.linspace(0.9, 0.5, 5).astype(np.float32)
+    keep = non_max_suppression(boxes, scores, np.zeros(5, dtype=np.int64), 0.45, max_det=2)
+    assert keep.tolist() == [0, 1]
+
+
+def test_nms_empty():
+    keep = non_max_suppression(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+    assert keep.shape == (0,)
+
+
+def test_class_thresholds_overrides_and_allowlist():
+    thresholds = class_thresholds(4, conf=0.25, class_conf={1: 0.6, 9: 0.1}, classes=[1, 2])
+    assert thresholds[1] == pytest.approx(0.6)
+    assert thresholds[2] == pytest.approx(0.25)
+    assert np.isinf(thresholds[0]) and np.isinf(thresholds[3])
+
+
+def test_decode_converts_xywh_and_maps_back_to_the_frame():
+    output = raw_output([(120, 200, 40, 20, 1, 0.9)])
+    # A 320x240 frame letterboxed into 640x640: ratio 2, padded 80px top and bottom
+    boxes, scores, class_ids = decode_batch(output, [(2.0, (0, 80), (240, 320))])[0]
+    np.testing.assert_allclose(boxes, [[50, 55, 70, 65]])
+    np.testing.assert_allclose(scores, [0.9])
+    assert class_ids.tolist() == [1]
+    assert boxes.dtype == np.float32 and class_ids.dtype == np.int32
+
+
+def test_decode_applies_nms_and_confidence():
+    output = raw_output([
+        (100, 100, 50, 50, 0, 0.9),
+        (102, 101, 50, 50, 0, 0.8),   # duplicate of the first
+        (300, 300, 40, 40, 2, 0.6),
+        (500, 500, 40, 40, 1, 0.1),   # below conf
+    ])
+    boxes, scores, class_ids = decode_batch(output, [IDENTITY], conf=0.25, iou=0.45)[0]
+    np.testing.assert_allclose(scores, [0.9, 0.6])
+    assert class_ids.tolist() == [0, 2]
+
+
+def test_decode_class_allowlist_and_per_class_thresholds():
+    output = raw_output([
+        (100, 100, 20, 20, 0, 0.9),
+        (300, 300, 20, 20, 1, 0.5),
+        (500, 500, 20, 20, 2, 0.9),
+    ])
+    _, _, class_ids = decode_batch(output, [IDENTITY], conf=0.25, classes=[0, 1])[0]
+    assert class_ids.tolist() == [0, 1]
+    _, _, class_ids = decode_batch(output, [IDENTITY], conf=0.25, class_conf={1: 0.6})[0]
+    assert class_ids.tolist() == [0, 2]
+
+
+def test_decode_caps_candidates_to_the_best_scores():
+    anchors = [(20 + 30 * i, 100, 10, 10, 0, 0.3 + 0.01 * i) for i in range(20)]
+    boxes, scores, _ = decode_batch(raw_output(anchors), [IDENTITY], conf=0.25, max_nms=5)[0]
+    np.testing.assert_allclose(np.sort(scores)[::-1], [0.49, 0.48, 0.47, 0.46, 0.45], rtol=1e-5)
+
+
+def test_decode_batch_matches_per_image_decode():
+    rng = np.random.default_rng(0)
+    outputs = np.zeros((3, 7, 200), dtype=np.float32)
+    outputs[:, :2] = rng.uniform(0, 640, (3, 2, 200))
+    outputs[:, 2:4] = rng.uniform(8, 80, (3, 2, 200))
+    outputs[:, 4:] = rng.uniform(0, 1, (3, 3, 200))
+    outputs[1, 4:] = 0  # an image with no candidates
+    transforms = [IDENTITY] * 3
+
+    batched = decode_batch(outputs, transforms, conf=0.5, max_det=20)
+    assert len(batched[1][1]) == 0
+    for output, transform, (boxes, scores, class_ids) in zip(outputs, transforms, batched):
+        expected = decode_predictions(output, transform, conf=0.5, max_det=20)
+        np.testing.assert_array_equal(boxes, expected[0])
+        np.testing.assert_array_equal(scores, expected[1])
+        np.testing.assert_array_equal(class_ids, expected[2])
+        assert len(scores) <= 20
@@ -0,0 +1,286 @@
+"""SORT-style multi-object tracking with keyframe-only detection.
+
+Full YOLO inference runs on keyframes (every K frames, or sooner when
+tracking gets unreliable). In between, each track is moved with sparse
+Lucas-Kanade optical flow on a downscaled grayscale frame and smoothed by a
+constant-velocity Kalman filter, which costs a millisecond or two instead of
+a forward pass. On keyframes the detections are matched to the predicted
+tracks by class-aware IoU, so track IDs stay stable across frames.
+
+    tracker = KeyframeTracker(keyframe_interval=5)
+    pipeline = DetectionPipeline(source, engine, sinks=[...], tracker=tracker)
+"""
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of xyxy boxes, shape (len(a), len(b))"""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def greedy_match(ious, threshold):
+    """Highest-IoU-first one-to-one matching; returns (rows, cols) of the pairs"""
+    rows, cols = [], []
+    if ious.size == 0:
+        return rows, cols
+    candidates = np.argwhere(ious >= threshold)
+    order = np.argsort(-ious[candidates[:, 0], candidates[:, 1]])
+    used_rows, used_cols = set(), set()
+    for row, col in candidates[order]:
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        rows.append(row)
+        cols.append(col)
+    return rows, cols
+
+
+# Constant-velocity model over (cx, cy, w, h) and their per-frame velocities
+TRANSITION = np.eye(8, dtype=np.float32)
+TRANSITION[:4, 4:] = np.eye(4, dtype=np.float32)
+MEASUREMENT = np.eye(4, 8, dtype=np.float32)
+PROCESS_NOISE = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.0001, 0.0001]).astype(np.float32)
+MEASUREMENT_NOISE = np.diag([1, 1, 10, 10]).astype(np.float32)
+
+
+def to_cxcywh(box):
+    return np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2,
+                     box[2] - box[0], box[3] - box[1]], dtype=np.float32)
+
+
+class Track:
+    """One tracked object: Kalman state plus its last detection's class and score"""
+
+    __slots__ = ('track_id', 'class_id', 'score', 'state', 'covariance', 'hits', 'misses',
+                 'confidence')
+
+    def __init__(self, track_id, box, score, class_id):
+        self.track_id = track_id
+        self.class_id = int(class_id)
+        self.score = float(score)
+        self.state = np.zeros(8, dtype=np.float32)
+        self.state[:4] = to_cxcywh(box)
+        self.covariance = np.diag([10, 10, 10, 10, 1000, 1000, 1000, 1000]).astype(np.float32)
+        self.hits = 1
+        self.misses = 0
+        self.confidence = 1.0  # how well the last propagation step held up
+
+    @property
+    def box(self):
+        cx, cy, w, h = self.state[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+    def predict(self):
+        self.state = TRANSITION @ self.state
+        self.state[2:4] = np.maximum(self.state[2:4], 1)
+        self.covariance = TRANSITION @ self.covariance @ TRANSITION.T + PROCESS_NOISE
+
+    def correct(self, box):
+        innovation = to_cxcywh(box) - MEASUREMENT @ self.state
+        system = MEASUREMENT @ self.covariance @ MEASUREMENT.T + MEASUREMENT_NOISE
+        gain = self.covariance @ MEASUREMENT.T @ np.linalg.inv(system)
+        self.state = self.state + gain @ innovation
+        self.covariance = (np.eye(8, dtype=np.float32) - gain @ MEASUREMENT) @ self.covariance
+
+
+class MultiObjectTracker:
+    """Assign stable IDs to per-frame detections (IoU matching on Kalman predictions)"""
+
+    def __init__(self, iou_threshold=0.3, max_misses=10):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses  # keyframes a track may go undetected
+        self.tracks = []
+        self.next_id = 1
+
+    def predicted_boxes(self):
+        if not self.tracks:
+            return np.zeros((0, 4), dtype=np.float32)
+        return np.stack([track.box for track in self.tracks])
+
+    def update(self, boxes, scores, class_ids):
+        """Match detections to tracks; returns the track id for every detection"""
+        for track in self.tracks:
+            track.predict()
+
+        ious = iou_matrix(boxes, self.predicted_boxes()) if len(boxes) else np.zeros((0, 0))
+        if ious.size:
+            track_classes = np.array([track.class_id for track in self.tracks])
+            ious[class_ids[:, None] != track_classes[None, :]] = 0
+        rows, cols = greedy_match(ious, self.iou_threshold)
+
+        track_ids = np.zeros(len(boxes), dtype=np.int32)
+        matched_tracks = set()
+        for row, col in zip(rows, cols):
+            track = self.tracks[col]
+            track.correct(boxes[row])
+            track.score = float(scores[row])
+            track.hits += 1
+            track.misses = 0
+            track.confidence = 1.0
+            track_ids[row] = track.track_id
+            matched_tracks.add(col)
+
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for row in sorted(set(range(len(boxes))) - set(rows)):
+            track = Track(self.next_id, boxes[row], scores[row], class_ids[row])
+            self.next_id += 1
+            self.tracks.append(track)
+            track_ids[row] = track.track_id
+        return track_ids
+
+    def reset(self):
+        self.tracks = []
+
+
+class KeyframeTracker:
+    """Detect on keyframes, propagate tracks with optical flow on the frames between"""
+
+    def __init__(self, keyframe_interval=5, min_confidence=0.5, flow_width=320, iou_threshold=0.3,
+                 max_misses=10, grid=3):
+        self.keyframe_interval = keyframe_interval
+        self.min_confidence = min_confidence  # below this the next frame is a keyframe
+        self.flow_width = flow_width
+        self.grid = grid
+        self.tracker = MultiObjectTracker(iou_threshold, max_misses)
+        self.pool = FramePool()
+
+        self.previous_gray = None
+        self.scale = 1.0
+        self.gray_slot = 0
+        self.frames_since_keyframe = 0
+        self.confidence = 1.0
+
+        # Counters
+        self.keyframes = 0
+        self.propagated_frames = 0
+        self.forced_keyframes = 0
+        self.propagate_time = 0.0
+
+    def needs_detection(self):
+        if self.previous_gray is None or self.frames_since_keyframe + 1 >= self.keyframe_interval:
+            return True
+        if self.confidence < self.min_confidence:
+            self.forced_keyframes += 1
+            return True
+        return False
+
+    def gray(self, frame):
+        """Downscaled grayscale copy, alternating between two reused buffers"""
+        height, width = frame.shape[:2]
+        self.scale = min(self.flow_width / width, 1.0)
+        size = (int(width * self.scale), int(height * self.scale))
+        small = cv2.resize(frame, size, dst=self.pool.scratch("small", (size[1], size[0], 3)))
+        self.gray_slot ^= 1
+        gray = self.pool.scratch(f"gray{self.gray_slot}", (size[1], size[0]))
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+
+    def update(self, detection):
+        """Keyframe: assign track ids to a full detection (in place) and return it"""
+        detection.track_ids = self.tracker.update(detection.boxes, detection.scores, detection.class_ids)
+        if detection.frame is not None:
+            self.previous_gray = self.gray(detection.frame)
+        self.frames_since_keyframe = 0
+        self.confidence = 1.0
+        self.keyframes += 1
+        return detection
+
+    def sample_points(self, boxes):
+        """grid x grid points inside the central half of every box, in flow-image pixels"""
+        steps = (np.arange(self.grid, dtype=np.float32) + 0.5) / self.grid * 0.5 + 0.25
+        fx, fy = np.meshgrid(steps, steps)
+        fx, fy = fx.ravel(), fy.ravel()
+        scaled = boxes * self.scale
+        xs = scaled[:, 0:1] + (scaled[:, 2:3] - scaled[:, 0:1]) * fx
+        ys = scaled[:, 1:2] + (scaled[:, 3:4] - scaled[:, 1:2]) * fy
+        return np.stack([xs, ys], axis=2).reshape(-1, 1, 2).astype(np.float32)
+
+    def propagate(self, frame, frame_index=0, source_id=0, names=None):
+        """Non-keyframe: move every track with optical flow and return a DetectionResult"""
+        from detection_engine import DetectionResult
+
+        started = time.perf_counter()
+        tracks = self.tracker.tracks
+        gray = self.gray(frame)
+        boxes = np.stack([track.box for track in tracks]) if tracks else None
+        for track in tracks:
+            track.predict()
+
+        if tracks and self.previous_gray.shape != gray.shape:
+            # Capture resolution changed under us; detect again
+            self.confidence = 0.0
+        elif tracks:
+            points = self.sample_points(boxes)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, points, None)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.previous_gray, moved, None)
+            # Forward-backward check: a good point flows back to where it started
+            error = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+            good = ((status.ravel() == 1) & (back_status.ravel() == 1) & (error < 1.0))
+            good = good.reshape(len(tracks), -1)
+            shifts = ((moved - points).reshape(len(tracks), -1, 2)) / self.scale
+
+            for track, box, track_good, track_shifts in zip(tracks, boxes, good, shifts):
+                track.confidence = track_good.mean()
+                if track_good.sum() >= 3:
+                    # Measurement: where the flow says last frame's box went
+                    dx, dy = np.median(track_shifts[track_good], axis=0)
+                    track.correct(box + np.array([dx, dy, dx, dy], dtype=np.float32))
+            self.confidence = float(np.mean([track.confidence for track in tracks]))
+
+        self.previous_gray = gray
+        self.frames_since_keyframe += 1
+        self.propagated_frames += 1
+        elapsed = time.perf_counter() - started
+        self.propagate_time += elapsed
+
+        visible = [track for track in tracks if track.misses == 0]
+        height, width = frame.shape[:2]
+        if visible:
+            boxes = np.stack([track.box for track in visible])
+            boxes[:, 0::2] = boxes[:, 0::2].clip(0, width)
+            boxes[:, 1::2] = boxes[:, 1::2].clip(0, height)
+        else:
+            boxes = np.zeros((0, 4), dtype=np.float32)
+        detection = DetectionResult(
+            boxes,
+            np.array([track.score for track in visible], dtype=np.float32),
+            np.array([track.class_id for track in visible], dtype=np.int32),
+            names or {}, frame=frame, frame_index=frame_index, source_id=source_id
+        )
+        detection.track_ids = np.array([track.track_id for track in visible], dtype=np.int32)
+        detection.inference_time = elapsed
+        return detection
+
+    def reset(self):
+        self.tracker.reset()
+        self.previous_gray = None
+        self.frames_since_keyframe = 0
+
+    def stats(self):
+        total = self.keyframes + self.propagated_frames
+        return {
+            'tracks': len(self.tracker.tracks),
+            'keyframes': self.keyframes,
+            'forced_keyframes': self.forced_keyframes,
+            'propagated': self.propagated_frames,
+            'detection_ratio': self.keyframes / max(total, 1),
+            'avg_propagate_ms': 1000 * self.propagate_time / max(self.propagated_frames, 1),
+        }